@@ -1,50 +1,159 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify
+import click
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from validation import validate_auth_request, validate_group_request, validate_poll_request
+from validation import (DEFAULT_MAX_CONTENT_LENGTH, FRIEND_REQUEST_SCHEMA, GROUP_SCHEMA, LOGIN_SCHEMA,
+                        MESSAGE_SCHEMA, NOTIFICATION_READ_SCHEMA, POLL_SCHEMA, PROFILE_SCHEMA, REACTION_SCHEMA,
+                        REGISTER_SCHEMA, VOTE_BATCH_SCHEMA, VOTE_SCHEMA, init_request_limits, validate_json)
+from query_budget import init_query_budget, query_budget
+from throttling import init_throttling, throttle
+from metrics import init_metrics, metrics_response
+from engine_profile import configure_database, init_engine_profile
+from passwords import DEFAULT_METHOD as DEFAULT_PASSWORD_HASH_METHOD, init_password_hashing
+from response_cache import (bump_group_version, bump_group_versions_for_member,
+                            current_group_version, group_body_cache, group_etag)
+from pagination import keyset_page, parse_limit
+from realtime import hub, stream_tallies
+from extensions import db, migrate
+from scheduler import init_scheduler
+from expiry import close_expired_polls, init_poll_expiry
+from feed import DEFAULT_FANOUT_MAX_MEMBERS, fan_out_poll, load_feed_page, rebuild_feeds
+from chat import (DEFAULT_CHANNEL_SIZE, DEFAULT_HISTORY_LIMIT, DEFAULT_WAIT_SECONDS, MAX_EMOJI_LENGTH,
+                  MAX_HISTORY_LIMIT, MAX_WAIT_SECONDS, add_reaction, channel_group_exists, channels, group_exists,
+                  init_chat_sync, is_member, load_history, message_exists, open_message_stream, poll_in_group,
+                  post_message, remove_reaction, wait_for_messages)
+from notifications import (deliver_notifications, enqueue_poll_created, enqueue_vote_milestone,
+                           init_notification_delivery, load_notifications, mark_read, rebuild_unread_counters,
+                           unread_count)
+from friends import (DEFAULT_SUGGESTION_LIMIT, MAX_MUTUAL_IDS, MAX_SUGGESTION_LIMIT, accept_request, are_friends,
+                     friend_set_cache, load_friends_page, load_requests, mutual_counts, remove_friendship,
+                     remove_request, send_request, suggest_friends)
+from vote_log import (MAX_TAIL_LIMIT, checkpoint_seq, compact_vote_log, events_after,
+                      init_vote_log_compaction, replay_votes)
+from timeline import RESOLUTIONS, poll_timeline, rebuild_vote_buckets
+from voting import cast_vote, ingest_vote_batch
+from search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, MAX_SEARCH_OFFSET, find_users, rebuild_search_index
+from serializers import (GROUP_COLUMNS, OrjsonProvider, group_dict, json_bytes, load_group_detail,
+                         load_member_ids, load_poll, member_dict, poll_dict, user_dict, user_row)
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-# Configure CORS with more permissive settings for development
-CORS(app, resources={
-    r"/*": {
-        "origins": "*",  # Allow all origins in development
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": "*",
-        "supports_credentials": True
-    }
-})
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///bolt.db'  # Use sqlite for development
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize extensions
-from extensions import db, migrate
-db.init_app(app)
-migrate.init_app(app, db)
+# Every route and CLI command lives on this blueprint; create_app() registers it
+api = Blueprint('api', __name__, cli_group=None)
 
-# Import models - must be after db initialization
-from models import User, Group, Poll, PollOption, Vote
+def create_app():
+    """Build and configure an application instance
+    
+    Nothing runs at import time: scripts, the flask CLI, the development
+    server and each worker of serve.py call this themselves.
+    """
+    app = Flask(__name__)
+    # Responses are encoded with orjson when it is installed; JSON_BACKEND=stdlib opts out
+    OrjsonProvider.enabled = os.getenv('JSON_BACKEND', 'orjson').lower() != 'stdlib'
+    app.json = OrjsonProvider(app)
+    # Configure CORS with more permissive settings for development
+    CORS(app, resources={
+        r"/*": {
+            "origins": "*",  # Allow all origins in development
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": "*",
+            "supports_credentials": True
+        }
+    })
+    
+    # Database configuration (URL, pragmas and pool come from DB_PROFILE and friends)
+    configure_database(app)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['QUERY_BUDGET_STRICT'] = os.getenv('QUERY_BUDGET_STRICT', '').lower() in ('1', 'true', 'yes')
+    # Live results: at most one message per interval per client, plus idle heartbeats
+    app.config['SSE_COALESCE_SECONDS'] = float(os.getenv('SSE_COALESCE_SECONDS', 1.0))
+    app.config['SSE_HEARTBEAT_SECONDS'] = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15.0))
+    # Serialized group payloads kept in memory, keyed by (group, version)
+    group_body_cache.maxsize = int(os.getenv('GROUP_CACHE_SIZE', 512))
+    # Friend id sets kept in memory for mutual-friend counts, keyed by (user, friends_version)
+    friend_set_cache.maxsize = int(os.getenv('FRIEND_CACHE_SIZE', 10000))
+    # Latest chat messages kept in memory per group with readers (see chat.py)
+    channels.size = int(os.getenv('CHAT_CHANNEL_SIZE', DEFAULT_CHANNEL_SIZE))
+    # Password hashing runs on a process pool; beyond the queue limit logins get a 503
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+    app.config['PASSWORD_HASH_QUEUE_LIMIT'] = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', 32))
+    # Token buckets per client IP and per (client IP, account), plus a cap on in-flight requests (see throttling.py)
+    app.config['THROTTLE_ENABLED'] = os.getenv('THROTTLE_ENABLED', '1').lower() not in ('0', 'false', 'no')
+    app.config['THROTTLE_IP_RATE'] = float(os.getenv('THROTTLE_IP_RATE', 20))
+    app.config['THROTTLE_IP_BURST'] = float(os.getenv('THROTTLE_IP_BURST', 60))
+    app.config['THROTTLE_USER_RATE'] = float(os.getenv('THROTTLE_USER_RATE', 5))
+    app.config['THROTTLE_USER_BURST'] = float(os.getenv('THROTTLE_USER_BURST', 20))
+    app.config['THROTTLE_MAX_CONCURRENT'] = int(os.getenv('THROTTLE_MAX_CONCURRENT', 64))
+    app.config['THROTTLE_STORE'] = os.getenv('THROTTLE_STORE', 'memory')
+    # Background jobs; an interval of 0 leaves the work to the matching flask command
+    app.config['POLL_EXPIRY_INTERVAL'] = float(os.getenv('POLL_EXPIRY_INTERVAL', 30))
+    app.config['VOTE_LOG_COMPACT_INTERVAL'] = float(os.getenv('VOTE_LOG_COMPACT_INTERVAL', 3600))
+    app.config['VOTE_LOG_RETENTION_HOURS'] = float(os.getenv('VOTE_LOG_RETENTION_HOURS', 168))
+    # Chat messages sent through other worker processes reach this one's readers this often
+    app.config['CHAT_SYNC_INTERVAL'] = float(os.getenv('CHAT_SYNC_INTERVAL', 1.0))
+    # Queued notification events are fanned out to group members this often (see notifications.py)
+    app.config['NOTIFICATION_INTERVAL'] = float(os.getenv('NOTIFICATION_INTERVAL', 2.0))
+    app.config['THROTTLE_TRUST_PROXY'] = os.getenv('THROTTLE_TRUST_PROXY', '').lower() in ('1', 'true', 'yes')
+    # Per-endpoint latency, SQL and size histograms at /api/metrics; Server-Timing headers are opt-in
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+    app.config['METRICS_SERVER_TIMING'] = os.getenv('METRICS_SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+    # Polls are copied into members' feeds only for groups up to this size (see feed.py)
+    app.config['FEED_FANOUT_MAX_MEMBERS'] = int(os.getenv('FEED_FANOUT_MAX_MEMBERS', DEFAULT_FANOUT_MAX_MEMBERS))
+    # Largest request body accepted; endpoint schemas set tighter limits (see validation.py)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', DEFAULT_MAX_CONTENT_LENGTH))
+    
+    # Initialize extensions
+    db.init_app(app)
+    init_engine_profile(app, db)
+    migrate.init_app(app, db)
+    init_metrics(app)
+    init_request_limits(app)
+    init_query_budget(app)
+    init_password_hashing(app)
+    init_throttling(app)
+    scheduler = init_scheduler(app)
+    init_poll_expiry(scheduler, app.config['POLL_EXPIRY_INTERVAL'])
+    init_vote_log_compaction(scheduler, app.config['VOTE_LOG_COMPACT_INTERVAL'],
+                             timedelta(hours=app.config['VOTE_LOG_RETENTION_HOURS']))
+    init_chat_sync(scheduler, app.config['CHAT_SYNC_INTERVAL'])
+    init_notification_delivery(scheduler, app.config['NOTIFICATION_INTERVAL'])
+    
+    app.register_blueprint(api)
+    return app
+
+# Models only need the db object, not an initialized app
+from models import User, Group, Poll, PollOption, group_members
+from tallies import rebuild_tallies
 
 
 # Skip creating demo user - we already have seed data
 # The database has already been populated with sample data
 
 # Health check endpoint
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
+@query_budget(0)
+@throttle(0)
 def health_check():
     return jsonify({"status": "healthy", "message": "Backend is running"}), 200
 
+# Prometheus scrape target
+@api.route('/api/metrics', methods=['GET'])
+@query_budget(0)
+@throttle(0)
+def get_metrics():
+    return metrics_response()
+
 # Auth endpoints
-@app.route('/api/auth/login', methods=['POST'])
-@validate_auth_request
+@api.route('/api/auth/login', methods=['POST'])
+@query_budget(2)
+@throttle(10, account='email')
+@validate_json(LOGIN_SCHEMA)
 def login():
     data = request.json
     email = data.get('email')
@@ -53,21 +162,17 @@ def login():
     # Find user by email
     user = User.query.filter_by(email=email).first()
     
-    # Verify password with secure hash comparison
+    # Verify password with secure hash comparison (stale hashes are upgraded on the way)
     if user and user.check_password(password):
-        return jsonify({
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-                "bio": user.bio,
-                "avatar": user.avatar
-            }
-        }), 200
+        response = {"user": user_dict(user_row(user))}
+        db.session.commit()
+        return jsonify(response), 200
     return jsonify({"error": "Invalid credentials"}), 401
 
-@app.route('/api/auth/register', methods=['POST'])
-@validate_auth_request
+@api.route('/api/auth/register', methods=['POST'])
+@query_budget(3)
+@throttle(10, account='email')
+@validate_json(REGISTER_SCHEMA)
 def register():
     data = request.json
     email = data.get('email')
@@ -98,20 +203,16 @@ def register():
     new_user.set_password(password)
     
     db.session.add(new_user)
+    # Captured before commit expires the instance, so the response needs no reload
+    response = {"user": user_dict(user_row(new_user))}
     db.session.commit()
     
-    return jsonify({
-        "user": {
-            "id": new_user.id,
-            "username": new_user.username,
-            "email": new_user.email,
-            "bio": new_user.bio,
-            "avatar": new_user.avatar
-        }
-    }), 201
+    return jsonify(response), 201
 
 # User endpoints
-@app.route('/api/users/profile', methods=['PUT'])
+@api.route('/api/users/profile', methods=['PUT'])
+@query_budget(4)
+@validate_json(PROFILE_SCHEMA)
 def update_profile():
     data = request.json
     user_id = data.get('id')
@@ -125,60 +226,238 @@ def update_profile():
         if field in data:
             setattr(user, field, data[field])
     
+    # Group pages list member usernames
+    if 'username' in data:
+        bump_group_versions_for_member(user_id)
+    
+    response = {"user": user_dict(user_row(user))}
     db.session.commit()
     
-    return jsonify({
-        "user": {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "bio": user.bio,
-            "avatar": user.avatar
-        }
-    }), 200
+    return jsonify(response), 200
 
 # Friend endpoints
-@app.route('/api/friends/search', methods=['GET'])
+@api.route('/api/friends/search', methods=['GET'])
+@query_budget(2)
+@throttle(2)
 def search_users():
-    query = request.args.get('query', '').lower()
-    if len(query) < 2:
+    query = request.args.get('query', '')
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({"error": "limit must be positive and offset non-negative"}), 400
+    if offset > MAX_SEARCH_OFFSET:
         return jsonify([]), 200
     
-    # Search users by username or email using SQLAlchemy
-    users = User.query.filter(
-        db.or_(
-            User.username.ilike(f'%{query}%'),
-            User.email.ilike(f'%{query}%')
-        )
-    ).all()
-    
-    results = [
-        {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "avatar": user.avatar
-        } for user in users
-    ]
-    return jsonify(results), 200
+    # Username prefix matches first, then substring matches from the trigram index
+    rows = find_users(db.session.connection(), query, limit=limit, offset=offset)
+    return jsonify([member_dict(row) for row in rows]), 200
+
+@api.route('/api/users/<user_id>/friends', methods=['GET'])
+@query_budget(2)
+def get_friends(user_id):
+    if not db.session.get(User, user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    # Newest friends first, one range of the user's side of the friendship edges
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        friends, next_cursor = load_friends_page(user_id, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({"friends": friends, "next_cursor": next_cursor}), 200
+
+@api.route('/api/users/<user_id>/friend-requests', methods=['GET'])
+@query_budget(3)
+def get_friend_requests(user_id):
+    if not db.session.get(User, user_id):
+        return jsonify({"error": "User not found"}), 404
+    return jsonify(load_requests(user_id)), 200
+
+@api.route('/api/users/<user_id>/friend-requests', methods=['POST'])
+@query_budget(6)
+@throttle(2)
+@validate_json(FRIEND_REQUEST_SCHEMA)
+def send_friend_request(user_id):
+    recipient_id = request.json['recipient_id']
+    if recipient_id == user_id:
+        return jsonify({"error": "You cannot befriend yourself"}), 400
+    found = db.session.execute(db.select(User.id).where(User.id.in_([user_id, recipient_id]))).scalars().all()
+    if len(found) < 2:
+        return jsonify({"error": "User not found"}), 404
+    if are_friends(user_id, recipient_id):
+        return jsonify({"error": "Already friends"}), 409
+    
+    # A request to someone who already asked you accepts theirs
+    status = send_request(user_id, recipient_id)
+    if status is None:
+        return jsonify({"error": "Friend request already sent"}), 409
+    db.session.commit()
+    
+    return jsonify({"status": status}), 201 if status == "pending" else 200
+
+@api.route('/api/users/<user_id>/friend-requests/<sender_id>/accept', methods=['POST'])
+@query_budget(4)
+def accept_friend_request(user_id, sender_id):
+    if not accept_request(user_id, sender_id):
+        return jsonify({"error": "Friend request not found"}), 404
+    db.session.commit()
+    return jsonify({"status": "accepted"}), 200
+
+@api.route('/api/users/<user_id>/friend-requests/<other_id>', methods=['DELETE'])
+@query_budget(1)
+def delete_friend_request(user_id, other_id):
+    # Declines a request from other_id, or cancels one sent to them
+    if not remove_request(user_id, other_id):
+        return jsonify({"error": "Friend request not found"}), 404
+    db.session.commit()
+    return jsonify({"status": "removed"}), 200
+
+@api.route('/api/users/<user_id>/friends/<friend_id>', methods=['DELETE'])
+@query_budget(2)
+def delete_friend(user_id, friend_id):
+    if not remove_friendship(user_id, friend_id):
+        return jsonify({"error": "Friendship not found"}), 404
+    db.session.commit()
+    return jsonify({"status": "removed"}), 200
+
+@api.route('/api/users/<user_id>/mutual-friends', methods=['GET'])
+@query_budget(2)
+def get_mutual_friends(user_id):
+    other_ids = [other_id for other_id in request.args.get('with', '').split(',') if other_id]
+    if not other_ids:
+        return jsonify({"error": "with must list at least one user ID"}), 400
+    if len(other_ids) > MAX_MUTUAL_IDS:
+        return jsonify({"error": f"At most {MAX_MUTUAL_IDS} users at a time"}), 400
+    
+    # Intersections of cached friend sets; only sets changed since they were cached are read
+    counts = mutual_counts(user_id, other_ids)
+    if counts is None:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify({"counts": counts}), 200
+
+@api.route('/api/users/<user_id>/friend-suggestions', methods=['GET'])
+@query_budget(4)
+@throttle(2)
+def get_friend_suggestions(user_id):
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_SUGGESTION_LIMIT)), MAX_SUGGESTION_LIMIT)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    
+    # Every candidate from the user's groups in one query, then ranked by mutual friends in bulk
+    suggestions = suggest_friends(user_id, limit)
+    if suggestions is None:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify({"suggestions": suggestions}), 200
 
 # Group endpoints
-@app.route('/api/groups', methods=['GET'])
+def group_page_response(query):
+    """Serialize one keyset page of groups, newest first"""
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        rows, next_cursor = keyset_page(
+            query, Group.created_at, Group.id, request.args.get('cursor'), limit
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Load the page's member ids in one extra query instead of one per group
+    members = load_member_ids([row[0] for row in rows])
+    result = [group_dict(row, members[row[0]]) for row in rows]
+    
+    return jsonify({"groups": result, "next_cursor": next_cursor}), 200
+
+@api.route('/api/groups', methods=['GET'])
+@query_budget(2)
 def get_groups():
-    all_groups = Group.query.all()
-    result = [{
-        "id": group.id,
-        "name": group.name,
-        "description": group.description,
-        "creator_id": group.creator_id,
-        "created_at": group.created_at.isoformat() if group.created_at else None,
-        "members": [member.id for member in group.members]
-    } for group in all_groups]
-    
-    return jsonify(result), 200
-
-@app.route('/api/groups', methods=['POST'])
-@validate_group_request
+    return group_page_response(db.session.query(*GROUP_COLUMNS))
+
+@api.route('/api/users/<user_id>/groups', methods=['GET'])
+@query_budget(3)
+def get_user_groups(user_id):
+    if not db.session.get(User, user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    # Only the groups this user belongs to, found through the group_members.user_id index
+    query = db.session.query(*GROUP_COLUMNS).join(
+        group_members, group_members.c.group_id == Group.id
+    ).filter(
+        group_members.c.user_id == user_id
+    )
+    return group_page_response(query)
+
+@api.route('/api/users/<user_id>/feed', methods=['GET'])
+@query_budget(4)
+def get_user_feed(user_id):
+    if not db.session.get(User, user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    # Recent polls across the user's groups, newest first, from the precomputed feed
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        polls, next_cursor = load_feed_page(user_id, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({"polls": polls, "next_cursor": next_cursor}), 200
+
+@api.route('/api/users/<user_id>/notifications', methods=['GET'])
+@query_budget(2)
+def get_notifications(user_id):
+    if not db.session.get(User, user_id):
+        return jsonify({"error": "User not found"}), 404
+    
+    # Most recently updated first; repeats were folded into one notification by the delivery job
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        notifications, next_cursor = load_notifications(user_id, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({"notifications": notifications, "next_cursor": next_cursor}), 200
+
+@api.route('/api/users/<user_id>/notifications/unread', methods=['GET'])
+@query_budget(2)
+def get_unread_count(user_id):
+    # One row of the maintained counter, however many notifications there are
+    unread = unread_count(user_id)
+    if unread is None:
+        if not db.session.get(User, user_id):
+            return jsonify({"error": "User not found"}), 404
+        unread = 0
+    return jsonify({"unread": unread}), 200
+
+def _marked_read(user_id, ids):
+    """Mark notifications read and answer with the unread count left"""
+    unread = mark_read(user_id, ids)
+    db.session.commit()
+    if unread is None:
+        if not db.session.get(User, user_id):
+            return jsonify({"error": "User not found"}), 404
+        unread = 0
+    return jsonify({"unread": unread}), 200
+
+@api.route('/api/users/<user_id>/notifications/read', methods=['POST'])
+@query_budget(3)
+@validate_json(NOTIFICATION_READ_SCHEMA)
+def mark_notifications_read(user_id):
+    return _marked_read(user_id, request.json['ids'])
+
+@api.route('/api/users/<user_id>/notifications/read-all', methods=['POST'])
+@query_budget(3)
+def mark_all_notifications_read(user_id):
+    return _marked_read(user_id, None)
+
+@api.route('/api/groups', methods=['POST'])
+@query_budget(3)
+@throttle(2)
+@validate_json(GROUP_SCHEMA)
 def create_group():
     data = request.json
     name = data.get('name')
@@ -195,12 +474,13 @@ def create_group():
     
     # Create new group
     import uuid
+    new_group_id, created_at = str(uuid.uuid4()), datetime.now()
     new_group = Group(
-        id=str(uuid.uuid4()),
+        id=new_group_id,
         name=name,
         description=description or "",
         creator_id=creator_id,
-        created_at=datetime.now()
+        created_at=created_at
     )
     
     # Add creator as a member
@@ -209,72 +489,46 @@ def create_group():
     db.session.add(new_group)
     db.session.commit()
     
-    # Format response
-    response = {
-        "id": new_group.id,
-        "name": new_group.name,
-        "description": new_group.description,
-        "creator_id": new_group.creator_id,
-        "created_at": new_group.created_at.isoformat(),
-        "members": [creator_id]
-    }
+    # Format response from the values we just wrote
+    response = group_dict(
+        (new_group_id, name, description or "", creator_id, created_at), [creator_id]
+    )
     
     return jsonify(response), 201
 
-@app.route('/api/groups/<group_id>', methods=['GET'])
+@api.route('/api/groups/<group_id>', methods=['GET'])
+@query_budget(6)
 def get_group(group_id):
-    # Find the group by ID
-    group = Group.query.get(group_id)
-    if not group:
+    # The version and the next poll deadline alone decide whether the client's or our cached copy is current
+    now = datetime.now()
+    state = current_group_version(group_id, now)
+    if state is None:
         return jsonify({"error": "Group not found"}), 404
     
-    # Get all polls for this group
-    group_polls = Poll.query.filter_by(group_id=group_id).all()
-    poll_list = [
-        {
-            "id": poll.id,
-            "title": poll.title,
-            "description": poll.description,
-            "group_id": poll.group_id,
-            "creator_id": poll.creator_id,
-            "created_at": poll.created_at.isoformat() if poll.created_at else None,
-            "expire_at": poll.expire_at.isoformat() if poll.expire_at else None,
-            "options": [
-                {
-                    "id": option.id,
-                    "text": option.text,
-                    "votes": len(option.votes)
-                } for option in poll.options
-            ]
-        } for poll in group_polls
-    ]
-    
-    # Get member details
-    member_details = [
-        {
-            "id": member.id,
-            "username": member.username,
-            "email": member.email,
-            "avatar": member.avatar
-        } for member in group.members
-    ]
-    
-    # Construct response
-    response = {
-        "id": group.id,
-        "name": group.name,
-        "description": group.description,
-        "creator_id": group.creator_id,
-        "created_at": group.created_at.isoformat() if group.created_at else None,
-        "members": member_details,
-        "polls": poll_list
-    }
-    
-    return jsonify(response), 200
+    version, next_deadline = state
+    etag = group_etag(group_id, version, next_deadline)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        body = group_body_cache.get((group_id, version, next_deadline))
+        if body is None:
+            body = serialize_group(group_id, now)
+            group_body_cache.set((group_id, version, next_deadline), body)
+        response = Response(body, status=200, mimetype='application/json')
+    
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # Always revalidate, a 304 is cheap
+    return response
+
+def serialize_group(group_id, now=None):
+    """Build the JSON body of a group with its members and polls as of `now`"""
+    return json_bytes(load_group_detail(group_id, now))
 
 # Poll endpoints
-@app.route('/api/groups/<group_id>/polls', methods=['POST'])
-@validate_poll_request
+@api.route('/api/groups/<group_id>/polls', methods=['POST'])
+@query_budget(8)
+@throttle(2)
+@validate_json(POLL_SCHEMA)
 def create_poll(group_id):
     # Find the group by ID
     group = Group.query.get(group_id)
@@ -303,58 +557,50 @@ def create_poll(group_id):
     
     # Create new poll
     import uuid
+    poll_id, now = str(uuid.uuid4()), datetime.now()
+    expire_at = now + timedelta(days=expire_days)
     new_poll = Poll(
-        id=str(uuid.uuid4()),
+        id=poll_id,
         title=title,
         description="",
         group_id=group_id,
         creator_id=creator_id,
-        created_at=datetime.now(),
-        expire_at=datetime.now() + timedelta(days=expire_days)
+        created_at=now,
+        expire_at=expire_at
     )
     
     db.session.add(new_poll)
+    bump_group_version(group_id)
     
     # Create poll options
+    option_rows = []
     for option_text in options:
-        option = PollOption(
-            id=str(uuid.uuid4()),
-            poll_id=new_poll.id,
-            text=option_text
-        )
-        db.session.add(option)
-    
+        option_id = str(uuid.uuid4())
+        db.session.add(PollOption(id=option_id, poll_id=poll_id, text=option_text))
+        option_rows.append((poll_id, option_id, option_text, 0))
+    
+    # Copy the poll into every member's feed; large groups are merged in when feeds are read
+    fan_out_poll(group, poll_id, now, current_app.config['FEED_FANOUT_MAX_MEMBERS'])
+    # Members are notified by the delivery job, not in this request
+    enqueue_poll_created(poll_id, group_id, creator_id, now)
     db.session.commit()
     
-    # Format response
-    response = {
-        "id": new_poll.id,
-        "group_id": new_poll.group_id,
-        "question": new_poll.title,
-        "options": [{
-            "id": option.id,
-            "text": option.text,
-            "votes": []
-        } for option in new_poll.options],
-        "creator_id": new_poll.creator_id,
-        "created_at": new_poll.created_at.isoformat(),
-        "expire_at": new_poll.expire_at.isoformat() if new_poll.expire_at else None,
-        "active": datetime.now() < new_poll.expire_at if new_poll.expire_at else True
-    }
-    
-    return jsonify(response), 201
+    # Format response from the values we just wrote, no reload needed
+    poll_row = (poll_id, title, "", group_id, creator_id, now, expire_at, None)
+    return jsonify(poll_dict(poll_row, option_rows, now=now)), 201
 
-@app.route('/api/polls/<poll_id>/vote', methods=['POST'])
-@validate_poll_request
+@api.route('/api/polls/<poll_id>/vote', methods=['POST'])
+@query_budget(9)
+@validate_json(VOTE_SCHEMA)
 def vote_poll(poll_id):
-    # Find poll by ID
-    poll = Poll.query.get(poll_id)
-    if not poll:
+    # Find poll by ID, with its options in one more query
+    poll_row, option_rows, _ = load_poll(poll_id)
+    if not poll_row:
         return jsonify({"error": "Poll not found"}), 404
     
     # Check if poll is active (not expired)
-    is_active = not poll.expire_at or datetime.now() < poll.expire_at
-    if not is_active:
+    expire_at = poll_row.expire_at
+    if poll_row.closed_at or (expire_at and datetime.now() >= expire_at):
         return jsonify({"error": "Poll is closed"}), 400
     
     data = request.json
@@ -365,59 +611,317 @@ def vote_poll(poll_id):
         return jsonify({"error": "Missing required fields"}), 400
     
     # Check if user exists
-    user = User.query.get(user_id)
-    if not user:
+    if not db.session.get(User, user_id):
         return jsonify({"error": "User not found"}), 404
     
     # Check if option exists and belongs to this poll
-    option = PollOption.query.filter_by(id=option_id, poll_id=poll_id).first()
-    if not option:
+    if not any(option[1] == option_id for option in option_rows):
         return jsonify({"error": "Option not found"}), 404
     
-    # Remove previous votes by this user for this poll
-    existing_votes = Vote.query.join(PollOption).filter(
-        Vote.user_id == user_id,
-        PollOption.poll_id == poll_id
-    ).all()
+    # Replace any previous vote with a single upsert, moving the tallies in the same transaction
+    cast = cast_vote(poll_id, user_id, option_id)
+    if cast is None:
+        # Already this user's vote: nothing was written, and the group payload is unchanged
+        db.session.rollback()
+        return jsonify(poll_dict(poll_row, option_rows)), 200
+    previous_option_id, changed_counts, total = cast
+    bump_group_version(poll_row.group_id)
+    option_rows = [
+        (pid, oid, text, changed_counts.get(oid, votes)) for pid, oid, text, votes in option_rows
+    ]
+    # A first vote raises the total by one; members hear about it at vote milestones. The total
+    # comes from the tally update itself, so concurrent votes cannot skip or repeat a milestone
+    if previous_option_id is None:
+        enqueue_vote_milestone(poll_id, poll_row.group_id, total - 1, total)
+    db.session.commit()
     
-    for vote in existing_votes:
-        db.session.delete(vote)
+    # Format response with the updated tallies
+    response = poll_dict(poll_row, option_rows)
     
-    # Create new vote
-    import uuid
-    new_vote = Vote(
-        id=str(uuid.uuid4()),
-        option_id=option_id,
-        user_id=user_id,
-        voted_at=datetime.now()
+    # Push the changed counts to live result streams
+    hub.publish(poll_id, changed_counts)
+    
+    return jsonify(response), 200
+
+@api.route('/api/polls/<poll_id>/votes:batch', methods=['POST'])
+@query_budget(10)
+@throttle(10)
+@validate_json(VOTE_BATCH_SCHEMA)
+def vote_poll_batch(poll_id):
+    # Find poll by ID (options are selectin-loaded with the poll)
+    poll = db.session.get(Poll, poll_id)
+    if not poll:
+        return jsonify({"error": "Poll not found"}), 404
+    
+    # Check if poll is active (not expired)
+    if poll.closed_at or (poll.expire_at and datetime.now() >= poll.expire_at):
+        return jsonify({"error": "Poll is closed"}), 400
+    
+    # Shape and size were checked by VOTE_BATCH_SCHEMA; ballots are checked one by one
+    results, changed_counts = ingest_vote_batch(poll, request.json['votes'])
+    
+    # Push the changed counts to live result streams. The ingest committed, so poll is expired:
+    # use the route's poll_id rather than reload it
+    hub.publish(poll_id, changed_counts)
+    
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    
+    return jsonify({"poll_id": poll_id, "results": results, "summary": summary}), 200
+
+@api.route('/api/polls/<poll_id>/timeline', methods=['GET'])
+@query_budget(3)
+def get_poll_timeline(poll_id):
+    resolution = request.args.get('bucket', '1h')
+    if resolution not in RESOLUTIONS:
+        return jsonify({"error": f"bucket must be one of {', '.join(RESOLUTIONS)}"}), 400
+    
+    poll_row, option_rows, _ = load_poll(poll_id)
+    if not poll_row:
+        return jsonify({"error": "Poll not found"}), 404
+    
+    # Rolled up from five-minute buckets; the vote table is never read
+    option_ids = [option[1] for option in option_rows]
+    return jsonify({
+        "poll_id": poll_id,
+        "bucket": resolution,
+        "options": [{"id": option[1], "text": option[2]} for option in option_rows],
+        "intervals": poll_timeline(poll_id, option_ids, RESOLUTIONS[resolution]),
+    }), 200
+
+@api.route('/api/votes/events', methods=['GET'])
+@query_budget(2)
+def tail_vote_events():
+    try:
+        after = int(request.args.get('after', 0))
+        limit = min(int(request.args.get('limit', 100)), MAX_TAIL_LIMIT)
+    except ValueError:
+        return jsonify({"error": "after and limit must be integers"}), 400
+    if after < 0 or limit < 1:
+        return jsonify({"error": "after must be non-negative and limit positive"}), 400
+    
+    # Events up to the checkpoint were folded away; the consumer has to resynchronize
+    folded_up_to = checkpoint_seq()
+    if after < folded_up_to:
+        return jsonify({
+            "error": "Events up to the checkpoint were compacted",
+            "checkpoint_seq": folded_up_to
+        }), 410
+    
+    events = events_after(after, limit)
+    return jsonify({
+        "events": events,
+        "next_after": events[-1]["seq"] if events else after
+    }), 200
+
+@api.route('/api/polls/<poll_id>/stream', methods=['GET'])
+@query_budget(2)
+def stream_poll(poll_id):
+    # Subscribe before reading the snapshot so no vote falls between the two
+    subscription = hub.subscribe(poll_id)
+    poll_row, option_rows, _ = load_poll(poll_id)
+    if not poll_row:
+        hub.unsubscribe(subscription)
+        return jsonify({"error": "Poll not found"}), 404
+    
+    snapshot = {option_id: votes for _, option_id, _, votes in option_rows}
+    response = Response(
+        stream_tallies(
+            subscription,
+            snapshot,
+            coalesce_interval=current_app.config['SSE_COALESCE_SECONDS'],
+            heartbeat_interval=current_app.config['SSE_HEARTBEAT_SECONDS'],
+        ),
+        mimetype='text/event-stream',
     )
-    db.session.add(new_vote)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    # The generator's own cleanup never runs if the client leaves before the first chunk
+    response.call_on_close(lambda: hub.unsubscribe(subscription))
+    return response
+
+def _chat_int(name, default, minimum=0):
+    """Integer query parameter of a chat endpoint; raises ValueError when malformed"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    value = int(value)
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+@api.route('/api/groups/<group_id>/messages', methods=['POST'])
+@query_budget(3)
+@validate_json(MESSAGE_SCHEMA)
+def send_message(group_id):
+    data = request.json
+    sender_id = data.get('sender_id')
+    poll_id = data.get('poll_id')
+    
+    if not is_member(group_id, sender_id):
+        if not group_exists(group_id):
+            return jsonify({"error": "Group not found"}), 404
+        return jsonify({"error": "Only group members can send messages"}), 403
+    if poll_id and not poll_in_group(poll_id, group_id):
+        return jsonify({"error": "Poll not found in this group"}), 404
+    
+    # seq is allocated inside the INSERT, so the commit fixes the message's place in the chat
+    message = post_message(group_id, sender_id, data['content'], poll_id)
     db.session.commit()
     
-    # Format response with updated poll data
-    options_data = []
-    for opt in poll.options:
-        votes = [vote.user_id for vote in opt.votes]
-        options_data.append({
-            "id": opt.id,
-            "text": opt.text,
-            "votes": votes
-        })
-    
-    response = {
-        "id": poll.id,
-        "group_id": poll.group_id,
-        "question": poll.title,
-        "options": options_data,
-        "creator_id": poll.creator_id,
-        "created_at": poll.created_at.isoformat() if poll.created_at else None,
-        "expire_at": poll.expire_at.isoformat() if poll.expire_at else None,
-        "active": is_active
-    }
+    # Wake this process's readers of the group
+    channels.publish_message(message)
+    return jsonify(message), 201
+
+@api.route('/api/groups/<group_id>/messages', methods=['GET'])
+@query_budget(3)
+def get_messages(group_id):
+    try:
+        before = _chat_int('before', None, minimum=1)
+        limit = min(_chat_int('limit', DEFAULT_HISTORY_LIMIT, minimum=1), MAX_HISTORY_LIMIT)
+    except ValueError:
+        return jsonify({"error": "before and limit must be positive integers"}), 400
+    if not group_exists(group_id):
+        return jsonify({"error": "Group not found"}), 404
     
-    return jsonify(response), 200
+    # Newest page first; pass next_before back to read further into the past
+    messages, next_before = load_history(group_id, before, limit)
+    return jsonify({"messages": messages, "next_before": next_before}), 200
+
+@api.route('/api/groups/<group_id>/messages/updates', methods=['GET'])
+@query_budget(5)
+def get_message_updates(group_id):
+    try:
+        after = _chat_int('after', 0)
+        limit = min(_chat_int('limit', MAX_HISTORY_LIMIT, minimum=1), MAX_HISTORY_LIMIT)
+        wait = min(float(request.args.get('wait', DEFAULT_WAIT_SECONDS)), MAX_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "after, limit and wait must be non-negative numbers"}), 400
+    # Followed groups are already known here, so a long poll usually runs no SQL at all
+    if not channel_group_exists(group_id):
+        return jsonify({"error": "Group not found"}), 404
+    
+    # Long poll: answers as soon as a message after `after` exists, or empty after `wait` seconds
+    messages = wait_for_messages(group_id, after, limit, max(0.0, wait))
+    return jsonify({
+        "messages": messages,
+        "last_seq": messages[-1]["seq"] if messages else after
+    }), 200
+
+@api.route('/api/groups/<group_id>/messages/stream', methods=['GET'])
+@query_budget(5)
+def stream_group_messages(group_id):
+    # A reconnecting browser says where it stopped with Last-Event-ID
+    try:
+        after = request.headers.get('Last-Event-ID') or request.args.get('after')
+        after = int(after) if after else None
+    except ValueError:
+        return jsonify({"error": "after must be an integer"}), 400
+    if not channel_group_exists(group_id):
+        return jsonify({"error": "Group not found"}), 404
+    
+    events, leave = open_message_stream(
+        group_id, after, heartbeat_interval=current_app.config['SSE_HEARTBEAT_SECONDS']
+    )
+    response = Response(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    # The generator's own cleanup never runs if the client leaves before the first chunk
+    response.call_on_close(leave)
+    return response
+
+@api.route('/api/groups/<group_id>/messages/<int:seq>/reactions/<emoji>', methods=['PUT', 'DELETE'])
+@query_budget(4)
+@validate_json(REACTION_SCHEMA)
+def react_to_message(group_id, seq, emoji):
+    user_id = request.json['user_id']
+    if len(emoji) > MAX_EMOJI_LENGTH:
+        return jsonify({"error": f"Reaction must be at most {MAX_EMOJI_LENGTH} characters"}), 400
+    if not message_exists(group_id, seq):
+        return jsonify({"error": "Message not found"}), 404
+    if not is_member(group_id, user_id):
+        return jsonify({"error": "Only group members can react"}), 403
+    
+    # One counter per emoji; a repeated PUT or DELETE from the same user leaves it unchanged
+    if request.method == 'PUT':
+        count = add_reaction(group_id, seq, emoji, user_id)
+    else:
+        count = remove_reaction(group_id, seq, emoji, user_id)
+    db.session.commit()
+    
+    channels.publish_reaction(group_id, seq, emoji, count)
+    return jsonify({"group_id": group_id, "seq": seq, "emoji": emoji, "count": count}), 200
+
+# CLI commands
+@api.cli.command('rebuild-tallies')
+def rebuild_tallies_command():
+    """Rebuild stored vote tallies from the vote table"""
+    corrected = rebuild_tallies()
+    click.echo(f"Rebuilt vote tallies: {corrected} option(s) corrected")
+
+@api.cli.command('close-expired-polls')
+def close_expired_polls_command():
+    """Close expired polls and freeze their final results"""
+    closed = close_expired_polls()
+    click.echo(f"Closed {closed} expired poll(s)")
+
+@api.cli.command('rebuild-vote-timeline')
+def rebuild_vote_timeline_command():
+    """Rebuild the vote timeline buckets from the vote table"""
+    buckets = rebuild_vote_buckets()
+    click.echo(f"Rebuilt vote timeline: {buckets} bucket(s)")
+
+@api.cli.command('compact-vote-log')
+@click.option('--retention-hours', type=float, default=None,
+              help="Keep events this recent (default VOTE_LOG_RETENTION_HOURS)")
+def compact_vote_log_command(retention_hours):
+    """Fold old vote events into the checkpoint"""
+    if retention_hours is None:
+        retention_hours = current_app.config['VOTE_LOG_RETENTION_HOURS']
+    folded = compact_vote_log(timedelta(hours=retention_hours))
+    click.echo(f"Folded {folded} vote event(s) into the checkpoint (now at seq {checkpoint_seq()})")
+
+@api.cli.command('replay-votes')
+@click.option('--apply', is_flag=True, help="Replace the vote table, tallies and timelines with the replayed state")
+def replay_votes_command(apply):
+    """Rebuild votes from the vote event log, or report drift without --apply"""
+    report = replay_votes(apply=apply)
+    click.echo(
+        f"Replayed {report['votes']} vote(s): {report['missing']} missing, "
+        f"{report['extra']} extra, {report['different']} different in the vote table"
+    )
+    if apply:
+        click.echo("Vote table, tallies and timelines rebuilt from the log")
+
+@api.cli.command('rebuild-feeds')
+def rebuild_feeds_command():
+    """Rebuild every user's home feed from group memberships"""
+    entries = rebuild_feeds(current_app.config['FEED_FANOUT_MAX_MEMBERS'])
+    click.echo(f"Rebuilt home feeds: {entries} entries")
+
+@api.cli.command('deliver-notifications')
+def deliver_notifications_command():
+    """Fan queued notification events out to group members now"""
+    delivered = deliver_notifications()
+    click.echo(f"Delivered {delivered} notification event(s)")
+
+@api.cli.command('rebuild-notification-counters')
+def rebuild_notification_counters_command():
+    """Recompute every user's unread notification count"""
+    users = rebuild_unread_counters()
+    click.echo(f"Rebuilt unread counters: {users} user(s) with unread notifications")
+
+@api.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the user search index from the user table"""
+    rebuild_search_index(db.session.connection())
+    db.session.commit()
+    click.echo("Rebuilt user search index")
 
 if __name__ == '__main__':
+    # Development server only; production runs serve.py
     port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    debug = os.getenv('FLASK_DEBUG', '1').lower() not in ('0', 'false', 'no')
+    create_app().run(host='0.0.0.0', port=port, debug=debug)
 #final
\ No newline at end of file
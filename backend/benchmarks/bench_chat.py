@@ -0,0 +1,204 @@
+"""
+Group chat fan-out benchmark for Project Bolt
+
+Thousands of reader threads follow the same group chat while one writer per
+group posts messages at a fixed rate through POST /api/groups/<id>/messages.
+Readers use the long poll (GET .../messages/updates?wait=...) or the SSE
+stream (GET .../messages/stream), or each in turn with --mode both. Each
+message carries its send time, so every reader measures its own delivery
+latency.
+
+For each mode the script reports deliveries per second, p50/p99/max delivery
+latency, messages missed or delivered twice, and the SQL statements that the
+readers ran per delivery. That last number should stay near zero however
+many readers there are, since they all share one in-memory channel per
+group.
+
+Everything runs in one process on a scratch database with throttling off.
+Reader threads get small stacks (--stack-kb), so thousands of them fit in
+memory.
+
+Usage:
+    python benchmarks/bench_chat.py [--readers 2000] [--groups 1] [--messages 200] [--rate 20]
+        [--mode both|longpoll|sse]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def prepare(app, db, group_ids):
+    """A writer and the groups it posts to"""
+    from sqlalchemy import insert
+    from models import Group, User, group_members
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(User.__table__), [
+            {"id": "writer", "username": "writer", "email": "writer@example.com", "password": "x"}
+        ])
+        db.session.execute(insert(Group.__table__), [
+            {"id": group_id, "name": group_id, "description": "", "creator_id": "writer"} for group_id in group_ids
+        ])
+        db.session.execute(insert(group_members), [
+            {"group_id": group_id, "user_id": "writer"} for group_id in group_ids
+        ])
+        db.session.commit()
+        db.session.remove()
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 1)
+
+
+def long_poll_reader(client, group_id, messages, deadline, received):
+    after = 0
+    while after < messages and time.monotonic() < deadline:
+        response = client.get(f"/api/groups/{group_id}/messages/updates?after={after}&wait=5")
+        if response.status_code != 200:
+            continue
+        now = time.perf_counter()
+        for message in response.json["messages"]:
+            received.append((message["seq"], now - float(message["content"])))
+        after = response.json["last_seq"]
+
+
+def sse_reader(client, group_id, messages, deadline, received):
+    after = 0
+    while after < messages and time.monotonic() < deadline:
+        # A dropped stream resumes where it stopped, as a browser would
+        response = client.get(f"/api/groups/{group_id}/messages/stream", headers={'Last-Event-ID': str(after)})
+        try:
+            for chunk in response.response:
+                if isinstance(chunk, bytes):
+                    chunk = chunk.decode()
+                if not chunk.startswith('id: '):
+                    continue
+                message = json.loads(chunk.split('\ndata: ', 1)[1])
+                received.append((message["seq"], time.perf_counter() - float(message["content"])))
+                after = message["seq"]
+                if after >= messages or time.monotonic() >= deadline:
+                    break
+        finally:
+            response.close()
+
+
+def run_mode(app, mode, group_ids, readers, messages, rate):
+    """Start every reader, then send; returns the mode's results"""
+    from chat import channels
+    from query_budget import record_queries
+
+    read = long_poll_reader if mode == 'longpoll' else sse_reader
+    deadline = time.monotonic() + messages / rate + 60
+    deliveries, statements = [], []
+    lock = threading.Lock()
+
+    def reader(group_id):
+        received = []
+        with record_queries() as queries:
+            read(app.test_client(), group_id, messages, deadline, received)
+        with lock:
+            deliveries.append(received)
+            statements.append(len(queries))
+
+    threads = [threading.Thread(target=reader, args=(group_id,), daemon=True)
+               for group_id in group_ids for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    # Send only once every reader is waiting in its group's channel
+    while sum(channels.get(group_id).readers for group_id in group_ids) < len(threads):
+        if time.monotonic() > deadline:
+            raise SystemExit("Readers did not all connect")
+        time.sleep(0.05)
+
+    send_latencies = []
+
+    def writer(group_id):
+        client = app.test_client()
+        started = time.perf_counter()
+        for n in range(messages):
+            time.sleep(max(0.0, started + n / rate - time.perf_counter()))
+            sent = time.perf_counter()
+            response = client.post(f"/api/groups/{group_id}/messages",
+                                   json={"sender_id": "writer", "content": repr(sent)})
+            if response.status_code != 201:
+                raise SystemExit(f"Sending failed with HTTP {response.status_code}")
+            send_latencies.append(time.perf_counter() - sent)
+
+    started = time.perf_counter()
+    writers = [threading.Thread(target=writer, args=(group_id,)) for group_id in group_ids]
+    for thread in writers:
+        thread.start()
+    for thread in writers + threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for received in deliveries for _, latency in received)
+    expected = messages * len(threads)
+    missing = sum(len(set(range(1, messages + 1)) - {seq for seq, _ in received}) for received in deliveries)
+    missing += len(threads) - len(deliveries)  # Readers still running at the deadline
+    duplicates = sum(len(received) - len({seq for seq, _ in received}) for received in deliveries)
+    return {
+        "mode": mode,
+        "deliveries": len(latencies),
+        "expected": expected,
+        "missing": missing,
+        "duplicates": duplicates,
+        "deliveries_per_s": round(len(latencies) / elapsed),
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+        "send_p50_ms": percentile(sorted(send_latencies), 0.50),
+        "reader_sql": sum(statements),
+        "reader_sql_per_delivery": round(sum(statements) / max(1, len(latencies)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=2000, help="Readers per group")
+    parser.add_argument('--groups', type=int, default=1)
+    parser.add_argument('--messages', type=int, default=200, help="Messages sent to each group")
+    parser.add_argument('--rate', type=float, default=20, help="Messages per second per group")
+    parser.add_argument('--mode', choices=('both', 'longpoll', 'sse'), default='both')
+    parser.add_argument('--stack-kb', type=int, default=256, help="Stack size of each reader thread")
+    args = parser.parse_args()
+
+    # Point the app at a scratch database before it is imported; one process, so no sync job
+    path = os.path.join(tempfile.mkdtemp(prefix='bolt-chat-'), 'bench.db')
+    os.environ.update(DATABASE_URL=f"sqlite:///{path}", THROTTLE_ENABLED='0', CHAT_SYNC_INTERVAL='0',
+                      METRICS_ENABLED='0')
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    app.logger.disabled = True
+    modes = ['longpoll', 'sse'] if args.mode == 'both' else [args.mode]
+    # Separate groups per mode, so each mode starts with fresh channels
+    groups = {mode: [f"{mode}-{i}" for i in range(args.groups)] for mode in modes}
+    prepare(app, db, [group_id for group_ids in groups.values() for group_id in group_ids])
+    threading.stack_size(args.stack_kb * 1024)
+
+    print(f"{args.readers} readers x {args.groups} group(s), {args.messages} messages per group "
+          f"at {args.rate:g}/s, {os.cpu_count()} CPUs\n")
+    print(f"{'mode':<9} {'deliveries':>11} {'missing':>8} {'dupes':>6} {'per s':>8} {'p50 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8} {'send ms':>8} {'SQL/delivery':>13}")
+    for mode in modes:
+        result = run_mode(app, mode, groups[mode], args.readers, args.messages, args.rate)
+        print(f"{mode:<9} {result['deliveries']:>11} {result['missing']:>8} {result['duplicates']:>6} "
+              f"{result['deliveries_per_s']:>8} {result['p50_ms']!s:>8} {result['p99_ms']!s:>8} "
+              f"{result['max_ms']!s:>8} {result['send_p50_ms']!s:>8} {result['reader_sql_per_delivery']:>13}")
+
+
+if __name__ == '__main__':
+    main()
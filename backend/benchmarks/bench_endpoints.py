@@ -0,0 +1,506 @@
+"""
+Endpoint load test for Project Bolt
+
+Builds a scratch database from the migrations and fills it with a synthetic
+dataset from seed.py. Concurrent client threads then drive every API route
+with a weighted mix of reads and writes. Polls are picked with the same Zipf
+skew the dataset uses, so hot polls get most of the traffic. The script
+reports throughput and p50/p95/p99 latency per endpoint and saves the numbers
+as JSON.
+
+Pass --baseline with a JSON file from an earlier run to compare against it.
+The script exits with status 1 if any endpoint's p95 latency or throughput
+got worse by more than --tolerance.
+
+Throttling is off, since every simulated client shares one address. Every
+/api route must have a request builder in REQUESTS and a weight in each mix,
+so new routes cannot silently go unmeasured.
+
+Usage:
+    python benchmarks/bench_endpoints.py [--mix mixed|read|write] [--threads 8] [--seconds 20]
+        [--users 20000 --groups 2000 --polls 10000 --votes 500000 --messages 50000
+         --friendships 100000] [--output results.json]
+        [--baseline baseline.json] [--tolerance 0.2]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PASSWORD = 'password123'
+
+# Relative request rates per endpoint; every mix covers every route
+MIXES = {
+    'read': {
+        'health_check': 1, 'get_metrics': 1, 'login': 1, 'register': 1, 'update_profile': 1, 'search_users': 10,
+        'get_groups': 8, 'get_user_groups': 10, 'get_user_feed': 20, 'create_group': 1, 'get_group': 35,
+        'create_poll': 1, 'vote_poll': 5, 'vote_poll_batch': 1, 'get_poll_timeline': 10, 'tail_vote_events': 5,
+        'stream_poll': 5, 'send_message': 2, 'get_messages': 10, 'get_message_updates': 10,
+        'stream_group_messages': 3, 'react_to_message': 2, 'get_notifications': 10, 'get_unread_count': 20,
+        'mark_notifications_read': 2, 'mark_all_notifications_read': 1, 'get_friends': 8,
+        'get_friend_requests': 5, 'send_friend_request': 1, 'accept_friend_request': 1, 'delete_friend_request': 1,
+        'delete_friend': 1, 'get_mutual_friends': 8, 'get_friend_suggestions': 5,
+    },
+    'mixed': {
+        'health_check': 1, 'get_metrics': 1, 'login': 2, 'register': 1, 'update_profile': 2, 'search_users': 8,
+        'get_groups': 5, 'get_user_groups': 8, 'get_user_feed': 12, 'create_group': 2, 'get_group': 25,
+        'create_poll': 3, 'vote_poll': 25, 'vote_poll_batch': 2, 'get_poll_timeline': 6, 'tail_vote_events': 5,
+        'stream_poll': 5, 'send_message': 5, 'get_messages': 8, 'get_message_updates': 8,
+        'stream_group_messages': 3, 'react_to_message': 4, 'get_notifications': 8, 'get_unread_count': 15,
+        'mark_notifications_read': 3, 'mark_all_notifications_read': 2, 'get_friends': 5,
+        'get_friend_requests': 3, 'send_friend_request': 3, 'accept_friend_request': 2, 'delete_friend_request': 1,
+        'delete_friend': 1, 'get_mutual_friends': 5, 'get_friend_suggestions': 3,
+    },
+    'write': {
+        'health_check': 1, 'get_metrics': 1, 'login': 2, 'register': 3, 'update_profile': 5, 'search_users': 2,
+        'get_groups': 2, 'get_user_groups': 2, 'get_user_feed': 3, 'create_group': 5, 'get_group': 10,
+        'create_poll': 8, 'vote_poll': 50, 'vote_poll_batch': 5, 'get_poll_timeline': 2, 'tail_vote_events': 2,
+        'stream_poll': 1, 'send_message': 10, 'get_messages': 2, 'get_message_updates': 2,
+        'stream_group_messages': 1, 'react_to_message': 5, 'get_notifications': 2, 'get_unread_count': 5,
+        'mark_notifications_read': 3, 'mark_all_notifications_read': 2, 'get_friends': 2,
+        'get_friend_requests': 2, 'send_friend_request': 8, 'accept_friend_request': 5, 'delete_friend_request': 2,
+        'delete_friend': 2, 'get_mutual_friends': 2, 'get_friend_suggestions': 1,
+    },
+}
+
+
+class Dataset:
+    """Ids the request builders draw from, read once after generation"""
+
+    def __init__(self, db, users, seed):
+        from sqlalchemy import text
+
+        self.users = users
+        self.group_ids = db.session.execute(text("SELECT id FROM \"group\" ORDER BY id")).scalars().all()
+        options = {}
+        for poll_id, option_id in db.session.execute(text(
+            "SELECT poll_option.poll_id, poll_option.id FROM poll_option "
+            "JOIN poll ON poll.id = poll_option.poll_id "
+            "WHERE poll.closed_at IS NULL AND poll.expire_at > datetime('now', 'localtime') "
+            "ORDER BY poll_option.poll_id, poll_option.id"
+        )):
+            options.setdefault(poll_id, []).append(option_id)
+        self.polls = list(options.items())
+        if not self.polls:
+            raise SystemExit("The dataset has no open polls to vote on; raise --polls")
+        # Members of groups with a chat, and each chat's last seq when the run starts
+        self.chat_members = db.session.execute(text(
+            "SELECT group_members.group_id, group_members.user_id, chats.last_seq FROM group_members "
+            "JOIN (SELECT group_id, max(seq) AS last_seq FROM chat_message GROUP BY group_id) AS chats "
+            "ON chats.group_id = group_members.group_id ORDER BY group_members.group_id, group_members.user_id"
+        )).all()
+        if not self.chat_members:
+            raise SystemExit("The dataset has no chat messages; raise --messages")
+        self.notifications = db.session.execute(text("SELECT max(id) FROM notification")).scalar() or 1
+        # Each side of a friendship once, and pending requests; accepting or removing one uses it up
+        self.friendships = db.session.execute(text(
+            "SELECT user_id, friend_id FROM friendship WHERE user_id < friend_id ORDER BY user_id, friend_id"
+        )).all()
+        self.friend_requests = db.session.execute(text(
+            "SELECT sender_id, recipient_id FROM friend_request ORDER BY sender_id, recipient_id"
+        )).all()
+        if not self.friendships or not self.friend_requests:
+            raise SystemExit("The dataset has no friendships or friend requests; raise --friendships")
+        self.seed = seed
+
+
+class Client:
+    """One simulated client thread: its own rng, test client and counters"""
+
+    def __init__(self, app, dataset, index, skew):
+        from seed import ZipfSampler
+
+        self.rng = random.Random(dataset.seed * 1000 + index)
+        self.http = app.test_client()
+        self.data = dataset
+        self.hot_polls = ZipfSampler(len(dataset.polls), skew, self.rng)
+        self.index = index
+        self.serial = itertools.count()
+
+    def user(self):
+        return self.rng.randrange(self.data.users)
+
+    def open_poll(self):
+        return self.data.polls[self.hot_polls.draw()]
+
+    def chat_member(self):
+        return self.rng.choice(self.data.chat_members)
+
+
+def request_login(client):
+    i = client.user()
+    return 'POST', '/api/auth/login', {"email": f"user{i}@example.com", "password": PASSWORD}
+
+
+def request_register(client):
+    name = f"bench{client.index}x{next(client.serial)}x{client.rng.getrandbits(32)}"
+    return 'POST', '/api/auth/register', {"email": f"{name}@example.com", "username": name, "password": PASSWORD}
+
+
+def request_update_profile(client):
+    return 'PUT', '/api/users/profile', {"id": f"user-{client.user():08d}", "bio": f"bio {client.rng.random()}"}
+
+
+def request_search_users(client):
+    # Typeahead: a prefix of a real username, two to five characters long
+    name = f"user{client.user()}"
+    return 'GET', f"/api/friends/search?query={name[:client.rng.randint(2, 5)]}", None
+
+
+def request_create_group(client):
+    return 'POST', '/api/groups', {
+        "name": f"Bench group {client.rng.getrandbits(32)}", "description": "",
+        "creator_id": f"user-{client.user():08d}",
+    }
+
+
+def request_create_poll(client):
+    return 'POST', f"/api/groups/{client.rng.choice(client.data.group_ids)}/polls", {
+        "question": "Benchmark poll?", "options": ["Yes", "No", "Maybe"],
+        "creator_id": f"user-{client.user():08d}",
+    }
+
+
+def request_vote_poll(client):
+    poll_id, option_ids = client.open_poll()
+    return 'POST', f"/api/polls/{poll_id}/vote", {
+        "user_id": f"user-{client.user():08d}", "option_id": client.rng.choice(option_ids),
+    }
+
+
+def request_vote_poll_batch(client):
+    poll_id, option_ids = client.open_poll()
+    return 'POST', f"/api/polls/{poll_id}/votes:batch", {"votes": [
+        {"user_id": f"user-{client.user():08d}", "option_id": client.rng.choice(option_ids)}
+        for _ in range(100)
+    ]}
+
+
+def request_get_poll_timeline(client):
+    bucket = client.rng.choice(('5m', '1h', '1d'))
+    return 'GET', f"/api/polls/{client.open_poll()[0]}/timeline?bucket={bucket}", None
+
+
+def request_mark_notifications_read(client):
+    # Ids of other users' notifications are simply not matched
+    return 'POST', f"/api/users/user-{client.user():08d}/notifications/read", {
+        "ids": [client.rng.randint(1, client.data.notifications) for _ in range(3)],
+    }
+
+
+def request_send_friend_request(client):
+    return 'POST', f"/api/users/user-{client.user():08d}/friend-requests", {
+        "recipient_id": f"user-{client.user():08d}",
+    }
+
+
+def request_accept_friend_request(client):
+    sender_id, recipient_id = client.rng.choice(client.data.friend_requests)
+    return 'POST', f"/api/users/{recipient_id}/friend-requests/{sender_id}/accept", None
+
+
+def request_delete_friend_request(client):
+    sender_id, recipient_id = client.rng.choice(client.data.friend_requests)
+    return 'DELETE', f"/api/users/{recipient_id}/friend-requests/{sender_id}", None
+
+
+def request_delete_friend(client):
+    user_id, friend_id = client.rng.choice(client.data.friendships)
+    return 'DELETE', f"/api/users/{user_id}/friends/{friend_id}", None
+
+
+def request_get_mutual_friends(client):
+    # A page of people, e.g. a group's member list, annotated with mutual friend counts
+    others = ",".join(f"user-{client.user():08d}" for _ in range(20))
+    return 'GET', f"/api/users/user-{client.user():08d}/mutual-friends?with={others}", None
+
+
+def request_send_message(client):
+    group_id, user_id, _ = client.chat_member()
+    return 'POST', f"/api/groups/{group_id}/messages", {"sender_id": user_id, "content": "Benchmark message"}
+
+
+def request_get_messages(client):
+    group_id, _, last_seq = client.chat_member()
+    # Mostly the latest page, sometimes an older one
+    before = f"&before={client.rng.randint(1, last_seq)}" if client.rng.random() < 0.3 else ""
+    return 'GET', f"/api/groups/{group_id}/messages?limit=50{before}", None
+
+
+def request_get_message_updates(client):
+    # A client catching up after a short absence; wait=0 so the request does not block
+    group_id, _, last_seq = client.chat_member()
+    return 'GET', f"/api/groups/{group_id}/messages/updates?after={max(0, last_seq - 10)}&wait=0", None
+
+
+def request_stream_group_messages(client):
+    group_id, _, last_seq = client.chat_member()
+    return 'GET', f"/api/groups/{group_id}/messages/stream?after={last_seq}", None
+
+
+def request_react_to_message(client):
+    group_id, user_id, last_seq = client.chat_member()
+    method = client.rng.choice(('PUT', 'PUT', 'DELETE'))
+    emoji = client.rng.choice(('👍', '❤️', '😂'))
+    return method, f"/api/groups/{group_id}/messages/{client.rng.randint(1, last_seq)}/reactions/{emoji}", {
+        "user_id": user_id,
+    }
+
+
+REQUESTS = {
+    'health_check': lambda client: ('GET', '/api/health', None),
+    'get_metrics': lambda client: ('GET', '/api/metrics', None),
+    'login': request_login,
+    'register': request_register,
+    'update_profile': request_update_profile,
+    'search_users': request_search_users,
+    'get_groups': lambda client: ('GET', '/api/groups?limit=20', None),
+    'get_user_groups': lambda client: ('GET', f"/api/users/user-{client.user():08d}/groups", None),
+    'get_user_feed': lambda client: ('GET', f"/api/users/user-{client.user():08d}/feed?limit=20", None),
+    'get_notifications': lambda client: (
+        'GET', f"/api/users/user-{client.user():08d}/notifications?limit=20", None,
+    ),
+    'get_unread_count': lambda client: ('GET', f"/api/users/user-{client.user():08d}/notifications/unread", None),
+    'mark_notifications_read': request_mark_notifications_read,
+    'mark_all_notifications_read': lambda client: (
+        'POST', f"/api/users/user-{client.user():08d}/notifications/read-all", None,
+    ),
+    'get_friends': lambda client: ('GET', f"/api/users/user-{client.user():08d}/friends?limit=20", None),
+    'get_friend_requests': lambda client: ('GET', f"/api/users/user-{client.user():08d}/friend-requests", None),
+    'send_friend_request': request_send_friend_request,
+    'accept_friend_request': request_accept_friend_request,
+    'delete_friend_request': request_delete_friend_request,
+    'delete_friend': request_delete_friend,
+    'get_mutual_friends': request_get_mutual_friends,
+    'get_friend_suggestions': lambda client: (
+        'GET', f"/api/users/user-{client.user():08d}/friend-suggestions?limit=10", None,
+    ),
+    'create_group': request_create_group,
+    'get_group': lambda client: ('GET', f"/api/groups/{client.rng.choice(client.data.group_ids)}", None),
+    'create_poll': request_create_poll,
+    'vote_poll': request_vote_poll,
+    'vote_poll_batch': request_vote_poll_batch,
+    'get_poll_timeline': request_get_poll_timeline,
+    'tail_vote_events': lambda client: ('GET', '/api/votes/events?after=0&limit=100', None),
+    # Time to the first event (the snapshot); the stream is closed right after
+    'stream_poll': lambda client: ('GET', f"/api/polls/{client.open_poll()[0]}/stream", None),
+    'send_message': request_send_message,
+    'get_messages': request_get_messages,
+    'get_message_updates': request_get_message_updates,
+    'react_to_message': request_react_to_message,
+    # Time to the first chunk; the stream is closed right after
+    'stream_group_messages': request_stream_group_messages,
+}
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list, in milliseconds"""
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 2)
+
+
+def build_database(app, args):
+    """Migrate a scratch database and fill it with a synthetic dataset"""
+    from flask_migrate import upgrade
+    from extensions import db
+    from seed import generate_dataset
+
+    with app.app_context():
+        upgrade(directory=os.path.join(BACKEND_DIR, 'migrations'))
+        counts = generate_dataset(
+            users=args.users, groups=args.groups, polls=args.polls, votes=args.votes, messages=args.messages,
+            friendships=args.friendships, poll_skew=args.poll_skew, seed=args.seed, log=lambda message: None,
+        )
+        dataset = Dataset(db, args.users, args.seed)
+        db.session.remove()
+    return counts, dataset
+
+
+def run_load(app, dataset, mix, threads, seconds, warmup, skew):
+    """Drive the app from many threads; returns per-endpoint latencies and statuses"""
+    endpoints = list(MIXES[mix])
+    weights = list(itertools.accumulate(MIXES[mix][endpoint] for endpoint in endpoints))
+    latencies = {endpoint: [] for endpoint in endpoints}
+    statuses = {endpoint: {} for endpoint in endpoints}
+    lock = threading.Lock()
+    started = time.monotonic()
+    measure_from = started + warmup
+    deadline = measure_from + seconds
+
+    def drive(index):
+        client = Client(app, dataset, index, skew)
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            endpoint = client.rng.choices(endpoints, cum_weights=weights)[0]
+            method, url, body = REQUESTS[endpoint](client)
+            start = time.perf_counter()
+            response = client.http.open(url, method=method, json=body)
+            if endpoint in ('stream_poll', 'stream_group_messages') and response.status_code == 200:
+                next(response.response)
+            response.close()
+            elapsed = time.perf_counter() - start
+            if now < measure_from:
+                continue
+            with lock:
+                latencies[endpoint].append(elapsed)
+                statuses[endpoint][response.status_code] = statuses[endpoint].get(response.status_code, 0) + 1
+
+    app.logger.disabled = True
+    workers = [threading.Thread(target=drive, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, statuses
+
+
+def summarize(latencies, statuses, seconds):
+    """Throughput and latency percentiles per endpoint, plus the total"""
+    endpoints = {}
+    for endpoint, samples in latencies.items():
+        samples.sort()
+        codes = statuses[endpoint]
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "errors": sum(count for code, count in codes.items() if code >= 400),
+            "statuses": {str(code): count for code, count in sorted(codes.items())},
+            "rps": round(len(samples) / seconds, 1),
+            "p50_ms": percentile(samples, 0.50),
+            "p95_ms": percentile(samples, 0.95),
+            "p99_ms": percentile(samples, 0.99),
+        }
+    every = sorted(itertools.chain.from_iterable(latencies.values()))
+    total = {
+        "requests": len(every),
+        "errors": sum(result["errors"] for result in endpoints.values()),
+        "rps": round(len(every) / seconds, 1),
+        "p50_ms": percentile(every, 0.50),
+        "p95_ms": percentile(every, 0.95),
+        "p99_ms": percentile(every, 0.99),
+    }
+    return endpoints, total
+
+
+def compare(results, baseline, tolerance, min_requests):
+    """Print changes against a baseline run; returns the endpoints that regressed
+
+    Endpoints with fewer than `min_requests` samples in either run are too
+    noisy to judge and are only listed.
+    """
+    regressions = []
+    print(f"\nAgainst baseline from {baseline['started_at']} (tolerance {tolerance:.0%})")
+    print(f"{'endpoint':<28} {'base rps':>8} {'change':>7} {'base p95':>10} {'change':>7}")
+    rows = dict(results["endpoints"], TOTAL=results["total"])
+    old_rows = dict(baseline["endpoints"], TOTAL=baseline["total"])
+    for endpoint, result in rows.items():
+        old = old_rows.get(endpoint)
+        if not old or not old["p95_ms"] or not result["p95_ms"] or not old["rps"]:
+            continue
+        rps_change = result["rps"] / old["rps"] - 1
+        p95_change = result["p95_ms"] / old["p95_ms"] - 1
+        if min(old["requests"], result["requests"]) < min_requests:
+            note = "  (too few requests)"
+        elif rps_change < -tolerance or p95_change > tolerance:
+            note = "  REGRESSION"
+            regressions.append(endpoint)
+        else:
+            note = ""
+        print(f"{endpoint:<28} {old['rps']:>8} {rps_change:>+7.0%} {old['p95_ms']:>10} {p95_change:>+7.0%}{note}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', choices=sorted(MIXES), default='mixed')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=2, help="Seconds of load before measuring")
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--groups', type=int, default=2000)
+    parser.add_argument('--polls', type=int, default=10000)
+    parser.add_argument('--votes', type=int, default=500000)
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--friendships', type=int, default=100000)
+    parser.add_argument('--poll-skew', type=float, default=1.1, help="Zipf exponent of poll popularity")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--profile', default=os.environ.get('DB_PROFILE', 'production'),
+                        help="Engine profile (see engine_profile.py)")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare against the JSON results of an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Relative p95 or throughput change that counts as a regression")
+    parser.add_argument('--min-requests', type=int, default=50,
+                        help="Fewest requests per endpoint for a comparison to count")
+    args = parser.parse_args()
+
+    # Point the app at a scratch database before it is imported
+    path = os.path.join(tempfile.mkdtemp(prefix='bolt-endpoints-'), 'bench.db')
+    os.environ.update(DATABASE_URL=f"sqlite:///{path}", DB_PROFILE=args.profile, THROTTLE_ENABLED='0')
+    from app import create_app
+
+    app = create_app()
+    missing = {
+        rule.endpoint.removeprefix('api.') for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')
+    }
+    missing -= set(REQUESTS)
+    missing |= {f"{endpoint} (mix {mix})" for mix, weights in MIXES.items() for endpoint in REQUESTS
+                if endpoint not in weights}
+    if missing:
+        raise SystemExit(f"No benchmark request for: {', '.join(sorted(missing))}")
+
+    print(f"Generating {args.users} users, {args.groups} groups, {args.polls} polls, {args.votes} votes...")
+    built = time.monotonic()
+    counts, dataset = build_database(app, args)
+    print(f"Built in {time.monotonic() - built:.1f}s; {len(dataset.polls)} open polls\n")
+
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    latencies, statuses = run_load(app, dataset, args.mix, args.threads, args.seconds, args.warmup, args.poll_skew)
+    endpoints, total = summarize(latencies, statuses, args.seconds)
+
+    print(f"{args.mix} mix, {args.threads} threads, {args.seconds:g}s, {os.cpu_count()} CPUs\n")
+    print(f"{'endpoint':<28} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, result in dict(endpoints, TOTAL=total).items():
+        print(f"{endpoint:<28} {result['requests']:>9} {result['errors']:>7} {result['rps']:>8} "
+              f"{result['p50_ms']!s:>8} {result['p95_ms']!s:>8} {result['p99_ms']!s:>8}")
+
+    results = {
+        "started_at": started_at,
+        "config": {
+            "mix": args.mix, "threads": args.threads, "seconds": args.seconds, "warmup": args.warmup,
+            "profile": args.profile, "seed": args.seed, "poll_skew": args.poll_skew,
+            "dataset": {"users": args.users, "groups": args.groups, "polls": args.polls, "votes": args.votes,
+                        "messages": args.messages},
+            "rows": counts, "cpus": os.cpu_count(), "python": platform.python_version(),
+        },
+        "endpoints": endpoints,
+        "total": total,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"]["mix"] != args.mix or baseline["config"]["dataset"] != results["config"]["dataset"]:
+            print("\nWarning: the baseline used a different mix or dataset")
+        if compare(results, baseline, args.tolerance, args.min_requests):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
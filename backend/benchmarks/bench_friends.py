@@ -0,0 +1,166 @@
+"""
+Friend graph benchmark for Project Bolt
+
+Builds a synthetic dataset of users, groups and friendships from seed.py
+and measures the friend endpoints in-process:
+- mutual friend counts for --batch users at a time
+  (GET /api/users/<id>/mutual-friends), with the friend set cache warm and
+  with it emptied before every request. For comparison it also runs the
+  same counts as one self-join of friendship per pair, which is what the
+  endpoint would do without cached friend sets;
+- friend suggestions (GET /api/users/<id>/friend-suggestions), computed
+  in bulk. For comparison it also runs them one candidate at a time: for
+  every co-member, check friendship and pending requests, then count
+  mutual friends.
+
+Usage:
+    python benchmarks/bench_friends.py [--users 20000] [--groups 2000] [--friendships 200000]
+        [--requests 300] [--batch 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PAIR_MUTUALS = (
+    "SELECT count(*) FROM friendship AS mine JOIN friendship AS theirs ON theirs.friend_id = mine.friend_id "
+    "WHERE mine.user_id = :user_id AND theirs.user_id = :other_id"
+)
+
+
+def percentile(ordered, fraction):
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 2)
+
+
+def timed(calls):
+    """Run each call once; returns sorted latencies"""
+    latencies = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    return sorted(latencies)
+
+
+def naive_suggestions(db, user_id, limit):
+    """Suggestions one candidate at a time, as a loop over co-members would compute them"""
+    from sqlalchemy import text
+
+    candidates = db.session.execute(text(
+        "SELECT DISTINCT theirs.user_id FROM group_members AS mine "
+        "JOIN group_members AS theirs ON theirs.group_id = mine.group_id "
+        "WHERE mine.user_id = :user_id AND theirs.user_id != :user_id"
+    ), {"user_id": user_id}).scalars().all()
+    ranked = []
+    for candidate in candidates:
+        pair = {"user_id": user_id, "other_id": candidate}
+        if db.session.execute(text(
+            "SELECT 1 FROM friendship WHERE user_id = :user_id AND friend_id = :other_id"
+        ), pair).first():
+            continue
+        if db.session.execute(text(
+            "SELECT 1 FROM friend_request WHERE (sender_id = :user_id AND recipient_id = :other_id) "
+            "OR (sender_id = :other_id AND recipient_id = :user_id)"
+        ), pair).first():
+            continue
+        shared = db.session.execute(text(
+            "SELECT count(*) FROM group_members AS mine JOIN group_members AS theirs "
+            "ON theirs.group_id = mine.group_id WHERE mine.user_id = :user_id AND theirs.user_id = :other_id"
+        ), pair).scalar()
+        ranked.append((-db.session.execute(text(PAIR_MUTUALS), pair).scalar(), -shared, candidate))
+    return sorted(ranked)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--groups', type=int, default=2000)
+    parser.add_argument('--friendships', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=300, help="Requests per measurement")
+    parser.add_argument('--batch', type=int, default=20, help="Users per mutual-friends request")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Point the app at a scratch database before it is imported
+    path = os.path.join(tempfile.mkdtemp(prefix='bolt-friends-'), 'bench.db')
+    os.environ.update(DATABASE_URL=f"sqlite:///{path}", THROTTLE_ENABLED='0', METRICS_ENABLED='0',
+                      NOTIFICATION_INTERVAL='0', POLL_EXPIRY_INTERVAL='0')
+    from flask_migrate import upgrade
+    from sqlalchemy import text
+    from app import create_app
+    from extensions import db
+    from friends import friend_set_cache
+    from query_budget import record_queries
+    from seed import generate_dataset
+
+    app = create_app()
+    with app.app_context():
+        upgrade(directory=os.path.join(BACKEND_DIR, 'migrations'))
+        counts = generate_dataset(users=args.users, groups=args.groups, polls=10, votes=0,
+                                  friendships=args.friendships, seed=args.seed, log=lambda message: None)
+        db.session.remove()
+    client = app.test_client()
+    rng = random.Random(args.seed)
+
+    def user():
+        return f"user-{rng.randrange(args.users):08d}"
+
+    lookups = [(user(), [user() for _ in range(args.batch)]) for _ in range(args.requests)]
+
+    def mutual_request(user_id, others):
+        return lambda: client.get(f"/api/users/{user_id}/mutual-friends?with={','.join(others)}")
+
+    def cold_request(user_id, others):
+        def call():
+            friend_set_cache.clear()
+            client.get(f"/api/users/{user_id}/mutual-friends?with={','.join(others)}")
+        return call
+
+    def pair_queries(user_id, others):
+        def call():
+            with app.app_context():
+                for other_id in others:
+                    db.session.execute(text(PAIR_MUTUALS), {"user_id": user_id, "other_id": other_id}).scalar()
+                db.session.remove()
+        return call
+
+    # Warm the cache with one pass, then measure
+    timed(mutual_request(*lookup) for lookup in lookups)
+    with record_queries() as queries:
+        warm = timed(mutual_request(*lookup) for lookup in lookups)
+    cold = timed(cold_request(*lookup) for lookup in lookups)
+    pairs = timed(pair_queries(*lookup) for lookup in lookups)
+
+    print(f"{counts['users']} users, {counts['memberships']} memberships, {counts['friendships']} friendships, "
+          f"{os.cpu_count()} CPUs\n")
+    print(f"mutual friends for {args.batch} users per request, {args.requests} requests")
+    print(f"  cached friend sets      p50 {percentile(warm, 0.5)} ms, p99 {percentile(warm, 0.99)} ms, "
+          f"{len(queries) / args.requests:.1f} SQL per request")
+    print(f"  cold cache              p50 {percentile(cold, 0.5)} ms, p99 {percentile(cold, 0.99)} ms")
+    print(f"  one self-join per pair  p50 {percentile(pairs, 0.5)} ms, p99 {percentile(pairs, 0.99)} ms\n")
+
+    users = [user() for _ in range(min(args.requests, 100))]
+
+    def naive(user_id):
+        def call():
+            with app.app_context():
+                naive_suggestions(db, user_id, 10)
+                db.session.remove()
+        return call
+
+    bulk = timed((lambda user_id=user_id: client.get(f"/api/users/{user_id}/friend-suggestions?limit=10"))
+                 for user_id in users)
+    one_by_one = timed(naive(user_id) for user_id in users)
+    print(f"friend suggestions, {len(users)} users")
+    print(f"  bulk                    p50 {percentile(bulk, 0.5)} ms, p99 {percentile(bulk, 0.99)} ms")
+    print(f"  one candidate at a time p50 {percentile(one_by_one, 0.5)} ms, p99 {percentile(one_by_one, 0.99)} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Login throughput benchmark for Project Bolt
+
+Runs a login storm against POST /api/auth/login for each combination of
+password hash method and pool size (see passwords.py), and reports the logins
+per second one worker process sustains. It also reports the median and p95
+latency of successful logins and how many requests were shed with a 503.
+A health-check thread runs next to the storm to show whether other requests
+still get through. Each setting runs in its own process against a fresh
+scratch database.
+
+Usage:
+    python benchmarks/bench_login.py [--threads 16] [--seconds 5] [--workers 0,4]
+        [--methods pbkdf2:sha256:600000,scrypt:32768:8:1,scrypt:16384:8:1]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+USERS = 200
+PASSWORD = 'correct horse battery staple'
+
+
+def prepare(app, db):
+    """Users whose stored hashes already use the configured method"""
+    from sqlalchemy import insert
+    from models import User
+    from passwords import hasher
+
+    with app.app_context():
+        db.create_all()
+        password_hash = hasher.hash(PASSWORD)
+        db.session.execute(insert(User.__table__), [
+            {"id": f"user{i}", "username": f"user{i}", "email": f"user{i}@example.com", "password": password_hash}
+            for i in range(USERS)
+        ])
+        db.session.commit()
+        db.session.remove()
+
+
+def run_storm(threads, seconds):
+    """Drive logins from many threads; runs inside the per-setting process"""
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+
+    prepare(app, db)
+    latencies, health = [], []
+    counts = {"ok": 0, "shed": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def login(index):
+        client = app.test_client()
+        i = index
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            response = client.post('/api/auth/login', json={
+                "email": f"user{i % USERS}@example.com", "password": PASSWORD,
+            })
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code == 200:
+                    counts["ok"] += 1
+                    latencies.append(elapsed)
+                elif response.status_code == 503:
+                    counts["shed"] += 1
+                else:
+                    counts["errors"] += 1
+            if response.status_code == 503:
+                time.sleep(0.05)
+            i += threads
+
+    def check_health():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            client.get('/api/health')
+            health.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    workers = [threading.Thread(target=login, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=check_health))
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    latencies.sort()
+    counts["logins_per_sec"] = round(counts["ok"] / seconds, 1)
+    counts["p50_ms"] = round(statistics.median(latencies) * 1000, 1) if latencies else None
+    counts["p95_ms"] = round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None
+    counts["health_p95_ms"] = round(sorted(health)[int(len(health) * 0.95)] * 1000, 1) if health else None
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', default=f"0,{min(4, os.cpu_count() or 1)}",
+                        help="comma-separated PASSWORD_HASH_WORKERS values")
+    parser.add_argument('--methods', default='pbkdf2:sha256:600000,scrypt:32768:8:1,scrypt:16384:8:1')
+    parser.add_argument('--queue-limit', type=int, default=32)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_storm(args.threads, args.seconds)))
+        return
+
+    print(f"{args.threads} login threads, {args.seconds:g}s per setting, {os.cpu_count()} CPUs\n")
+    print(f"{'method':<22} {'workers':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'shed':>6} {'health p95 ms':>14}")
+    for method in args.methods.split(','):
+        for workers in args.workers.split(','):
+            path = os.path.join(tempfile.mkdtemp(prefix='bolt-login-'), 'bench.db')
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{path}",
+                PASSWORD_HASH_METHOD=method,
+                PASSWORD_HASH_WORKERS=workers,
+                PASSWORD_HASH_QUEUE_LIMIT=str(args.queue_limit),
+                THROTTLE_ENABLED='0',  # Every simulated client shares one address
+            )
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child',
+                 '--threads', str(args.threads), '--seconds', str(args.seconds)],
+                cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{method:<22} {workers:>7} {result['logins_per_sec']:>9} {result['p50_ms']!s:>8} "
+                  f"{result['p95_ms']!s:>8} {result['shed']:>6} {result['health_p95_ms']!s:>14}")
+
+
+if __name__ == '__main__':
+    main()
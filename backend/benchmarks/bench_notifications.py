@@ -0,0 +1,144 @@
+"""
+Notification fan-out benchmark for Project Bolt
+
+Creates polls through POST /api/groups/<id>/polls in a group of --members
+members and reports:
+- create_poll latency, which now only queues one outbox event per poll;
+- how long the delivery job takes to fan those events out, in events and
+  notification rows per second;
+- for comparison, the same fan-out written the naive way, one INSERT and
+  one counter UPDATE per member, as create_poll would have to run inline.
+It then casts --votes votes one by one on a single poll. Those queue one
+event per vote milestone, and every member ends up with a single
+coalesced "N new votes" notification.
+
+Usage:
+    python benchmarks/bench_notifications.py [--members 500] [--polls 200] [--votes 1000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def prepare(app, db, members):
+    """One group with `members` members"""
+    from sqlalchemy import insert
+    from models import Group, User, group_members
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(User.__table__), [
+            {"id": f"member{i}", "username": f"member{i}", "email": f"member{i}@example.com", "password": "x"}
+            for i in range(members)
+        ])
+        db.session.execute(insert(Group.__table__), [
+            {"id": "group", "name": "Benchmark group", "description": "", "creator_id": "member0"}
+        ])
+        db.session.execute(insert(group_members), [
+            {"group_id": "group", "user_id": f"member{i}"} for i in range(members)
+        ])
+        db.session.commit()
+        db.session.remove()
+
+
+def naive_fan_out(db, poll_id, members, now):
+    """One notification INSERT and one counter UPDATE per member, as an inline fan-out would do"""
+    from sqlalchemy import text
+
+    for i in range(1, members):
+        db.session.execute(text(
+            "INSERT INTO notification (user_id, kind, group_id, poll_id, count, created_at, updated_at) "
+            "VALUES (:user_id, 'poll_created', 'group', :poll_id, 1, :now, :now)"
+        ), {"user_id": f"member{i}", "poll_id": poll_id, "now": now})
+        db.session.execute(text(
+            "INSERT INTO notification_counter (user_id, unread) VALUES (:user_id, 1) "
+            "ON CONFLICT (user_id) DO UPDATE SET unread = unread + 1"
+        ), {"user_id": f"member{i}"})
+    db.session.commit()
+
+
+def percentile(ordered, fraction):
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--polls', type=int, default=200)
+    parser.add_argument('--votes', type=int, default=1000, help="Votes cast one by one on a single poll")
+    args = parser.parse_args()
+
+    # Point the app at a scratch database before it is imported; delivery only runs when called here
+    path = os.path.join(tempfile.mkdtemp(prefix='bolt-notifications-'), 'bench.db')
+    os.environ.update(DATABASE_URL=f"sqlite:///{path}", THROTTLE_ENABLED='0', NOTIFICATION_INTERVAL='0',
+                      POLL_EXPIRY_INTERVAL='0', METRICS_ENABLED='0')
+    from datetime import datetime
+    from sqlalchemy import text
+    from app import create_app
+    from extensions import db
+    from notifications import deliver_notifications
+
+    app = create_app()
+    prepare(app, db, args.members)
+    client = app.test_client()
+
+    latencies, poll_ids = [], []
+    for i in range(args.polls):
+        started = time.perf_counter()
+        response = client.post('/api/groups/group/polls', json={
+            "question": f"Poll {i}?", "options": ["Yes", "No"], "creator_id": "member0",
+        })
+        latencies.append(time.perf_counter() - started)
+        poll_ids.append(response.json["id"])
+    latencies.sort()
+
+    with app.app_context():
+        started = time.perf_counter()
+        events = deliver_notifications()
+        delivery = time.perf_counter() - started
+        rows = db.session.execute(text("SELECT count(*) FROM notification")).scalar()
+
+        # The same rows again, one statement per member per poll
+        db.session.execute(text("DELETE FROM notification"))
+        db.session.execute(text("DELETE FROM notification_counter"))
+        db.session.commit()
+        started = time.perf_counter()
+        for poll_id in poll_ids:
+            naive_fan_out(db, poll_id, args.members, datetime.now())
+        naive = time.perf_counter() - started
+        db.session.remove()
+
+    print(f"{args.polls} polls in a group of {args.members} members, {os.cpu_count()} CPUs\n")
+    print(f"create_poll             p50 {percentile(latencies, 0.5)} ms, p99 {percentile(latencies, 0.99)} ms "
+          f"(queues one event)")
+    print(f"batched delivery        {events} events, {rows} notifications in {delivery:.2f}s: "
+          f"{events / delivery:,.0f} events/s, {rows / delivery:,.0f} notifications/s")
+    print(f"per-member inserts      {naive:.2f}s: {rows / naive:,.0f} notifications/s, "
+          f"{naive / args.polls * 1000:.1f} ms that each create_poll would spend writing them\n")
+
+    poll_id = poll_ids[0]
+    option_id = client.get('/api/groups/group').json["polls"][0]["options"][0]["id"]
+    with app.app_context():
+        queued = db.session.execute(text("SELECT count(*) FROM notification_event")).scalar()
+        db.session.remove()
+    for i in range(min(args.votes, args.members)):
+        client.post(f"/api/polls/{poll_id}/vote", json={"user_id": f"member{i}", "option_id": option_id})
+    with app.app_context():
+        queued = db.session.execute(text("SELECT count(*) FROM notification_event")).scalar() - queued
+        deliver_notifications()
+        notification = db.session.execute(text(
+            "SELECT count(*), max(count) FROM notification WHERE kind = 'poll_votes' AND user_id = 'member1'"
+        )).one()
+        db.session.remove()
+    print(f"{min(args.votes, args.members)} votes on one poll queued {queued} milestone events; member1 has "
+          f"{notification[0]} vote notification with a count of {notification[1]}")
+
+
+if __name__ == '__main__':
+    main()
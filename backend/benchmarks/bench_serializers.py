@@ -0,0 +1,189 @@
+"""
+Serializer microbenchmark for Project Bolt
+
+Measures the cost of building one group payload (members, polls, options)
+and one poll payload at realistic sizes, comparing:
+
+- orm:           ORM instances, dicts built by hand, stdlib json (the
+                 pre-serializers code path)
+- tuple+stdlib:  column tuples through serializers.py, stdlib json
+- tuple+orjson:  column tuples through serializers.py, orjson
+
+"load+encode" timings include the database queries against a scratch SQLite
+database; "encode" timings start from rows already in memory.
+
+Usage:
+    python benchmarks/bench_serializers.py [--members 50] [--polls 20] [--options 4] [--repeat 300]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_scratch = tempfile.mkdtemp(prefix='bolt-serializers-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_scratch, 'bench.db')
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, Group, Poll, PollOption, group_members  # noqa: E402
+import serializers  # noqa: E402
+from serializers import (OPTION_COLUMNS, POLL_COLUMNS, json_bytes, load_group_detail,  # noqa: E402
+                         load_poll, poll_dict)
+
+app = create_app()
+
+
+def build(members, polls, options):
+    now = datetime.now()
+    db.create_all()
+    db.session.execute(insert(User.__table__), [
+        {"id": f"user{i}", "username": f"user{i}", "email": f"user{i}@example.com",
+         "password": "x", "bio": "", "avatar": f"https://example.com/avatars/{i}.jpg"}
+        for i in range(members)
+    ])
+    db.session.execute(insert(Group.__table__), [{
+        "id": "group1", "name": "Benchmark group", "description": "A group of realistic size",
+        "creator_id": "user0", "created_at": now,
+    }])
+    db.session.execute(insert(group_members), [
+        {"group_id": "group1", "user_id": f"user{i}"} for i in range(members)
+    ])
+    db.session.execute(insert(Poll.__table__), [{
+        "id": f"poll{p}", "title": f"Question number {p}?", "description": "Pick one",
+        "group_id": "group1", "creator_id": f"user{p % members}",
+        "created_at": now, "expire_at": now + timedelta(days=7),
+    } for p in range(polls)])
+    db.session.execute(insert(PollOption.__table__), [
+        {"id": f"poll{p}-option{o}", "poll_id": f"poll{p}", "text": f"Option {o}", "vote_count": o * 7}
+        for p in range(polls) for o in range(options)
+    ])
+    db.session.commit()
+
+
+def legacy_poll(poll):
+    return {
+        "id": poll.id,
+        "title": poll.title,
+        "description": poll.description,
+        "group_id": poll.group_id,
+        "creator_id": poll.creator_id,
+        "created_at": poll.created_at.isoformat() if poll.created_at else None,
+        "expire_at": poll.expire_at.isoformat() if poll.expire_at else None,
+        "options": [
+            {"id": option.id, "text": option.text, "votes": option.vote_count}
+            for option in poll.options
+        ],
+    }
+
+
+def legacy_group(group_id):
+    """The ORM-based group serializer that serializers.py replaced"""
+    group = db.session.get(Group, group_id, options=[db.selectinload(Group.members)])
+    polls = Poll.query.filter_by(group_id=group_id).all()
+    return json.dumps({
+        "id": group.id,
+        "name": group.name,
+        "description": group.description,
+        "creator_id": group.creator_id,
+        "created_at": group.created_at.isoformat() if group.created_at else None,
+        "members": [
+            {"id": m.id, "username": m.username, "email": m.email, "avatar": m.avatar}
+            for m in group.members
+        ],
+        "polls": [legacy_poll(poll) for poll in polls],
+    }).encode()
+
+
+def timed(fn, repeat, fresh_session=True):
+    """Median microseconds per call; the session is reset so ORM paths pay their full load cost"""
+    samples = []
+    for _ in range(repeat):
+        if fresh_session:
+            db.session.expunge_all()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def with_backend(use_orjson, fn):
+    def run():
+        serializers.OrjsonProvider.enabled = use_orjson
+        return fn()
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=50)
+    parser.add_argument('--polls', type=int, default=20)
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=300)
+    args = parser.parse_args()
+
+    if serializers.orjson is None:
+        print("orjson is not installed; tuple+orjson falls back to stdlib json")
+
+    with app.app_context():
+        build(args.members, args.polls, args.options)
+        now = datetime.now()
+
+        # Rows already in memory, for the encode-only measurements
+        orm_poll = db.session.get(Poll, 'poll0')
+        orm_poll.options  # noqa: B018 - load before timing
+        poll_row = db.session.execute(db.select(*POLL_COLUMNS).where(Poll.id == 'poll0')).first()
+        option_rows = db.session.execute(
+            db.select(*OPTION_COLUMNS).where(PollOption.poll_id == 'poll0')
+        ).all()
+        group_payload = load_group_detail('group1')
+
+        rows = [
+            ("group  load+encode", {
+                "orm": lambda: legacy_group('group1'),
+                "tuple+stdlib": with_backend(False, lambda: json_bytes(load_group_detail('group1'))),
+                "tuple+orjson": with_backend(True, lambda: json_bytes(load_group_detail('group1'))),
+            }, True),
+            ("group  encode", {
+                "orm": None,
+                "tuple+stdlib": with_backend(False, lambda: json_bytes(group_payload)),
+                "tuple+orjson": with_backend(True, lambda: json_bytes(group_payload)),
+            }, False),
+            ("poll   load+encode", {
+                "orm": lambda: json.dumps(legacy_poll(db.session.get(Poll, 'poll0'))).encode(),
+                "tuple+stdlib": with_backend(False, lambda: json_bytes(poll_dict(*load_poll('poll0')))),
+                "tuple+orjson": with_backend(True, lambda: json_bytes(poll_dict(*load_poll('poll0')))),
+            }, True),
+            ("poll   encode", {
+                "orm": lambda: json.dumps(legacy_poll(orm_poll)).encode(),
+                "tuple+stdlib": with_backend(False, lambda: json_bytes(poll_dict(poll_row, option_rows, now=now))),
+                "tuple+orjson": with_backend(True, lambda: json_bytes(poll_dict(poll_row, option_rows, now=now))),
+            }, False),
+        ]
+
+        print(f"{args.members} members, {args.polls} polls x {args.options} options, "
+              f"median of {args.repeat} runs (microseconds)\n")
+        print(f"{'':20} {'orm':>10} {'tuple+stdlib':>14} {'tuple+orjson':>14}")
+        for label, variants, fresh_session in rows:
+            cells = []
+            for name in ("orm", "tuple+stdlib", "tuple+orjson"):
+                fn = variants[name]
+                cells.append(f"{timed(fn, args.repeat, fresh_session):.1f}" if fn else "-")
+            print(f"{label:20} {cells[0]:>10} {cells[1]:>14} {cells[2]:>14}")
+
+        size = len(json_bytes(group_payload))
+        print(f"\ngroup payload: {size} bytes")
+    serializers.OrjsonProvider.enabled = True
+
+
+if __name__ == '__main__':
+    main()
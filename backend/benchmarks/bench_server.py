@@ -0,0 +1,198 @@
+"""
+Server benchmark for Project Bolt
+
+Compares the single-process development server (`python app.py`) against
+serve.py with several worker and thread counts. Every server runs as its own
+process on the same scratch database, which holds a synthetic dataset from
+seed.py. Client processes send real HTTP requests: group pages, votes on
+hot polls and user searches. The script reports requests per second,
+p50/p95/p99 latency and errors for each server.
+
+Usage:
+    python benchmarks/bench_server.py [--servers dev,1x8,2x8,4x4] [--clients 16] [--seconds 10]
+        [--preload] [--users 5000 --groups 500 --polls 2000 --votes 100000]
+
+A server spec "WxT" means serve.py with W workers of T threads each.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Share of requests per kind; votes go to hot polls first
+MIX = (('group', 0.6), ('vote', 0.3), ('search', 0.1))
+
+
+def build_database(path, args):
+    """Migrate the scratch database and fill it with a synthetic dataset"""
+    from flask_migrate import upgrade
+    from app import create_app
+    from seed import generate_dataset
+
+    app = create_app()
+    with app.app_context():
+        upgrade(directory=os.path.join(BACKEND_DIR, 'migrations'))
+        generate_dataset(users=args.users, groups=args.groups, polls=args.polls, votes=args.votes,
+                         seed=args.seed, log=lambda message: None)
+
+    connection = sqlite3.connect(path)
+    group_ids = [row[0] for row in connection.execute('SELECT id FROM "group"')]
+    polls = {}
+    for poll_id, option_id in connection.execute(
+        "SELECT poll_option.poll_id, poll_option.id FROM poll_option JOIN poll ON poll.id = poll_option.poll_id "
+        "WHERE poll.closed_at IS NULL AND poll.expire_at > datetime('now', 'localtime')"
+    ):
+        polls.setdefault(poll_id, []).append(option_id)
+    connection.close()
+    return group_ids, sorted(polls.items())
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def start_server(spec, port, env, preload):
+    """Launch one server process and wait until it answers"""
+    if spec == 'dev':
+        command = [sys.executable, 'app.py']
+        env = dict(env, PORT=str(port), FLASK_DEBUG='0')
+    else:
+        workers, threads = spec.split('x')
+        command = [sys.executable, 'serve.py', '--bind', f"127.0.0.1:{port}",
+                   '--workers', workers, '--threads', threads] + (['--preload'] if preload else [])
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f"Server {spec} did not start")
+
+
+def client(port, group_ids, polls, users, seed, deadline, results):
+    """One client process: a request at a time until the deadline"""
+    from seed import ZipfSampler
+
+    rng = random.Random(seed)
+    hot_polls = ZipfSampler(len(polls), 1.1, rng)
+    kinds = [kind for kind, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    latencies, errors = [], 0
+    while time.monotonic() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        body = None
+        if kind == 'group':
+            method, url = 'GET', f"/api/groups/{rng.choice(group_ids)}"
+        elif kind == 'vote':
+            poll_id, option_ids = polls[hot_polls.draw()]
+            method, url = 'POST', f"/api/polls/{poll_id}/vote"
+            body = json.dumps({"user_id": f"user-{rng.randrange(users):08d}", "option_id": rng.choice(option_ids)})
+        else:
+            method, url = 'GET', f"/api/friends/search?query=user{rng.randrange(100)}"
+        start = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            connection.request(method, url, body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status >= 400:
+                errors += 1
+        except OSError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    results.put((latencies, errors))
+
+
+def run_load(port, group_ids, polls, args):
+    """Drive one server from --clients processes; returns its summary"""
+    deadline = time.monotonic() + args.seconds
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(target=client, args=(
+            port, group_ids, polls, args.users, args.seed * 1000 + i, deadline, results,
+        ))
+        for i in range(args.clients)
+    ]
+    for process in clients:
+        process.start()
+    latencies, errors = [], 0
+    for _ in clients:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for process in clients:
+        process.join()
+
+    latencies.sort()
+
+    def percentile(fraction):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 1)
+
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / args.seconds, 1),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', default='dev,1x8,2x8,4x4')
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent client processes")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--preload', action='store_true', help="Pass --preload to serve.py")
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--groups', type=int, default=500)
+    parser.add_argument('--polls', type=int, default=2000)
+    parser.add_argument('--votes', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='bolt-server-'), 'bench.db')
+    # Every client shares one address, so leave throttling off; the database is shared by all workers
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", DB_PROFILE='production', THROTTLE_ENABLED='0')
+    os.environ.update(env)
+    group_ids, polls = build_database(path, args)
+    if not polls:
+        raise SystemExit("The dataset has no open polls to vote on; raise --polls")
+
+    print(f"{args.clients} clients, {args.seconds:g}s per server, {os.cpu_count()} CPUs\n")
+    print(f"{'server':<8} {'requests':>9} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for spec in args.servers.split(','):
+        port = free_port()
+        server = start_server(spec, port, env, args.preload)
+        try:
+            result = run_load(port, group_ids, polls, args)
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+        print(f"{spec:<8} {result['requests']:>9} {result['rps']:>8} {result['p50_ms']:>8} "
+              f"{result['p95_ms']:>8} {result['p99_ms']:>8} {result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+SQLite write concurrency benchmark for Project Bolt
+
+Runs the same mixed workload under each engine profile (see
+engine_profile.py): writer threads cast votes through POST /api/polls/<id>/vote
+while reader threads load the group page. Each profile runs in its own
+process against a fresh scratch database, and the script reports vote
+throughput, read throughput and how many requests failed with
+"database is locked".
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py [--writers 8] [--readers 8] [--seconds 10]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+VOTERS = 2000
+
+
+def prepare(app, db):
+    """Sample data plus a large pool of voters"""
+    from sqlalchemy import insert
+    from models import User
+    from seed import create_users, create_groups, create_polls
+
+    with app.app_context():
+        db.create_all()
+        users = create_users()
+        groups = create_groups(users)
+        create_polls(groups, users)
+        db.session.execute(insert(User.__table__), [
+            {"id": f"voter{i}", "username": f"voter{i}", "email": f"voter{i}@example.com", "password": "x"}
+            for i in range(VOTERS)
+        ])
+        db.session.commit()
+        db.session.remove()
+
+
+def run_workload(writers, readers, seconds):
+    """Drive the app from many threads; runs inside the per-profile process"""
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+
+    prepare(app, db)
+    counts = {"votes_ok": 0, "reads_ok": 0, "locked": 0, "other_errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def record(response, ok_key):
+        body = response.get_data(as_text=True)
+        with lock:
+            if response.status_code == 200:
+                counts[ok_key] += 1
+            elif 'locked' in body:
+                counts["locked"] += 1
+            else:
+                counts["other_errors"] += 1
+
+    def writer(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            response = client.post('/api/polls/poll1/vote', json={
+                "user_id": f"voter{rng.randrange(VOTERS)}",
+                "option_id": rng.choice(["option1", "option2", "option3"]),
+            })
+            record(response, "votes_ok")
+
+    def reader():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            record(client.get('/api/groups/group1'), "reads_ok")
+
+    # Lock errors surface as 500s; keep their tracebacks out of the report
+    app.logger.disabled = True
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counts["votes_per_sec"] = round(counts["votes_ok"] / seconds, 1)
+    counts["reads_per_sec"] = round(counts["reads_ok"] / seconds, 1)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--profiles', default='development,production')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_workload(args.writers, args.readers, args.seconds)))
+        return
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per profile\n")
+    print(f"{'profile':<12} {'votes/s':>9} {'reads/s':>9} {'locked':>8} {'other':>7}")
+    for profile in args.profiles.split(','):
+        path = os.path.join(tempfile.mkdtemp(prefix='bolt-concurrency-'), 'bench.db')
+        # Every simulated client shares one address, so leave throttling off
+        env = dict(os.environ, DB_PROFILE=profile, DATABASE_URL=f"sqlite:///{path}", THROTTLE_ENABLED='0')
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child',
+             '--writers', str(args.writers), '--readers', str(args.readers), '--seconds', str(args.seconds)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{profile:<12} {result['votes_per_sec']:>9} {result['reads_per_sec']:>9} "
+              f"{result['locked']:>8} {result['other_errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
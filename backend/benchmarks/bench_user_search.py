@@ -0,0 +1,114 @@
+"""
+User search keystroke benchmark for Project Bolt
+
+Builds a scratch SQLite database with a large user table (one million users
+by default) and replays typeahead sessions against the indexed search in
+search.py: for each sampled username it issues one query per keystroke, plus
+substring and email-domain queries. The old unbounded ILIKE '%query%' search
+is timed on a few keystrokes for comparison.
+
+Usage:
+    python benchmarks/bench_user_search.py [--users 1000000] [--sessions 200] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text
+
+from models import User
+from search import find_users
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'jo', 'an', 'el', 'sa', 'to', 'ne', 'vi', 'da', 'ri', 'mo', 'be', 'lu']
+DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'example.com', 'proton.me']
+LEGACY_SQL = text(
+    "SELECT id, username, email, avatar FROM user "
+    "WHERE lower(username) LIKE :pattern OR lower(email) LIKE :pattern"
+)
+
+
+def make_username(rng, index):
+    name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+    return f"{name}{index}"
+
+
+def build_database(engine, user_count, rng, batch_size=20000):
+    """Create the user table (with its search index) and fill it"""
+    User.__table__.create(engine)
+    usernames = []
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        for start in range(0, user_count, batch_size):
+            rows = []
+            for index in range(start, min(start + batch_size, user_count)):
+                username = make_username(rng, index)
+                usernames.append(username)
+                rows.append({
+                    "id": f"u{index}",
+                    "username": username,
+                    "email": f"{username}@{rng.choice(DOMAINS)}",
+                    "password": "x",
+                })
+            connection.execute(insert(User.__table__), rows)
+    print(f"Built {user_count:,} users with search index in {time.perf_counter() - started:.1f}s")
+    return usernames
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(label, samples):
+    print(f"{label:<28} n={len(samples):<6} p50={statistics.median(samples):7.3f}ms "
+          f"p95={percentile(samples, 0.95):7.3f}ms max={max(samples):7.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--sessions', type=int, default=200, help="typeahead sessions to replay")
+    parser.add_argument('--legacy-samples', type=int, default=10, help="ILIKE queries to time (slow)")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    path = os.path.join(tempfile.mkdtemp(prefix='bolt-search-'), 'search.db')
+    engine = create_engine(f"sqlite:///{path}")
+    usernames = build_database(engine, args.users, rng)
+
+    keystrokes, substrings, domains, legacy = [], [], [], []
+    with engine.connect() as connection:
+        for username in rng.sample(usernames, min(args.sessions, len(usernames))):
+            for length in range(2, len(username) + 1):
+                keystrokes.append(timed(lambda: find_users(connection, username[:length]))[0])
+            middle = username[1:5]
+            substrings.append(timed(lambda: find_users(connection, middle))[0])
+        for domain in DOMAINS:
+            domains.append(timed(lambda: find_users(connection, domain.split('.')[0]))[0])
+        for username in rng.sample(usernames, min(args.legacy_samples, len(usernames))):
+            pattern = f"%{username[:3]}%"
+            legacy.append(timed(lambda: connection.execute(LEGACY_SQL, {"pattern": pattern}).all())[0])
+
+    print()
+    report("prefix keystrokes", keystrokes)
+    report("substring (4 chars)", substrings)
+    report("email domain", domains)
+    report("legacy ILIKE '%q%'", legacy)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Request validation microbenchmark for Project Bolt
+
+Measures what validation adds to a request (see validation.py), in
+microseconds per call:
+- schema: Schema.validate() alone on a typical valid body of each endpoint;
+- decorated: @validate_json around an empty view inside a request context,
+  which includes parsing the JSON body;
+- parse only: request.get_json() in the same context, for comparison.
+
+It also shows the cost of refusing a body one byte over a schema's limit from
+the Content-Length header. For comparison, it times parsing that same body
+and parsing one at the global MAX_CONTENT_LENGTH.
+
+Usage:
+    python benchmarks/bench_validation.py [--number 20000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flask import Flask, request  # noqa: E402
+
+import validation  # noqa: E402
+from validation import validate_json  # noqa: E402
+
+BODIES = {
+    'LOGIN_SCHEMA': {"email": "john@example.com", "password": "password123"},
+    'REGISTER_SCHEMA': {"email": "jane@example.com", "username": "janedoe", "password": "password123"},
+    'PROFILE_SCHEMA': {"id": "user2", "bio": "Hello there"},
+    'GROUP_SCHEMA': {"name": "Movie Night", "description": "Weekly movies", "creator_id": "user1"},
+    'POLL_SCHEMA': {"question": "What should we watch?", "options": ["Inception", "Interstellar", "Dune", "Tenet"],
+                    "creator_id": "user1", "expire_days": 7},
+    'VOTE_SCHEMA': {"user_id": "user2", "option_id": "option3"},
+    'VOTE_BATCH_SCHEMA': {"votes": [{"user_id": f"user{i}", "option_id": "option3"} for i in range(500)]},
+}
+
+
+def per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=20000, help="Calls per measurement")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    validation.init_request_limits(app)
+
+    def view():
+        return "ok"
+
+    print(f"{'schema':<18} {'body bytes':>10} {'schema us':>10} {'decorated us':>13} {'parse only us':>14}")
+    for name, body in BODIES.items():
+        schema = getattr(validation, name)
+        number = max(1, args.number // 50) if name == 'VOTE_BATCH_SCHEMA' else args.number
+        raw = json.dumps(body)
+        decorated = validate_json(schema)(view)
+
+        def run_decorated():
+            with app.test_request_context(method='POST', data=raw, content_type='application/json'):
+                decorated()
+
+        def run_parse():
+            with app.test_request_context(method='POST', data=raw, content_type='application/json'):
+                request.get_json()
+
+        print(f"{name:<18} {len(raw):>10} {per_call_us(lambda: schema.validate(body), number):>10.2f} "
+              f"{per_call_us(run_decorated, number):>13.1f} {per_call_us(run_parse, number):>14.1f}")
+
+    # Oversized bodies: rejected from the header by init_request_limits' hook, or parsed in full
+    limit = validation.VOTE_SCHEMA.max_bytes
+    vote = validate_json(validation.VOTE_SCHEMA)(view)
+    app.add_url_rule('/vote', 'vote', vote, methods=['POST'])
+    print("\nOversized bodies")
+    overhead = len(json.dumps({"user_id": "user2", "option_id": ""}))
+    for size in (limit + 1, app.config['MAX_CONTENT_LENGTH']):
+        raw = json.dumps({"user_id": "user2", "option_id": "x" * (size - overhead)})
+
+        def run_rejected():
+            with app.test_request_context('/vote', method='POST', data=raw, content_type='application/json'):
+                app.preprocess_request() or vote()
+
+        def run_parse():
+            with app.test_request_context(method='POST', data=raw, content_type='application/json'):
+                request.get_json()
+
+        number = max(10, args.number // max(1, size // 1000))
+        print(f"{len(raw):>9} bytes: refused from Content-Length {per_call_us(run_rejected, number):>9.1f} us, "
+              f"parsing it {per_call_us(run_parse, number):>9.1f} us")
+
+
+if __name__ == '__main__':
+    main()
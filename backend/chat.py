@@ -0,0 +1,464 @@
+"""
+Group chat for Project Bolt
+
+Storage. Messages live in chat_message, a WITHOUT ROWID table keyed and
+clustered on (group_id, seq). seq counts a group's messages 1, 2, 3, ... in
+commit order. The INSERT allocates it as one more than the group's highest
+seq, which is a single seek on the key; SQLite runs one writer at a time, so
+two messages never share a number. New messages therefore land at the end of
+their group's key range, and every read is one range of that key:
+- history pages walk backwards with ?before=<seq>;
+- catching up walks forwards from ?after=<seq>.
+
+Reactions are one counter per (message, emoji) in chat_reaction, read
+together with the messages. chat_reaction_user records who reacted with
+what, so that the same reaction sent twice (a client re-rendering, a retry)
+is counted once. It is only touched when a reaction is added or removed.
+
+Delivery. Each process keeps a Channel per group that has readers: the
+group's latest CHAT_CHANNEL_SIZE messages in memory, plus recent reaction
+counts. send_message puts each new message into the channel after its
+commit and wakes the readers waiting there. All of a group's readers share
+that one copy, so a thousand readers cost no more database work than one:
+- GET .../messages/updates?after=<seq>&wait=<s> is a long poll. It returns
+  at once if there are newer messages, otherwise it waits up to `wait`
+  seconds for one. The view gives back its database connection and
+  throttling slot before it waits.
+- GET .../messages/stream is a Server-Sent Events stream of `message`
+  events (the event id is the seq) and `reaction` events. A browser that
+  reconnects sends Last-Event-ID and gets what it missed.
+The database is only read to fill a channel the first time a group is read,
+or for a reader so far behind that the channel no longer holds its next
+message.
+
+Messages sent through other worker processes reach a channel through the
+background sync job. Every CHAT_SYNC_INTERVAL seconds it reads the new
+messages of each group that has readers here, one range read per group,
+whatever the number of readers. Reaction events and the reaction counts on
+delivered messages only reflect reactions handled by the same process; the
+history endpoint always reads the stored counters.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import ChatMessage, ChatReaction, ChatReactionUser, Group, Poll, group_members
+from realtime import format_event
+from serializers import MESSAGE_COLUMNS, message_dict
+from throttling import release_concurrency_slot
+
+DEFAULT_HISTORY_LIMIT = 50
+MAX_HISTORY_LIMIT = 200
+DEFAULT_CHANNEL_SIZE = 500
+DEFAULT_WAIT_SECONDS = 25.0
+MAX_WAIT_SECONDS = 30.0
+MAX_EMOJI_LENGTH = 16
+# Channels without readers are dropped after this long
+CHANNEL_IDLE_SECONDS = 60.0
+# Messages held back behind a gap before a channel gives up and reloads
+MAX_PENDING = 1000
+
+message_table = ChatMessage.__table__
+reaction_table = ChatReaction.__table__
+reaction_user_table = ChatReactionUser.__table__
+
+
+def group_exists(group_id):
+    return db.session.execute(db.select(Group.id).where(Group.id == group_id)).first() is not None
+
+
+def is_member(group_id, user_id):
+    return db.session.execute(
+        db.select(group_members.c.user_id)
+        .where(group_members.c.group_id == group_id, group_members.c.user_id == user_id)
+    ).first() is not None
+
+
+def poll_in_group(poll_id, group_id):
+    return db.session.execute(
+        db.select(Poll.id).where(Poll.id == poll_id, Poll.group_id == group_id)
+    ).first() is not None
+
+
+def message_exists(group_id, seq):
+    return db.session.execute(
+        db.select(message_table.c.seq).where(message_table.c.group_id == group_id, message_table.c.seq == seq)
+    ).first() is not None
+
+
+def post_message(group_id, sender_id, content, poll_id=None, now=None):
+    """Append a message to a group's chat and return its payload (caller commits)"""
+    now = now or datetime.now()
+    next_seq = (
+        db.select(db.func.coalesce(db.func.max(message_table.c.seq), 0) + 1)
+        .where(message_table.c.group_id == group_id)
+        .scalar_subquery()
+    )
+    seq = db.session.execute(
+        db.insert(message_table)
+        .values(group_id=group_id, seq=next_seq, sender_id=sender_id, content=content,
+                poll_id=poll_id, created_at=now)
+        .returning(message_table.c.seq)
+    ).scalar_one()
+    return message_dict((group_id, seq, sender_id, content, poll_id, now), {})
+
+
+def _with_reactions(group_id, rows):
+    """Payloads for consecutive messages of one group, with their reaction counts in one range read"""
+    reactions = {row.seq: {} for row in rows}
+    if rows:
+        low, high = min(rows[0].seq, rows[-1].seq), max(rows[0].seq, rows[-1].seq)
+        counts = db.session.execute(
+            db.select(reaction_table.c.seq, reaction_table.c.emoji, reaction_table.c.count)
+            .where(reaction_table.c.group_id == group_id, reaction_table.c.seq.between(low, high),
+                   reaction_table.c.count > 0)
+        )
+        for seq, emoji, count in counts:
+            if seq in reactions:
+                reactions[seq][emoji] = count
+    return [message_dict(row, reactions[row.seq]) for row in rows]
+
+
+def load_history(group_id, before, limit):
+    """Messages before seq `before` (the latest when None), oldest first, and the cursor of the page before
+
+    At most two queries.
+    """
+    query = db.select(*MESSAGE_COLUMNS).where(message_table.c.group_id == group_id)
+    if before is not None:
+        query = query.where(message_table.c.seq < before)
+    rows = db.session.execute(query.order_by(message_table.c.seq.desc()).limit(limit + 1)).all()
+
+    next_before = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_before = rows[-1].seq
+    rows.reverse()
+    return _with_reactions(group_id, rows), next_before
+
+
+def load_messages_after(group_id, after, limit):
+    """Up to `limit` messages after seq `after`, oldest first, in at most two queries"""
+    rows = db.session.execute(
+        db.select(*MESSAGE_COLUMNS)
+        .where(message_table.c.group_id == group_id, message_table.c.seq > after)
+        .order_by(message_table.c.seq)
+        .limit(limit)
+    ).all()
+    return _with_reactions(group_id, rows)
+
+
+def reaction_count(group_id, seq, emoji):
+    return db.session.execute(
+        db.select(reaction_table.c.count).where(
+            reaction_table.c.group_id == group_id, reaction_table.c.seq == seq, reaction_table.c.emoji == emoji
+        )
+    ).scalar() or 0
+
+
+def add_reaction(group_id, seq, emoji, user_id):
+    """Count a user's reaction once; returns the emoji's count on the message (caller commits)"""
+    added = db.session.execute(
+        sqlite_insert(reaction_user_table)
+        .values(group_id=group_id, seq=seq, emoji=emoji, user_id=user_id)
+        .on_conflict_do_nothing()
+    ).rowcount
+    if not added:
+        return reaction_count(group_id, seq, emoji)
+    return db.session.execute(
+        sqlite_insert(reaction_table)
+        .values(group_id=group_id, seq=seq, emoji=emoji, count=1)
+        .on_conflict_do_update(
+            index_elements=['group_id', 'seq', 'emoji'], set_={'count': reaction_table.c.count + 1}
+        )
+        .returning(reaction_table.c.count)
+    ).scalar_one()
+
+
+def remove_reaction(group_id, seq, emoji, user_id):
+    """Take back a user's reaction; returns the emoji's count on the message (caller commits)"""
+    removed = db.session.execute(
+        db.delete(reaction_user_table).where(
+            reaction_user_table.c.group_id == group_id, reaction_user_table.c.seq == seq,
+            reaction_user_table.c.emoji == emoji, reaction_user_table.c.user_id == user_id,
+        )
+    ).rowcount
+    if not removed:
+        return reaction_count(group_id, seq, emoji)
+    return db.session.execute(
+        db.update(reaction_table)
+        .where(reaction_table.c.group_id == group_id, reaction_table.c.seq == seq,
+               reaction_table.c.emoji == emoji)
+        .values(count=reaction_table.c.count - 1)
+        .returning(reaction_table.c.count)
+    ).scalar_one()
+
+
+class Channel:
+    """The latest messages of one group in this process, shared by all of its readers"""
+
+    def __init__(self, group_id, size):
+        self.group_id = group_id
+        self.size = size
+        self.messages = deque(maxlen=size)  # Consecutive seqs, oldest first
+        self.last_seq = None                # Highest seq held; None until loaded
+        self.reaction_version = 0
+        self.readers = 0
+        self.active_at = time.monotonic()
+        self._pending = {}                  # seq -> message that arrived ahead of a missing one
+        self._reactions = deque(maxlen=size)  # (version, seq, emoji, count)
+        self._condition = threading.Condition()
+
+    def join(self):
+        """Count a reader in; returns the function that counts it out, safe to call twice"""
+        with self._condition:
+            self.readers += 1
+            self.active_at = time.monotonic()
+        left = []
+
+        def leave():
+            with self._condition:
+                if not left:
+                    left.append(True)
+                    self.readers -= 1
+                    self.active_at = time.monotonic()
+
+        return leave
+
+    def load(self, messages):
+        """Fill an empty channel with the group's latest messages from the database"""
+        with self._condition:
+            if self.last_seq is not None:
+                return
+            self.messages.extend(messages)
+            self.last_seq = messages[-1]["seq"] if messages else 0
+            self._advance()
+
+    def add(self, messages):
+        """Take newly committed messages, in any order, and wake the readers"""
+        with self._condition:
+            for message in messages:
+                if self.last_seq is None or message["seq"] > self.last_seq:
+                    self._pending[message["seq"]] = message
+            self._advance()
+
+    def _advance(self):
+        if self.last_seq is None:
+            if len(self._pending) > MAX_PENDING:
+                self._pending.clear()
+            return
+        start = self.last_seq
+        for seq in [seq for seq in self._pending if seq <= start]:
+            del self._pending[seq]
+        while self.last_seq + 1 in self._pending:
+            self.last_seq += 1
+            self.messages.append(self._pending.pop(self.last_seq))
+        if len(self._pending) > MAX_PENDING:
+            # A gap nothing filled (no sync job while other processes write): reload
+            self.messages.clear()
+            self._pending.clear()
+            self.last_seq = None
+            self._condition.notify_all()
+        elif self.last_seq != start:
+            self._condition.notify_all()
+
+    def covers(self, after):
+        """True when every message after seq `after` is held here"""
+        with self._condition:
+            return self.last_seq is not None and after >= self.last_seq - len(self.messages)
+
+    def read(self, after, limit):
+        """Up to `limit` messages after seq `after`, oldest first; None when they are not all held here"""
+        with self._condition:
+            if self.last_seq is None:
+                return None
+            first = self.last_seq - len(self.messages) + 1
+            if after < first - 1:
+                return None
+            start = max(0, after - first + 1)
+            return list(islice(self.messages, start, start + limit))
+
+    def react(self, seq, emoji, count):
+        """Record a reaction count change and wake the streaming readers"""
+        with self._condition:
+            self.reaction_version += 1
+            self._reactions.append((self.reaction_version, seq, emoji, count))
+            if self.last_seq is not None:
+                index = seq - (self.last_seq - len(self.messages) + 1)
+                if 0 <= index < len(self.messages):
+                    message = self.messages[index]
+                    reactions = dict(message["reactions"], **{emoji: count})
+                    message["reactions"] = {key: value for key, value in reactions.items() if value > 0}
+            self._condition.notify_all()
+
+    def reactions_after(self, version):
+        """Latest count of each reaction changed since `version`, and the version to continue from"""
+        with self._condition:
+            changes = {}
+            for change_version, seq, emoji, count in reversed(self._reactions):
+                if change_version <= version:
+                    break
+                changes.setdefault((seq, emoji), count)
+            current = self.reaction_version
+        changed = [{"seq": seq, "emoji": emoji, "count": count} for (seq, emoji), count in changes.items()]
+        return sorted(changed, key=lambda change: change["seq"]), current
+
+    def wait(self, after, reaction_version=None, timeout=None):
+        """Block until there is a message after `after` (or a newer reaction), or the timeout passes"""
+        def ready():
+            if self.last_seq is None or self.last_seq > after:
+                return True
+            return reaction_version is not None and self.reaction_version > reaction_version
+
+        with self._condition:
+            return self._condition.wait_for(ready, timeout)
+
+
+class ChannelRegistry:
+    """This process's channels, keyed by group id"""
+
+    def __init__(self, size=DEFAULT_CHANNEL_SIZE):
+        self.size = size
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def get(self, group_id):
+        with self._lock:
+            channel = self._channels.get(group_id)
+            if channel is None:
+                channel = self._channels[group_id] = Channel(group_id, self.size)
+            return channel
+
+    def is_loaded(self, group_id):
+        channel = self._channels.get(group_id)
+        return channel is not None and channel.last_seq is not None
+
+    def publish_message(self, message):
+        """Hand a committed message to its group's channel, if the group has one here"""
+        channel = self._channels.get(message["group_id"])
+        if channel is not None:
+            channel.add([message])
+
+    def publish_reaction(self, group_id, seq, emoji, count):
+        channel = self._channels.get(group_id)
+        if channel is not None:
+            channel.react(seq, emoji, count)
+
+    def sync(self, now=None):
+        """Read messages written by other processes into channels with readers; drop idle channels"""
+        now = now or time.monotonic()
+        with self._lock:
+            channels = list(self._channels.values())
+        for channel in channels:
+            if channel.readers:
+                if channel.last_seq is not None:
+                    channel.add(load_messages_after(channel.group_id, channel.last_seq, self.size))
+            elif now - channel.active_at > CHANNEL_IDLE_SECONDS:
+                with self._lock:
+                    if not channel.readers and self._channels.get(channel.group_id) is channel:
+                        del self._channels[channel.group_id]
+
+    def __len__(self):
+        return len(self._channels)
+
+
+channels = ChannelRegistry()
+
+
+def channel_group_exists(group_id):
+    """group_exists() without a query when the group's channel is already loaded here"""
+    return channels.is_loaded(group_id) or group_exists(group_id)
+
+
+def load_channel(channel):
+    """Fill a channel from the database the first time it is read (two queries at most)"""
+    if channel.last_seq is None:
+        messages, _ = load_history(channel.group_id, None, channel.size)
+        channel.load(messages)
+
+
+def wait_for_messages(group_id, after, limit, timeout):
+    """Messages after seq `after`, waiting up to `timeout` seconds when there are none yet
+
+    Served from the group's channel; at most four queries, to fill the channel
+    and to catch up a reader that fell behind it.
+    """
+    channel = channels.get(group_id)
+    leave = channel.join()
+    try:
+        load_channel(channel)
+        messages = channel.read(after, limit)
+        if messages == [] and timeout > 0:
+            # Waiting needs neither a database connection nor a slot of the concurrency cap
+            db.session.close()
+            release_concurrency_slot()
+            channel.wait(after, timeout=timeout)
+            messages = channel.read(after, limit)
+        if messages is None:
+            messages = load_messages_after(group_id, after, limit)
+        return messages
+    finally:
+        leave()
+
+
+def open_message_stream(group_id, after, heartbeat_interval=15.0):
+    """Join a group's channel for one SSE reader; returns (event generator, leave)
+
+    With `after` the stream starts with every message since then, read from
+    the database if the channel no longer holds them. Without it the stream
+    starts with the next message sent.
+    """
+    channel = channels.get(group_id)
+    leave = channel.join()
+    reaction_version = channel.reaction_version
+    try:
+        load_channel(channel)
+        backlog = []
+        if after is None:
+            after = channel.last_seq or 0
+        elif not channel.covers(after):
+            backlog = load_messages_after(group_id, after, MAX_HISTORY_LIMIT)
+            if backlog:
+                after = backlog[-1]["seq"]
+    except Exception:
+        leave()
+        raise
+    events = stream_messages(channel, leave, backlog, after, reaction_version, heartbeat_interval)
+    return events, leave
+
+
+def stream_messages(channel, leave, backlog, after, reaction_version, heartbeat_interval):
+    """Yield one reader's SSE stream: the backlog, then new messages and reaction counts as they come
+
+    Ends when the reader falls behind the channel. The browser then
+    reconnects with Last-Event-ID and catches up from the database.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        for message in backlog:
+            yield format_event('message', message, event_id=message["seq"])
+        while True:
+            messages = channel.read(after, MAX_HISTORY_LIMIT)
+            if messages is None:
+                return
+            for message in messages:
+                yield format_event('message', message, event_id=message["seq"])
+                after = message["seq"]
+            changes, reaction_version = channel.reactions_after(reaction_version)
+            if changes:
+                yield format_event('reaction', {"group_id": channel.group_id, "reactions": changes})
+            if not messages and not changes and not channel.wait(after, reaction_version, heartbeat_interval):
+                yield ": heartbeat\n\n"
+    finally:
+        leave()
+
+
+def init_chat_sync(scheduler, interval):
+    """Register the channel sync as a background job (see scheduler.py)"""
+    scheduler.add_job('chat-sync', interval, channels.sync)
@@ -0,0 +1,153 @@
+"""
+Query budget check for Project Bolt
+
+This script builds a throwaway SQLite database with the sample data from
+seed.py, calls every API endpoint once through the Flask test client and
+records the SQL statements each request issues. It fails if any endpoint
+goes over the budget declared with @query_budget in app.py, or if an
+endpoint has no budget at all.
+
+Usage:
+    python check_query_budgets.py [--verbose]
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Point the app at a scratch database before it is imported
+_tmpdir = tempfile.mkdtemp(prefix='bolt-budget-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'budget.db')}"
+# Fewer chat messages in memory than the sample chat has, so chat reads take their database path too
+os.environ['CHAT_CHANNEL_SIZE'] = '2'
+# Every request comes from one address; throttling would turn the later ones into 429s
+os.environ['THROTTLE_ENABLED'] = '0'
+
+from app import create_app
+from extensions import db
+from expiry import close_expired_polls
+from models import Group, Poll, PollOption
+from query_budget import get_query_budget, record_queries
+from seed import (create_users, create_groups, create_friendships, create_messages, create_notifications,
+                  create_polls)
+
+app = create_app()
+
+# One representative request per endpoint of the api blueprint: (endpoint, method, url, json body)
+REQUESTS = [
+    ('health_check', 'GET', '/api/health', None),
+    ('get_metrics', 'GET', '/api/metrics', None),
+    ('login', 'POST', '/api/auth/login', {"email": "john@example.com", "password": "password123"}),
+    ('register', 'POST', '/api/auth/register',
+     {"email": "budget@example.com", "username": "budget", "password": "password123"}),
+    ('update_profile', 'PUT', '/api/users/profile', {"id": "user2", "bio": "Updated bio"}),
+    ('search_users', 'GET', '/api/friends/search?query=doe', None),
+    ('get_groups', 'GET', '/api/groups?limit=2', None),
+    ('get_user_groups', 'GET', '/api/users/user2/groups', None),
+    ('get_friends', 'GET', '/api/users/user1/friends?limit=2', None),
+    ('get_friend_requests', 'GET', '/api/users/user1/friend-requests', None),
+    ('get_mutual_friends', 'GET', '/api/users/user1/mutual-friends?with=user2,user3', None),
+    ('get_friend_suggestions', 'GET', '/api/users/user3/friend-suggestions?limit=5', None),
+    ('send_friend_request', 'POST', '/api/users/user2/friend-requests', {"recipient_id": "user3"}),
+    ('delete_friend_request', 'DELETE', '/api/users/user3/friend-requests/user2', None),
+    ('send_friend_request', 'POST', '/api/users/user2/friend-requests', {"recipient_id": "user3"}),
+    # Crossing requests: this one accepts the request above
+    ('send_friend_request', 'POST', '/api/users/user3/friend-requests', {"recipient_id": "user2"}),
+    ('accept_friend_request', 'POST', '/api/users/user1/friend-requests/user3/accept', None),
+    ('delete_friend', 'DELETE', '/api/users/user1/friends/user2', None),
+    ('get_user_feed', 'GET', '/api/users/user2/feed?limit=2', None),
+    ('get_notifications', 'GET', '/api/users/user2/notifications?limit=2', None),
+    ('get_unread_count', 'GET', '/api/users/user2/notifications/unread', None),
+    ('mark_notifications_read', 'POST', '/api/users/user2/notifications/read', {"ids": [1, 2]}),
+    ('mark_all_notifications_read', 'POST', '/api/users/user3/notifications/read-all', None),
+    ('create_group', 'POST', '/api/groups',
+     {"name": "Budget Group", "description": "", "creator_id": "user1"}),
+    ('get_group', 'GET', '/api/groups/group1', None),
+    ('create_poll', 'POST', '/api/groups/group1/polls',
+     {"question": "Budget poll?", "options": ["Yes", "No", "Maybe"], "creator_id": "user1"}),
+    ('vote_poll', 'POST', '/api/polls/poll1/vote', {"user_id": "user2", "option_id": "option3"}),
+    ('vote_poll_batch', 'POST', '/api/polls/poll2/votes:batch',
+     {"votes": [{"user_id": "user1", "option_id": "option5"}, ["user3", "option6"],
+                ["user2", "option4"], ["nobody", "option4"]]}),
+    ('get_poll_timeline', 'GET', '/api/polls/poll1/timeline?bucket=5m', None),
+    ('tail_vote_events', 'GET', '/api/votes/events?after=0&limit=50', None),
+    ('stream_poll', 'GET', '/api/polls/poll1/stream', None),
+    ('send_message', 'POST', '/api/groups/group1/messages',
+     {"sender_id": "user2", "content": "Budget message", "poll_id": "poll1"}),
+    ('get_messages', 'GET', '/api/groups/group1/messages?before=4&limit=2', None),
+    ('get_message_updates', 'GET', '/api/groups/group1/messages/updates?after=0&wait=0', None),
+    ('stream_group_messages', 'GET', '/api/groups/group1/messages/stream?after=0', None),
+    ('react_to_message', 'PUT', '/api/groups/group1/messages/1/reactions/👍', {"user_id": "user3"}),
+    ('react_to_message', 'DELETE', '/api/groups/group1/messages/2/reactions/👍', {"user_id": "user1"}),
+]
+
+
+def check_budgets(verbose=False):
+    """Run every request and compare its statement count to the declared budget"""
+    failures = []
+    client = app.test_client()
+    checked = set()
+
+    for endpoint, method, url, body in REQUESTS:
+        budget = get_query_budget(app.view_functions[f"api.{endpoint}"])
+        with record_queries() as statements:
+            response = client.open(url, method=method, json=body)
+        response.close()  # Streaming endpoints would otherwise stay subscribed
+        checked.add(f"api.{endpoint}")
+
+        status = "ok"
+        if response.status_code >= 400:
+            status = f"HTTP {response.status_code}"
+            failures.append(endpoint)
+        elif budget is None:
+            status = "no budget declared"
+            failures.append(endpoint)
+        elif len(statements) > budget:
+            status = "OVER BUDGET"
+            failures.append(endpoint)
+
+        print(f"{endpoint:<28} {len(statements):>3} / {budget if budget is not None else '-':<3} {status}")
+        if verbose or status == "OVER BUDGET":
+            for statement, _ in statements:
+                print("    " + " ".join(statement.split()))
+
+    # Every API route must be covered by this script
+    for rule in app.url_map.iter_rules():
+        if rule.rule.startswith('/api/') and rule.endpoint not in checked:
+            print(f"{rule.endpoint:<28} not exercised by check_query_budgets.py")
+            failures.append(rule.endpoint)
+
+    return failures
+
+
+def build_sample_database():
+    """Create the schema and sample data in the scratch database"""
+    with app.app_context():
+        db.create_all()
+        users = create_users()
+        groups = create_groups(users)
+        polls = create_polls(groups, users)
+        create_messages(groups, users, polls)
+        create_notifications(polls)
+        create_friendships(users)
+        # A closed poll, so the group page also reads frozen results
+        db.session.add(Poll(
+            id="closed-poll", title="Closed poll", group_id="group1", creator_id="user1",
+            expire_at=datetime.now() - timedelta(days=1),
+            options=[PollOption(id="closed-option", text="Done")],
+        ))
+        # Read the book club's polls the way feeds read groups too large to fan out
+        db.session.get(Group, "group2").feed_fanout = False
+        db.session.commit()
+        close_expired_polls()
+        db.session.remove()
+
+
+if __name__ == '__main__':
+    build_sample_database()
+    failures = check_budgets(verbose='--verbose' in sys.argv)
+    if failures:
+        print(f"\n{len(failures)} endpoint(s) failed the query budget check")
+        sys.exit(1)
+    print("\nAll endpoints are within their query budgets")
@@ -0,0 +1,97 @@
+"""
+Query plan check for Project Bolt
+
+This script calls every API endpoint against a throwaway SQLite database with
+the sample data from seed.py (the same requests as check_query_budgets.py),
+runs EXPLAIN QUERY PLAN on each statement the endpoint issued and fails if
+any of them falls back to a full table scan.
+
+A SCAN step is accepted only when it walks an index for an ORDER BY ... LIMIT
+query, which stops after one page, when it is an FTS5 MATCH lookup, or when it
+reads a subquery the same plan builds (CO-ROUTINE or MATERIALIZE), whose own
+steps are checked. Endpoints whose scans are known and
+tracked are listed in KNOWN_SCANS with the reason.
+
+Usage:
+    python check_query_plans.py [--verbose]
+"""
+
+import sys
+
+from check_query_budgets import REQUESTS, app, build_sample_database, db
+from query_budget import record_queries
+
+# endpoint -> why its scan is tolerated for now
+KNOWN_SCANS = {}
+
+
+def explain(statement, parameters):
+    """Return the EXPLAIN QUERY PLAN detail lines for one recorded statement"""
+    if isinstance(parameters, list):  # executemany: any one parameter set has the same plan
+        parameters = parameters[0] if parameters else ()
+    with app.app_context():
+        rows = db.session.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters
+        ).all()
+        db.session.rollback()
+    return [row[-1] for row in rows]
+
+
+def is_full_scan(detail, statement, subqueries=()):
+    """True for a SCAN step that reads a whole table or index"""
+    if not detail.startswith('SCAN ') or 'CONSTANT ROW' in detail:
+        return False
+    if detail.split()[1] in subqueries:  # Rows of a subquery planned in its own steps
+        return False
+    if 'VIRTUAL TABLE INDEX' in detail and ':M' in detail:  # FTS5 MATCH lookup
+        return False
+    ordered_page = 'USING' in detail and 'INDEX' in detail and 'LIMIT' in statement
+    return not ordered_page
+
+
+def check_plans(verbose=False):
+    """Explain every statement each endpoint issues and report full scans"""
+    failures = []
+    client = app.test_client()
+
+    for endpoint, method, url, body in REQUESTS:
+        with record_queries() as statements:
+            response = client.open(url, method=method, json=body)
+        response.close()
+
+        scans = []
+        for statement, parameters in statements:
+            plan = explain(statement, parameters)
+            subqueries = {
+                detail.split()[1] for detail in plan if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE '))
+            }
+            scans.extend(
+                (detail, statement) for detail in plan if is_full_scan(detail, statement, subqueries)
+            )
+            if verbose:
+                print(f"{endpoint}: {' '.join(statement.split())}")
+                for detail in plan:
+                    print(f"    {detail}")
+
+        if not scans:
+            status = "ok"
+        elif endpoint in KNOWN_SCANS:
+            status = f"known scan ({KNOWN_SCANS[endpoint]})"
+        else:
+            status = "FULL SCAN"
+            failures.append(endpoint)
+        print(f"{endpoint:<28} {len(statements):>3} statements  {status}")
+        if status == "FULL SCAN":
+            for detail, statement in scans:
+                print(f"    {detail}: {' '.join(statement.split())}")
+
+    return failures
+
+
+if __name__ == '__main__':
+    build_sample_database()
+    failures = check_plans(verbose='--verbose' in sys.argv)
+    if failures:
+        print(f"\n{len(failures)} endpoint(s) issue queries that scan whole tables")
+        sys.exit(1)
+    print("\nNo endpoint query falls back to a full table scan")
@@ -0,0 +1,66 @@
+"""
+Request size limit check for Project Bolt
+
+For every endpoint whose JSON body is declared with @validate_json in
+app.py, this script sends a body one byte over the schema's max_bytes
+through the Flask test client, with throttling on. It fails unless the
+request is refused with 413 before a single byte of the body is read.
+
+Usage:
+    python check_request_limits.py
+"""
+
+import io
+import os
+import sys
+import tempfile
+
+# Point the app at a scratch database before it is imported; no request here gets as far as a query
+_tmpdir = tempfile.mkdtemp(prefix='bolt-limits-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'limits.db')}"
+# The throttling hook runs before the view, so it must not read oversized bodies either
+os.environ['THROTTLE_ENABLED'] = '1'
+
+from app import create_app
+
+app = create_app()
+
+# A value for every URL variable of the api blueprint
+URL_VALUES = {'user_id': 'user1', 'group_id': 'group1', 'poll_id': 'poll1', 'seq': 1, 'emoji': 'x',
+              'other_id': 'user2', 'friend_id': 'user2', 'sender_id': 'user2'}
+
+
+def check_limits():
+    """Send an oversized body to every validated endpoint; return the ones that read it"""
+    failures = []
+    client = app.test_client()
+
+    for rule in app.url_map.iter_rules():
+        schema = getattr(app.view_functions[rule.endpoint], 'json_schema', None)
+        if schema is None:
+            continue
+        url = rule.build({name: URL_VALUES[name] for name in rule.arguments}, append_unknown=False)[1]
+        length = schema.max_bytes + 1
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            body = io.BytesIO(b'{"padding": "' + b'x' * (length - 15) + b'"}')
+            response = client.open(url, method=method, input_stream=body, content_length=length,
+                                   content_type='application/json')
+
+            status = "ok"
+            if response.status_code != 413:
+                status = f"HTTP {response.status_code}"
+                failures.append(rule.endpoint)
+            elif body.tell():
+                status = f"read {body.tell()} bytes first"
+                failures.append(rule.endpoint)
+            print(f"{rule.endpoint:<32} {method:<6} {length:>8} bytes  {status}")
+
+    return failures
+
+
+if __name__ == '__main__':
+    failures = check_limits()
+    if failures:
+        print(f"\n{len(failures)} request(s) were not refused before the body was read")
+        sys.exit(1)
+    print("\nEvery oversized body was refused before it was read")
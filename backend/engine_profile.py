@@ -0,0 +1,128 @@
+"""
+SQLite engine profiles for Project Bolt
+
+The database engine is configured from environment variables. DB_PROFILE
+picks a set of defaults and each SQLITE_* / DB_POOL_* variable overrides a
+single setting:
+
+    DB_PROFILE               development (SQLite defaults) or production
+    DATABASE_URL             SQLAlchemy URL, default sqlite:///bolt.db
+    SQLITE_JOURNAL_MODE      e.g. WAL, so readers never block the writer
+    SQLITE_SYNCHRONOUS       e.g. NORMAL, safe with WAL and far fewer fsyncs
+    SQLITE_BUSY_TIMEOUT_MS   how long a connection waits for a lock
+    SQLITE_MMAP_SIZE         bytes of the file to memory-map
+    SQLITE_CACHE_SIZE        page cache; negative values are KiB
+    SQLITE_TEMP_STORE        MEMORY keeps sort/temp b-trees off disk
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
+
+Pragmas are applied to every new connection through a connect event.
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+PROFILES = {
+    'development': {
+        'journal_mode': None,
+        'synchronous': None,
+        'busy_timeout_ms': 5000,
+        'mmap_size': None,
+        'cache_size': None,
+        'temp_store': None,
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': -1,
+    },
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout_ms': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,
+        'temp_store': 'MEMORY',
+        # Enough connections for every thread of a multi-threaded worker
+        'pool_size': 16,
+        'max_overflow': 16,
+        'pool_timeout': 10,
+        'pool_recycle': 3600,
+    },
+}
+
+_ENV_OVERRIDES = {
+    'journal_mode': ('SQLITE_JOURNAL_MODE', str),
+    'synchronous': ('SQLITE_SYNCHRONOUS', str),
+    'busy_timeout_ms': ('SQLITE_BUSY_TIMEOUT_MS', int),
+    'mmap_size': ('SQLITE_MMAP_SIZE', int),
+    'cache_size': ('SQLITE_CACHE_SIZE', int),
+    'temp_store': ('SQLITE_TEMP_STORE', str),
+    'pool_size': ('DB_POOL_SIZE', int),
+    'max_overflow': ('DB_MAX_OVERFLOW', int),
+    'pool_timeout': ('DB_POOL_TIMEOUT', int),
+    'pool_recycle': ('DB_POOL_RECYCLE', int),
+}
+
+
+def load_profile(environ=os.environ):
+    """Resolve the engine settings from DB_PROFILE plus individual overrides"""
+    name = environ.get('DB_PROFILE', 'development')
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {name!r}; expected one of {', '.join(PROFILES)}")
+    settings = dict(PROFILES[name], name=name)
+    for key, (variable, parse) in _ENV_OVERRIDES.items():
+        if environ.get(variable):
+            settings[key] = parse(environ[variable])
+    return settings
+
+
+def configure_database(app, environ=os.environ):
+    """Set the database URL and engine options on the app config"""
+    settings = load_profile(environ)
+    url = environ.get('DATABASE_URL', 'sqlite:///bolt.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['DB_PROFILE'] = settings
+
+    options = {
+        'connect_args': {
+            'timeout': settings['busy_timeout_ms'] / 1000,
+            # Pooled connections are handed to whichever worker thread needs one
+            'check_same_thread': False,
+        },
+    }
+    if ':memory:' not in url and url != 'sqlite://':
+        options.update(
+            poolclass=QueuePool,
+            pool_size=settings['pool_size'],
+            max_overflow=settings['max_overflow'],
+            pool_timeout=settings['pool_timeout'],
+            pool_recycle=settings['pool_recycle'],
+        )
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def _pragmas(settings):
+    pragmas = []
+    for key in ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store'):
+        if settings[key] is not None:
+            pragmas.append(f"PRAGMA {key}={settings[key]}")
+    pragmas.append(f"PRAGMA busy_timeout={int(settings['busy_timeout_ms'])}")
+    return pragmas
+
+
+def init_engine_profile(app, db):
+    """Apply the profile's pragmas to every connection of the app's engine"""
+    settings = app.config['DB_PROFILE']
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = _pragmas(settings)
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
@@ -0,0 +1,114 @@
+"""
+Poll expiry for Project Bolt
+
+A poll stops taking votes at its expire_at. Shortly afterwards,
+close_expired_polls() closes it for good. It freezes the final results
+(per-option counts and percentages, the winner, total votes and voters) into
+an immutable poll_result row and stamps poll.closed_at. From then on the read
+endpoints serve the poll from that row alone.
+
+Open polls are found through the partial index ix_poll_open_expire_at, which
+only holds polls that are not closed yet. Each pass therefore reads just the
+polls that expired since the last one, however many closed polls pile up.
+
+The background scheduler runs close_expired_polls() every
+POLL_EXPIRY_INTERVAL seconds in each worker process. Several workers may
+race for the same poll. Only the one whose UPDATE ... WHERE closed_at IS NULL
+claims the poll writes its snapshot, and queues the poll_closed notification
+(see notifications.py). `flask close-expired-polls` runs a single pass from
+cron instead.
+"""
+
+from datetime import datetime
+
+from extensions import db
+from models import Poll, PollOption, PollResult, Vote
+from notifications import enqueue_polls_closed
+from response_cache import bump_group_version
+from serializers import OPTION_ORDER
+
+DEFAULT_BATCH_SIZE = 100
+
+poll_table = Poll.__table__
+
+
+def _percentage(votes, total):
+    return round(100.0 * votes / total, 1) if total else 0.0
+
+
+def build_result(poll_id, closed_at, option_rows, total_voters):
+    """Frozen result row for a poll from its (option_id, text, votes) rows"""
+    total_votes = sum(votes for _, _, votes in option_rows)
+    top = max((votes for _, _, votes in option_rows), default=0)
+    return {
+        "poll_id": poll_id,
+        "closed_at": closed_at,
+        "total_votes": total_votes,
+        "total_voters": total_voters,
+        "winner_option_ids": [option_id for option_id, _, votes in option_rows if top and votes == top],
+        "options": [
+            {"id": option_id, "text": text, "votes": votes, "percentage": _percentage(votes, total_votes)}
+            for option_id, text, votes in option_rows
+        ],
+    }
+
+
+def close_expired_polls(now=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Close every poll whose deadline has passed; returns the number closed"""
+    now = now or datetime.now()
+    closed = 0
+    while True:
+        expired = db.session.execute(
+            db.select(poll_table.c.id)
+            .where(poll_table.c.closed_at.is_(None), poll_table.c.expire_at <= now)
+            .order_by(poll_table.c.expire_at)
+            .limit(batch_size)
+        ).scalars().all()
+        if not expired:
+            break
+
+        # Claim the polls; a concurrent worker that got there first leaves nothing to claim
+        claimed = db.session.execute(
+            db.update(poll_table)
+            .where(poll_table.c.id.in_(expired), poll_table.c.closed_at.is_(None))
+            .values(closed_at=now)
+            .returning(poll_table.c.id, poll_table.c.group_id)
+        ).all()
+        poll_ids = [poll_id for poll_id, _ in claimed]
+
+        options = {poll_id: [] for poll_id in poll_ids}
+        for poll_id, option_id, text, votes in db.session.execute(
+            db.select(PollOption.poll_id, PollOption.id, PollOption.text, PollOption.vote_count)
+            .where(PollOption.poll_id.in_(poll_ids))
+            .order_by(*OPTION_ORDER)
+        ):
+            options[poll_id].append((option_id, text, votes))
+        # One vote per user per poll, so counting rows counts voters
+        voters = dict(db.session.execute(
+            db.select(Vote.poll_id, db.func.count())
+            .where(Vote.poll_id.in_(poll_ids))
+            .group_by(Vote.poll_id)
+        ).all())
+
+        if poll_ids:
+            db.session.execute(db.insert(PollResult.__table__), [
+                build_result(poll_id, now, options[poll_id], voters.get(poll_id, 0))
+                for poll_id in poll_ids
+            ])
+        for group_id in {group_id for _, group_id in claimed}:
+            bump_group_version(group_id)
+        # Members are notified by the delivery job
+        enqueue_polls_closed(claimed, now)
+        db.session.commit()
+        closed += len(poll_ids)
+    return closed
+
+
+def init_poll_expiry(scheduler, interval):
+    """Register the expiry pass as a background job (see scheduler.py)"""
+    def close_polls():
+        closed = close_expired_polls()
+        if closed:
+            scheduler.app.logger.info("Closed %d expired poll(s)", closed)
+
+    scheduler.add_job('poll-expiry', interval, close_polls)
@@ -0,0 +1,130 @@
+"""
+Home feeds for Project Bolt
+
+GET /api/users/<user_id>/feed lists recent polls from all of a user's
+groups, newest first, one keyset page at a time. It is served from
+feed_entry, which holds one row per poll per member of its group. The table
+is keyed and clustered on (user_id, created_at, poll_id), so one page is a
+single primary key range read.
+
+Fan-out on write: create_poll adds the new poll to every member's feed in
+the same transaction, with one INSERT ... SELECT over group_members. That is
+one row per member, so groups with more than FEED_FANOUT_MAX_MEMBERS members
+are not fanned out. The first poll that finds its group too large turns the
+group's feed_fanout flag off. From then on readers merge that group's polls
+into their page with a second, bounded query over the poll index
+(group_id, created_at). A poll can be in both halves when it was fanned out
+before the switch; the UNION drops the duplicate.
+
+Feed rows only hold the sort key. The poll itself is joined when the feed is
+read, so closing a poll writes nothing here. A member only gets polls
+created after they joined. rebuild_feeds() recomputes every feed and every
+flag from group_members; it is exposed as `flask rebuild-feeds`.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import literal, tuple_, union
+
+from extensions import db
+from models import FeedEntry, Group, Poll, group_members
+from pagination import decode_cursor, encode_cursor
+from serializers import POLL_COLUMNS, feed_poll_dict, load_options, load_results
+
+DEFAULT_FANOUT_MAX_MEMBERS = 1000
+
+feed_table = FeedEntry.__table__
+group_table = Group.__table__
+FEED_COLUMNS = POLL_COLUMNS + (Group.name.label('group_name'),)
+
+
+def fan_out_poll(group, poll_id, created_at, max_members=DEFAULT_FANOUT_MAX_MEMBERS):
+    """Add a new poll to the feed of every member of its group (caller commits)
+
+    Returns the number of feeds written, 0 when the group is too large.
+    """
+    if not group.feed_fanout:
+        return 0
+    members = db.select(group_members.c.user_id).where(group_members.c.group_id == group.id)
+    # Count no further than the limit; a huge group costs no more than a small one here
+    size = db.session.execute(
+        db.select(db.func.count()).select_from(members.limit(max_members + 1).subquery())
+    ).scalar()
+    if size > max_members:
+        group.feed_fanout = False
+        return 0
+    db.session.execute(feed_table.insert().from_select(
+        ['user_id', 'created_at', 'poll_id'],
+        db.select(group_members.c.user_id, literal(created_at, db.DateTime), literal(poll_id))
+        .where(group_members.c.group_id == group.id),
+    ))
+    return size
+
+
+def rebuild_feeds(max_members=DEFAULT_FANOUT_MAX_MEMBERS):
+    """Recompute every fan-out flag and feed from group_members; returns the number of feed rows"""
+    large = (
+        db.select(group_members.c.group_id)
+        .group_by(group_members.c.group_id)
+        .having(db.func.count() > max_members)
+    )
+    db.session.execute(db.update(group_table).values(feed_fanout=group_table.c.id.not_in(large)))
+    db.session.execute(db.delete(feed_table))
+    entries = (
+        db.select(group_members.c.user_id, Poll.created_at, Poll.id)
+        .join(group_table, group_table.c.id == group_members.c.group_id)
+        .join(Poll, Poll.group_id == group_members.c.group_id)
+        .where(group_table.c.feed_fanout.is_(True), Poll.created_at.is_not(None))
+    )
+    result = db.session.execute(feed_table.insert().from_select(['user_id', 'created_at', 'poll_id'], entries))
+    db.session.commit()
+    return result.rowcount
+
+
+def load_feed_page(user_id, cursor, limit):
+    """One page of a user's feed as (poll payloads, next_cursor), in at most three queries
+
+    Raises ValueError for a malformed cursor.
+    """
+    after = decode_cursor(cursor) if cursor else None
+
+    # Polls fanned out to this user: one range of the feed_entry primary key
+    fanned_out = (
+        db.select(*FEED_COLUMNS)
+        .select_from(feed_table)
+        .join(Poll, Poll.id == feed_table.c.poll_id)
+        .join(Group, Group.id == Poll.group_id)
+        .where(feed_table.c.user_id == user_id)
+        .order_by(feed_table.c.created_at.desc(), feed_table.c.poll_id.desc())
+        .limit(limit + 1)
+    )
+    # Polls of the user's groups that are too large to fan out
+    merged = (
+        db.select(*FEED_COLUMNS)
+        .select_from(group_members)
+        .join(Group, Group.id == group_members.c.group_id)
+        .join(Poll, Poll.group_id == group_members.c.group_id)
+        .where(group_members.c.user_id == user_id, Group.feed_fanout.is_(False))
+        .order_by(Poll.created_at.desc(), Poll.id.desc())
+        .limit(limit + 1)
+    )
+    if after:
+        fanned_out = fanned_out.where(tuple_(feed_table.c.created_at, feed_table.c.poll_id) < tuple_(*after))
+        merged = merged.where(tuple_(Poll.created_at, Poll.id) < tuple_(*after))
+
+    page = union(fanned_out.subquery().select(), merged.subquery().select()).subquery()
+    rows = db.session.execute(
+        db.select(page).order_by(page.c.created_at.desc(), page.c.id.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    # Open polls read their live tallies, closed polls their frozen results
+    options = load_options([row.id for row in rows if row.closed_at is None])
+    results = load_results([row.id for row in rows if row.closed_at is not None])
+    now = datetime.now()
+    polls = [feed_poll_dict(row, options.get(row.id, ()), results.get(row.id), now) for row in rows]
+    return polls, next_cursor
@@ -0,0 +1,273 @@
+"""
+Friendships for Project Bolt
+
+Storage. An accepted friendship is two rows of friendship, (a, b) and
+(b, a). The table is WITHOUT ROWID and clustered on (user_id, friend_id), so
+each user's friends are one primary key range and "are a and b friends" is a
+single seek, whichever side asks. ix_friendship_user_created orders a user's
+friends newest first for the paginated list. Pending requests live in
+friend_request, keyed by (sender_id, recipient_id) with an index on the
+recipient. Accepting a request deletes it and writes both edges; declining
+or cancelling deletes it.
+
+Mutual friends. Every change to a user's friendships bumps
+user.friends_version in the same transaction, for both users. A user's
+friend ids are cached in memory as a frozenset keyed by (user_id,
+friends_version), so a count of mutual friends is a set intersection:
+- one query reads the versions of everyone involved;
+- one more loads, in bulk, the friend sets that are not cached at the
+  current version.
+As with group payloads (see response_cache.py), old versions are never
+invalidated explicitly; no one asks for them any more, and they age out of
+the LRU. Every worker process sees the new version on its next read.
+
+Suggestions. "People in your groups you aren't friends with" is one
+set-based query. It joins the user's group memberships to the other members
+of those groups, drops friends and pending requests in either direction, and
+counts shared groups per candidate. The best SUGGESTION_POOL candidates are
+then ranked by mutual friends, counted in bulk from the cached friend sets.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import FriendRequest, Friendship, User, group_members
+from pagination import decode_cursor, encode_cursor
+from response_cache import LRUCache
+from serializers import MEMBER_COLUMNS, friend_dict, member_dict
+
+DEFAULT_SUGGESTION_LIMIT = 10
+MAX_SUGGESTION_LIMIT = 50
+# Candidates ranked by mutual friends, taken from the top of the shared-groups ranking
+SUGGESTION_POOL = 200
+MAX_MUTUAL_IDS = 100
+
+friendship_table = Friendship.__table__
+request_table = FriendRequest.__table__
+user_table = User.__table__
+
+# (user_id, friends_version) -> frozenset of friend ids
+friend_set_cache = LRUCache(maxsize=10000)
+
+
+def friend_versions(user_ids):
+    """Map user_id -> friends_version for the given users that exist, in one query"""
+    return dict(db.session.execute(
+        db.select(user_table.c.id, user_table.c.friends_version).where(user_table.c.id.in_(list(user_ids)))
+    ).all())
+
+
+def friend_sets(versions):
+    """Map user_id -> frozenset of friend ids for {user_id: friends_version}; one query for all cache misses"""
+    sets, missing = {}, []
+    for user_id, version in versions.items():
+        cached = friend_set_cache.get((user_id, version))
+        if cached is None:
+            missing.append(user_id)
+        else:
+            sets[user_id] = cached
+    if missing:
+        loaded = {user_id: [] for user_id in missing}
+        for user_id, friend_id in db.session.execute(
+            db.select(friendship_table.c.user_id, friendship_table.c.friend_id)
+            .where(friendship_table.c.user_id.in_(missing))
+        ):
+            loaded[user_id].append(friend_id)
+        for user_id, friend_ids in loaded.items():
+            sets[user_id] = frozenset(friend_ids)
+            friend_set_cache.set((user_id, versions[user_id]), sets[user_id])
+    return sets
+
+
+def mutual_counts(user_id, other_ids):
+    """Map other user id -> number of mutual friends, in at most two queries
+
+    Returns None when user_id does not exist; other ids that do not exist are left out.
+    """
+    versions = friend_versions({user_id, *other_ids})
+    if user_id not in versions:
+        return None
+    sets = friend_sets(versions)
+    mine = sets[user_id]
+    return {other_id: len(mine & sets[other_id]) for other_id in other_ids if other_id in sets}
+
+
+def between(column_a, column_b, user_id, other_id):
+    """Rows for the pair in either direction
+
+    Spelled as an OR of equalities: SQLite seeks the primary key once per
+    side for that, but scans the table for a row-value IN list.
+    """
+    return or_(and_(column_a == user_id, column_b == other_id), and_(column_a == other_id, column_b == user_id))
+
+
+def bump_friend_versions(*user_ids):
+    """Invalidate the cached friend sets of the given users (caller commits)"""
+    db.session.execute(
+        db.update(user_table)
+        .where(user_table.c.id.in_(user_ids))
+        .values(friends_version=user_table.c.friends_version + 1)
+    )
+
+
+def are_friends(user_id, other_id):
+    return db.session.execute(
+        db.select(friendship_table.c.friend_id)
+        .where(friendship_table.c.user_id == user_id, friendship_table.c.friend_id == other_id)
+    ).first() is not None
+
+
+def add_friendship(user_id, other_id, now=None):
+    """Write both edges of a friendship and drop requests between the two (caller commits)"""
+    now = now or datetime.now()
+    db.session.execute(sqlite_insert(friendship_table).on_conflict_do_nothing(), [
+        {"user_id": user_id, "friend_id": other_id, "created_at": now},
+        {"user_id": other_id, "friend_id": user_id, "created_at": now},
+    ])
+    db.session.execute(db.delete(request_table).where(
+        between(request_table.c.sender_id, request_table.c.recipient_id, user_id, other_id)
+    ))
+    bump_friend_versions(user_id, other_id)
+
+
+def remove_friendship(user_id, other_id):
+    """Delete both edges of a friendship; returns False if there was none (caller commits)"""
+    removed = db.session.execute(db.delete(friendship_table).where(
+        between(friendship_table.c.user_id, friendship_table.c.friend_id, user_id, other_id)
+    )).rowcount
+    if removed:
+        bump_friend_versions(user_id, other_id)
+    return bool(removed)
+
+
+def send_request(sender_id, recipient_id, now=None):
+    """Ask recipient to be friends; returns "pending", "accepted" when they had already asked, or None
+
+    None means the request was already pending. Caller commits.
+    """
+    # Asking someone who already asked you is accepting their request
+    reverse = db.session.execute(
+        db.delete(request_table)
+        .where(request_table.c.sender_id == recipient_id, request_table.c.recipient_id == sender_id)
+    ).rowcount
+    if reverse:
+        add_friendship(sender_id, recipient_id, now)
+        return "accepted"
+    inserted = db.session.execute(
+        sqlite_insert(request_table)
+        .values(sender_id=sender_id, recipient_id=recipient_id, created_at=now or datetime.now())
+        .on_conflict_do_nothing()
+    ).rowcount
+    return "pending" if inserted else None
+
+
+def accept_request(recipient_id, sender_id, now=None):
+    """Accept a pending request; returns False if there was none (caller commits)"""
+    pending = db.session.execute(
+        db.delete(request_table)
+        .where(request_table.c.sender_id == sender_id, request_table.c.recipient_id == recipient_id)
+    ).rowcount
+    if pending:
+        add_friendship(recipient_id, sender_id, now)
+    return bool(pending)
+
+
+def remove_request(user_id, other_id):
+    """Decline a request from other_id or cancel one sent to them; returns False if there was none"""
+    return bool(db.session.execute(db.delete(request_table).where(
+        between(request_table.c.sender_id, request_table.c.recipient_id, user_id, other_id)
+    )).rowcount)
+
+
+def load_friends_page(user_id, cursor, limit):
+    """One page of a user's friends, newest first, as (payloads, next_cursor), in one query
+
+    Raises ValueError for a malformed cursor.
+    """
+    query = (
+        db.select(*MEMBER_COLUMNS, friendship_table.c.created_at)
+        .select_from(friendship_table)
+        .join(User, User.id == friendship_table.c.friend_id)
+        .where(friendship_table.c.user_id == user_id)
+    )
+    if cursor:
+        query = query.where(
+            tuple_(friendship_table.c.created_at, friendship_table.c.friend_id) < tuple_(*decode_cursor(cursor))
+        )
+    rows = db.session.execute(
+        query.order_by(friendship_table.c.created_at.desc(), friendship_table.c.friend_id.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [friend_dict(row) for row in rows], next_cursor
+
+
+def load_requests(user_id):
+    """Pending requests a user received and sent, newest first, in two queries"""
+    def requests(user_column, other_column):
+        return [
+            friend_dict(row, key="requested_at") for row in db.session.execute(
+                db.select(*MEMBER_COLUMNS, request_table.c.created_at)
+                .select_from(request_table)
+                .join(User, User.id == other_column)
+                .where(user_column == user_id)
+                .order_by(request_table.c.created_at.desc())
+            )
+        ]
+
+    return {
+        "incoming": requests(request_table.c.recipient_id, request_table.c.sender_id),
+        "outgoing": requests(request_table.c.sender_id, request_table.c.recipient_id),
+    }
+
+
+def suggest_friends(user_id, limit):
+    """Members of the user's groups who are not friends yet, best first, in at most four queries
+
+    Ranked by mutual friends, then by shared groups. Returns None when the
+    user does not exist.
+    """
+    mine = group_members.alias('mine')
+    theirs = group_members.alias('theirs')
+    candidate = theirs.c.user_id
+    shared = db.func.count().label('shared_groups')
+    is_friend = (
+        db.select(friendship_table.c.friend_id)
+        .where(friendship_table.c.user_id == user_id, friendship_table.c.friend_id == candidate)
+        .exists()
+    )
+    requested = (
+        db.select(request_table.c.sender_id)
+        .where(between(request_table.c.sender_id, request_table.c.recipient_id, user_id, candidate))
+        .exists()
+    )
+    pool = db.session.execute(
+        db.select(candidate, shared)
+        .select_from(mine)
+        .join(theirs, theirs.c.group_id == mine.c.group_id)
+        .where(mine.c.user_id == user_id, candidate != user_id, ~is_friend, ~requested)
+        .group_by(candidate)
+        .order_by(shared.desc(), candidate)
+        .limit(SUGGESTION_POOL)
+    ).all()
+
+    counts = mutual_counts(user_id, [row.user_id for row in pool])
+    if counts is None:
+        return None
+    ranked = sorted(pool, key=lambda row: (-counts.get(row.user_id, 0), -row.shared_groups, row.user_id))[:limit]
+    if not ranked:
+        return []
+
+    users = {row.id: row for row in db.session.execute(
+        db.select(*MEMBER_COLUMNS).where(User.id.in_([row.user_id for row in ranked]))
+    )}
+    return [
+        dict(member_dict(users[row.user_id]), shared_groups=row.shared_groups, mutual_friends=counts[row.user_id])
+        for row in ranked if row.user_id in users
+    ]
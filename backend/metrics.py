@@ -0,0 +1,185 @@
+"""
+Request metrics for Project Bolt
+
+Every request is measured per endpoint:
+- wall time from the first before_request hook to the response;
+- how many SQL statements it issued;
+- how long those statements took, timed around each cursor execute, so
+  waits on the SQLite write lock count here;
+- the size of the response body.
+
+Each measurement goes into a fixed-bucket histogram. GET /api/metrics serves
+them, plus a request counter by status, in the Prometheus text format.
+Comparing them shows where a slow endpoint spends its time. Many statements
+point at lazy loads. A high SQL time with few statements points at lock
+waits. Wall time well above SQL time is Python work, mostly serialization.
+
+With METRICS_SERVER_TIMING enabled, every response also carries a
+Server-Timing header (`app;dur=..., db;dur=...;desc="N queries"`). Browser
+dev tools then show the same split for a single request.
+
+Histograms live in process memory, so each worker process reports its own
+numbers; the scraper sums them. Streaming responses are measured up to their
+first byte, and their size is not recorded.
+"""
+
+import bisect
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name, documentation, buckets, labels=('endpoint',)):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labels = labels
+        self.series = {}
+
+    def observe(self, label_values, value):
+        counts = self.series.get(label_values)
+        if counts is None:
+            # One slot per bucket plus +Inf, then the sum
+            counts = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, counts in sorted(self.series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {round(counts[-1], 6)}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, label_values, amount=1):
+        self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class RequestMetrics:
+    """All request metrics of this process, behind one lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter('bolt_requests_total', "Requests served", ('endpoint', 'method', 'status'))
+        self.duration = Histogram('bolt_request_duration_seconds', "Wall time per request", DURATION_BUCKETS)
+        self.statements = Histogram('bolt_request_sql_statements', "SQL statements per request", STATEMENT_BUCKETS)
+        self.sql_duration = Histogram('bolt_request_sql_seconds', "Time spent in SQL per request", DURATION_BUCKETS)
+        self.response_size = Histogram('bolt_response_size_bytes', "Response body size", SIZE_BUCKETS)
+
+    def record(self, endpoint, method, status, seconds, statements, sql_seconds, size):
+        key = (endpoint,)
+        with self._lock:
+            self.requests.inc((endpoint, method, status))
+            self.duration.observe(key, seconds)
+            self.statements.observe(key, statements)
+            self.sql_duration.observe(key, sql_seconds)
+            if size is not None:
+                self.response_size.observe(key, size)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.statements, self.sql_duration, self.response_size):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = RequestMetrics()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _stop_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_request_context():
+        g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+
+
+@event.listens_for(Engine, 'handle_error')
+def _drop_statement_timer(context):
+    # A failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('metrics_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def metrics_response():
+    """Prometheus text exposition of this process's metrics"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+def init_metrics(app):
+    """Measure every request; must run before hooks that may answer early (throttling)"""
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('METRICS_SERVER_TIMING', False)
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        seconds = time.perf_counter() - started
+        statements = g.get('sql_query_count', 0)
+        sql_seconds = g.get('sql_seconds', 0.0)
+        size = None if response.is_streamed else response.calculate_content_length()
+        metrics.record(request.endpoint or 'unmatched', request.method, response.status_code,
+                       seconds, statements, sql_seconds, size)
+        if app.config['METRICS_SERVER_TIMING']:
+            response.headers['Server-Timing'] = (
+                f'app;dur={seconds * 1000:.2f}, db;dur={sql_seconds * 1000:.2f};desc="{statements} queries"'
+            )
+        return response
@@ -0,0 +1,32 @@
+"""Make group.created_at NOT NULL so group listings page on a non-null key
+
+Revision ID: 2b7e5c9a4d13
+Revises: 6a2d9f4c8b15
+Create Date: 2026-10-19 09:41:07.226518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7e5c9a4d13'
+down_revision = '6a2d9f4c8b15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows without a created_at sorted last in newest-first listings; keep them there
+    op.execute(
+        'UPDATE "group" SET created_at = '
+        "COALESCE((SELECT min(created_at) FROM \"group\"), CURRENT_TIMESTAMP) "
+        "WHERE created_at IS NULL"
+    )
+    with op.batch_alter_table('group', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('group', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,32 @@
+"""Add denormalized vote_count to poll_option
+
+Revision ID: 3f9c1d2e8b47
+Revises: a7a352ecd333
+Create Date: 2026-10-18 09:12:41.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1d2e8b47'
+down_revision = 'a7a352ecd333'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('poll_option', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('vote_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill the tallies from the existing votes
+    op.execute(
+        "UPDATE poll_option SET vote_count = "
+        "(SELECT COUNT(*) FROM vote WHERE vote.option_id = poll_option.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('poll_option', schema=None) as batch_op:
+        batch_op.drop_column('vote_count')
@@ -0,0 +1,58 @@
+"""Add trigram full-text index for user search
+
+Revision ID: 9d3f5a7c1e68
+Revises: 5e8a0b3d6c21
+Create Date: 2026-10-18 13:58:32.604471
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3f5a7c1e68'
+down_revision = '5e8a0b3d6c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_username_lower', [sa.text('lower(username)')], unique=False)
+
+    # External-content FTS5 table over user(username, email), kept in sync by triggers
+    op.execute(
+        "CREATE VIRTUAL TABLE user_search USING fts5("
+        "username, email, content='user', content_rowid='rowid', tokenize='trigram')"
+    )
+    op.execute(
+        "CREATE TRIGGER user_search_ai AFTER INSERT ON user BEGIN "
+        "INSERT INTO user_search(rowid, username, email) VALUES (new.rowid, new.username, new.email); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER user_search_ad AFTER DELETE ON user BEGIN "
+        "INSERT INTO user_search(user_search, rowid, username, email) "
+        "VALUES ('delete', old.rowid, old.username, old.email); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER user_search_au AFTER UPDATE OF username, email ON user BEGIN "
+        "INSERT INTO user_search(user_search, rowid, username, email) "
+        "VALUES ('delete', old.rowid, old.username, old.email); "
+        "INSERT INTO user_search(rowid, username, email) VALUES (new.rowid, new.username, new.email); "
+        "END"
+    )
+
+    # Index the existing users
+    op.execute("INSERT INTO user_search(user_search) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS user_search_au")
+    op.execute("DROP TRIGGER IF EXISTS user_search_ad")
+    op.execute("DROP TRIGGER IF EXISTS user_search_ai")
+    op.execute("DROP TABLE IF EXISTS user_search")
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_username_lower')
@@ -0,0 +1,56 @@
+"""Store poll_id on vote and enforce one vote per user per poll
+
+Revision ID: c41d7a9e2f05
+Revises: 8b2e4f6a1c93
+Create Date: 2026-10-18 11:20:54.913370
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7a9e2f05'
+down_revision = '8b2e4f6a1c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('vote', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('poll_id', sa.String(length=36), nullable=True))
+
+    # Backfill poll_id from each vote's option, dropping votes whose option is gone
+    op.execute(
+        "UPDATE vote SET poll_id = "
+        "(SELECT poll_id FROM poll_option WHERE poll_option.id = vote.option_id)"
+    )
+    op.execute("DELETE FROM vote WHERE poll_id IS NULL")
+
+    # Concurrent votes may have left duplicates; keep each user's latest vote per poll
+    op.execute(
+        "DELETE FROM vote WHERE id IN ("
+        "SELECT id FROM ("
+        "SELECT id, ROW_NUMBER() OVER ("
+        "PARTITION BY poll_id, user_id ORDER BY voted_at DESC, rowid DESC"
+        ") AS position FROM vote"
+        ") WHERE position > 1)"
+    )
+
+    with op.batch_alter_table('vote', schema=None) as batch_op:
+        batch_op.alter_column('poll_id', existing_type=sa.String(length=36), nullable=False)
+        batch_op.create_foreign_key('fk_vote_poll_id_poll', 'poll', ['poll_id'], ['id'])
+        batch_op.create_unique_constraint('uq_vote_poll_user', ['poll_id', 'user_id'])
+
+    # Removing duplicates changes the tallies
+    op.execute(
+        "UPDATE poll_option SET vote_count = "
+        "(SELECT COUNT(*) FROM vote WHERE vote.option_id = poll_option.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('vote', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_vote_poll_user', type_='unique')
+        batch_op.drop_constraint('fk_vote_poll_id_poll', type_='foreignkey')
+        batch_op.drop_column('poll_id')
@@ -1,7 +1,7 @@
 from extensions import db
 from datetime import datetime
 
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hasher
 
 # User model
 class User(db.Model):
@@ -12,14 +12,27 @@ class User(db.Model):
     bio = db.Column(db.Text, nullable=True)
     avatar = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped with every change to the user's friendships; keys their cached friend set (see friends.py)
+    friends_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    
+    __table_args__ = (
+        # Case-insensitive username prefix search (see search.py)
+        db.Index('ix_user_username_lower', db.func.lower(username)),
+    )
     
     def set_password(self, password):
         """Hash and set the user's password"""
-        self.password = generate_password_hash(password)
+        self.password = hasher.hash(password)
         
     def check_password(self, password):
-        """Check if the provided password matches the stored hash"""
-        return check_password_hash(self.password, password)
+        """Check if the provided password matches the stored hash
+        
+        A matching hash made with outdated parameters is replaced in place (caller commits).
+        """
+        matches, needs_rehash = hasher.verify(self.password, password)
+        if needs_rehash:
+            self.password = hasher.hash(password)
+        return matches
 
 # Group model
 class Group(db.Model):
@@ -27,7 +40,17 @@ class Group(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     creator_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Not null: group listings page on (created_at, id) (see pagination.py)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Bumped by every write that changes the group payload; used as its ETag
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Turned off once the group is too large to fan polls out to members' feeds (see feed.py)
+    feed_fanout = db.Column(db.Boolean, nullable=False, default=True, server_default='1')
+    
+    __table_args__ = (
+        # Keyset pagination order for group listings
+        db.Index('ix_group_created_at_id', 'created_at', 'id'),
+    )
     
     # Relationships
     creator = db.relationship('User', backref='created_groups')
@@ -37,7 +60,9 @@ class Group(db.Model):
 group_members = db.Table('group_members',
     db.Column('group_id', db.String(36), db.ForeignKey('group.id'), primary_key=True),
     db.Column('user_id', db.String(36), db.ForeignKey('user.id'), primary_key=True),
-    db.Column('joined_at', db.DateTime, default=datetime.utcnow)
+    db.Column('joined_at', db.DateTime, default=datetime.utcnow),
+    # The primary key leads with group_id; this index serves "groups of a user" lookups
+    db.Index('ix_group_members_user_id', 'user_id', 'group_id')
 )
 
 # Poll model
@@ -48,18 +73,50 @@ class Poll(db.Model):
     group_id = db.Column(db.String(36), db.ForeignKey('group.id'), nullable=False)
     creator_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expire_at = db.Column(db.DateTime, nullable=True)
+    expire_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Set by the expiry scheduler once final results are frozen into poll_result
+    closed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        # A group's polls, newest first
+        db.Index('ix_poll_group_id_created_at', 'group_id', 'created_at'),
+        # Open polls by deadline; closed polls drop out, so the expiry scan stays small
+        db.Index('ix_poll_open_expire_at', 'expire_at', sqlite_where=db.text('closed_at IS NULL')),
+    )
     
     # Relationships
     group = db.relationship('Group', backref='polls')
     creator = db.relationship('User', backref='created_polls')
-    options = db.relationship('PollOption', backref='poll', cascade='all, delete-orphan')
+    # Options are always serialized with their poll, so load them eagerly in one IN query
+    options = db.relationship('PollOption', backref='poll', cascade='all, delete-orphan', lazy='selectin')
+
+# Final results of a closed poll, written once by the expiry scheduler
+class PollResult(db.Model):
+    poll_id = db.Column(db.String(36), db.ForeignKey('poll.id'), primary_key=True)
+    closed_at = db.Column(db.DateTime, nullable=False)
+    total_votes = db.Column(db.Integer, nullable=False)
+    total_voters = db.Column(db.Integer, nullable=False)
+    # Option ids with the most votes: empty without votes, several on a tie
+    winner_option_ids = db.Column(db.JSON, nullable=False)
+    # [{"id", "text", "votes", "percentage"}] in display order
+    options = db.Column(db.JSON, nullable=False)
+
+# One row per poll in each member's home feed, clustered on the feed order (see feed.py)
+class FeedEntry(db.Model):
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    # The poll's created_at, copied so a page of the feed is one primary key range
+    created_at = db.Column(db.DateTime, primary_key=True)
+    poll_id = db.Column(db.String(36), db.ForeignKey('poll.id'), primary_key=True)
+    
+    __table_args__ = {'sqlite_with_rowid': False}
 
 # Poll option model
 class PollOption(db.Model):
     id = db.Column(db.String(36), primary_key=True)
-    poll_id = db.Column(db.String(36), db.ForeignKey('poll.id'), nullable=False)
+    poll_id = db.Column(db.String(36), db.ForeignKey('poll.id'), nullable=False, index=True)
     text = db.Column(db.String(200), nullable=False)
+    # Denormalized number of votes for this option, maintained by the vote endpoints
+    vote_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationship
     votes = db.relationship('Vote', backref='option', cascade='all, delete-orphan')
@@ -67,9 +124,147 @@ class PollOption(db.Model):
 # Vote model
 class Vote(db.Model):
     id = db.Column(db.String(36), primary_key=True)
-    option_id = db.Column(db.String(36), db.ForeignKey('poll_option.id'), nullable=False)
-    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
+    # Copied from the option so one-vote-per-user-per-poll can be a unique index
+    poll_id = db.Column(db.String(36), db.ForeignKey('poll.id'), nullable=False)
+    option_id = db.Column(db.String(36), db.ForeignKey('poll_option.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False, index=True)
     voted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # The vote this one replaced, written by the upsert so it can return it (see voting.py)
+    previous_option_id = db.Column(db.String(36), nullable=True)
+    previous_voted_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('poll_id', 'user_id', name='uq_vote_poll_user'),
+    )
     
     # Relationship
-    user = db.relationship('User', backref='votes')
\ No newline at end of file
+    user = db.relationship('User', backref='votes')
+
+# Votes per option per five-minute interval, maintained by the vote endpoints (see timeline.py)
+class VoteBucket(db.Model):
+    poll_id = db.Column(db.String(36), db.ForeignKey('poll.id'), primary_key=True)
+    # Start of the interval in seconds since the epoch, a multiple of 300
+    bucket_start = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    option_id = db.Column(db.String(36), db.ForeignKey('poll_option.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+# Append-only log of every vote cast, in commit order (see vote_log.py)
+class VoteEvent(db.Model):
+    # AUTOINCREMENT so a sequence number is never reused, even after compaction empties the table
+    seq = db.Column(db.Integer, primary_key=True)
+    poll_id = db.Column(db.String(36), nullable=False)
+    user_id = db.Column(db.String(36), nullable=False)
+    option_id = db.Column(db.String(36), nullable=False)
+    # The option this vote replaced, if any
+    previous_option_id = db.Column(db.String(36), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# Every user's vote as of the last compacted event
+class VoteCheckpoint(db.Model):
+    poll_id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.String(36), primary_key=True)
+    option_id = db.Column(db.String(36), nullable=False)
+    voted_at = db.Column(db.DateTime, nullable=False)
+
+# Single row: the last event sequence number folded into vote_checkpoint
+class VoteLogState(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    checkpoint_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    compacted_at = db.Column(db.DateTime, nullable=True)
+
+# Group chat messages, appended at the end of their group's key range (see chat.py)
+class ChatMessage(db.Model):
+    group_id = db.Column(db.String(36), db.ForeignKey('group.id'), primary_key=True)
+    # 1, 2, 3, ... per group, in commit order
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    sender_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    poll_id = db.Column(db.String(36), db.ForeignKey('poll.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = {'sqlite_with_rowid': False}
+
+# Number of users who reacted to a message with each emoji, read along with the messages
+class ChatReaction(db.Model):
+    group_id = db.Column(db.String(36), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    emoji = db.Column(db.String(16), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    __table_args__ = {'sqlite_with_rowid': False}
+
+# Who reacted with what, so a repeated reaction counts once; only read when reactions change
+class ChatReactionUser(db.Model):
+    group_id = db.Column(db.String(36), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    emoji = db.Column(db.String(16), primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    
+    __table_args__ = {'sqlite_with_rowid': False}
+
+# Outbox of notification events, written by the request and drained by the delivery job (see notifications.py)
+class NotificationEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # poll_created, poll_votes or poll_closed
+    kind = db.Column(db.String(20), nullable=False)
+    group_id = db.Column(db.String(36), nullable=False)
+    poll_id = db.Column(db.String(36), nullable=False)
+    # The user who caused the event, who is not notified of it
+    actor_id = db.Column(db.String(36), nullable=True)
+    # New votes since the previous milestone for poll_votes, 1 otherwise
+    count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    created_at = db.Column(db.DateTime, nullable=False)
+
+# A user's notification; repeats of an unread one add to its count instead of adding rows
+class Notification(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    group_id = db.Column(db.String(36), db.ForeignKey('group.id'), nullable=False)
+    poll_id = db.Column(db.String(36), db.ForeignKey('poll.id'), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    created_at = db.Column(db.DateTime, nullable=False)
+    # Moves forward when a repeat is folded in, so the notification comes back to the top
+    updated_at = db.Column(db.DateTime, nullable=False)
+    read_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        # A user's notifications, most recently updated first
+        db.Index('ix_notification_user_updated', 'user_id', 'updated_at', 'id'),
+        # At most one unread notification per user, kind and poll: the one repeats are folded into
+        db.Index('ux_notification_unread', 'user_id', 'kind', 'poll_id', unique=True,
+                 sqlite_where=db.text('read_at IS NULL')),
+    )
+
+# Number of unread notifications per user, maintained with every delivery and read
+class NotificationCounter(db.Model):
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    __table_args__ = {'sqlite_with_rowid': False}
+
+# Accepted friendships, stored once in each direction so either side's friends are one key range (see friends.py)
+class Friendship(db.Model):
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    friend_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        # A user's friends, newest first
+        db.Index('ix_friendship_user_created', 'user_id', 'created_at', 'friend_id'),
+        {'sqlite_with_rowid': False},
+    )
+
+# Pending friend requests; accepting or declining one deletes it
+class FriendRequest(db.Model):
+    sender_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    recipient_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        # Requests a user has received; the primary key serves those they sent
+        db.Index('ix_friend_request_recipient', 'recipient_id', 'created_at'),
+        {'sqlite_with_rowid': False},
+    )
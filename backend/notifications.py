@@ -0,0 +1,251 @@
+"""
+Notifications for Project Bolt
+
+Group members are notified when a poll is created in their group, when a
+poll passes a vote milestone, and when a poll closes. Requests never write
+the members' notifications themselves. In a 500-member group that would be
+500 rows inside the request's transaction. Instead the request appends one
+event to the notification_event outbox, in the transaction that made the
+change, and moves on.
+
+The delivery job drains the outbox every NOTIFICATION_INTERVAL seconds. It
+claims up to a batch of events with one DELETE ... RETURNING, so two worker
+processes never deliver the same event, and coalesces the batch in memory:
+events of the same kind for the same poll become one. Each remaining event
+is then written to every member at once with two set-based statements:
+- one upsert into notification. A member who still has an unread
+  notification of that kind for that poll gets its count raised and its
+  updated_at moved ("5 new votes on X") rather than a new row;
+- one upsert that adds 1 to notification_counter for the members whose
+  notification is new.
+The claim and the writes commit together. If delivery fails, the events go
+back into the outbox.
+
+notification_counter holds every user's unread count. The unread endpoint
+reads that one row instead of counting notifications, and marking
+notifications read subtracts the number of rows it changed.
+`flask rebuild-notification-counters` recomputes the counters from the
+notifications.
+
+Vote milestones are the totals in VOTE_MILESTONES, then every 1000 votes. A
+poll_votes event carries the votes since the previous milestone, so the
+count a member sees is the number of new votes since their last read.
+"""
+
+import bisect
+from datetime import datetime
+
+from sqlalchemy import literal, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import Group, Notification, NotificationCounter, NotificationEvent, Poll, group_members
+from pagination import decode_cursor, encode_cursor
+from serializers import NOTIFICATION_COLUMNS, notification_dict
+
+DEFAULT_BATCH_SIZE = 500
+VOTE_MILESTONES = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+# Past the last milestone, every multiple of this is one
+VOTE_MILESTONE_STEP = 1000
+
+POLL_CREATED = 'poll_created'
+POLL_VOTES = 'poll_votes'
+POLL_CLOSED = 'poll_closed'
+
+event_table = NotificationEvent.__table__
+notification_table = Notification.__table__
+counter_table = NotificationCounter.__table__
+
+
+def milestone_reached(total):
+    """The highest vote milestone at or below `total`, 0 below the first"""
+    if total >= VOTE_MILESTONES[-1]:
+        return total // VOTE_MILESTONE_STEP * VOTE_MILESTONE_STEP
+    index = bisect.bisect_right(VOTE_MILESTONES, total)
+    return VOTE_MILESTONES[index - 1] if index else 0
+
+
+def enqueue_events(events):
+    """Append {kind, group_id, poll_id, actor_id, count, created_at} events to the outbox (caller commits)"""
+    if events:
+        db.session.execute(db.insert(event_table), events)
+
+
+def enqueue_poll_created(poll_id, group_id, creator_id, now=None):
+    enqueue_events([{"kind": POLL_CREATED, "group_id": group_id, "poll_id": poll_id, "actor_id": creator_id,
+                     "count": 1, "created_at": now or datetime.now()}])
+
+
+def enqueue_vote_milestone(poll_id, group_id, total_before, total_after, now=None):
+    """Queue a poll_votes event if the poll's total passed a milestone; returns True if it did"""
+    reached, previous = milestone_reached(total_after), milestone_reached(total_before)
+    if reached <= previous:
+        return False
+    enqueue_events([{"kind": POLL_VOTES, "group_id": group_id, "poll_id": poll_id, "actor_id": None,
+                     "count": reached - previous, "created_at": now or datetime.now()}])
+    return True
+
+
+def enqueue_polls_closed(polls, now=None):
+    """Queue a poll_closed event for each (poll_id, group_id)"""
+    now = now or datetime.now()
+    enqueue_events([
+        {"kind": POLL_CLOSED, "group_id": group_id, "poll_id": poll_id, "actor_id": None, "count": 1,
+         "created_at": now}
+        for poll_id, group_id in polls
+    ])
+
+
+def claim_events(batch_size=DEFAULT_BATCH_SIZE):
+    """Take the oldest events out of the outbox (caller commits, or rolls back to put them back)"""
+    oldest = db.select(event_table.c.id).order_by(event_table.c.id).limit(batch_size)
+    return db.session.execute(
+        db.delete(event_table)
+        .where(event_table.c.id.in_(oldest.scalar_subquery()))
+        .returning(event_table.c.id, event_table.c.kind, event_table.c.group_id, event_table.c.poll_id,
+                   event_table.c.actor_id, event_table.c.count, event_table.c.created_at)
+    ).all()
+
+
+def coalesce_events(events):
+    """Merge events of the same kind for the same poll, in order of their first event"""
+    merged = {}
+    for event in sorted(events, key=lambda event: event.id):
+        key = (event.kind, event.poll_id)
+        current = merged.get(key)
+        if current is None:
+            merged[key] = {"kind": event.kind, "group_id": event.group_id, "poll_id": event.poll_id,
+                           "actor_id": event.actor_id, "count": event.count, "created_at": event.created_at}
+        else:
+            current["count"] += event.count
+            current["created_at"] = max(current["created_at"], event.created_at)
+            if current["actor_id"] != event.actor_id:
+                current["actor_id"] = None
+    return list(merged.values())
+
+
+def fan_out_event(event):
+    """Write one event to every member of its group in two statements (caller commits)"""
+    recipients = db.select(group_members.c.user_id).where(group_members.c.group_id == event["group_id"])
+    if event["actor_id"] is not None:
+        recipients = recipients.where(group_members.c.user_id != event["actor_id"])
+    unread = (
+        db.select(notification_table.c.id)
+        .where(notification_table.c.user_id == group_members.c.user_id,
+               notification_table.c.kind == event["kind"],
+               notification_table.c.poll_id == event["poll_id"],
+               notification_table.c.read_at.is_(None))
+        .exists()
+    )
+
+    # Counters first, while a member's earlier unread notification still tells a repeat from a new one
+    counters = sqlite_insert(counter_table).from_select(
+        ['user_id', 'unread'], recipients.add_columns(literal(1)).where(~unread)
+    )
+    db.session.execute(counters.on_conflict_do_update(
+        index_elements=['user_id'], set_={'unread': counter_table.c.unread + 1}
+    ))
+
+    notifications = sqlite_insert(notification_table).from_select(
+        ['user_id', 'kind', 'group_id', 'poll_id', 'count', 'created_at', 'updated_at'],
+        recipients.add_columns(
+            literal(event["kind"]), literal(event["group_id"]), literal(event["poll_id"]),
+            literal(event["count"]), literal(event["created_at"], db.DateTime),
+            literal(event["created_at"], db.DateTime),
+        ),
+    )
+    db.session.execute(notifications.on_conflict_do_update(
+        index_elements=['user_id', 'kind', 'poll_id'],
+        index_where=notification_table.c.read_at.is_(None),
+        set_={
+            'count': notification_table.c.count + notifications.excluded.count,
+            'updated_at': notifications.excluded.updated_at,
+        },
+    ))
+
+
+def deliver_notifications(batch_size=DEFAULT_BATCH_SIZE):
+    """Drain the outbox into members' notifications; returns the number of events delivered"""
+    delivered = 0
+    while True:
+        events = claim_events(batch_size)
+        if not events:
+            db.session.rollback()
+            break
+        for event in coalesce_events(events):
+            fan_out_event(event)
+        db.session.commit()
+        delivered += len(events)
+    return delivered
+
+
+def unread_count(user_id):
+    """The user's unread count, or None when they have no counter yet"""
+    return db.session.execute(
+        db.select(counter_table.c.unread).where(counter_table.c.user_id == user_id)
+    ).scalar()
+
+
+def mark_read(user_id, ids=None, now=None):
+    """Mark the given notifications (all when ids is None) read; returns the unread count left
+
+    None when the user has no counter, so nothing was unread. Caller commits.
+    """
+    query = db.update(notification_table).where(
+        notification_table.c.user_id == user_id, notification_table.c.read_at.is_(None)
+    )
+    if ids is not None:
+        query = query.where(notification_table.c.id.in_(ids))
+    marked = db.session.execute(query.values(read_at=now or datetime.now())).rowcount
+    return db.session.execute(
+        db.update(counter_table)
+        .where(counter_table.c.user_id == user_id)
+        .values(unread=db.func.max(counter_table.c.unread - marked, 0))
+        .returning(counter_table.c.unread)
+    ).scalar()
+
+
+def load_notifications(user_id, cursor, limit):
+    """One page of a user's notifications, most recently updated first, as (payloads, next_cursor)
+
+    Raises ValueError for a malformed cursor.
+    """
+    query = (
+        db.select(*NOTIFICATION_COLUMNS)
+        .select_from(notification_table)
+        .join(Poll, Poll.id == notification_table.c.poll_id)
+        .join(Group, Group.id == notification_table.c.group_id)
+        .where(notification_table.c.user_id == user_id)
+    )
+    if cursor:
+        updated_at, notification_id = decode_cursor(cursor, id_type=int)
+        query = query.where(
+            tuple_(notification_table.c.updated_at, notification_table.c.id) < tuple_(updated_at, notification_id)
+        )
+    rows = db.session.execute(
+        query.order_by(notification_table.c.updated_at.desc(), notification_table.c.id.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+    return [notification_dict(row) for row in rows], next_cursor
+
+
+def rebuild_unread_counters():
+    """Recompute every unread counter from the notifications; returns the number of users with unread ones"""
+    db.session.execute(db.delete(counter_table))
+    result = db.session.execute(counter_table.insert().from_select(
+        ['user_id', 'unread'],
+        db.select(notification_table.c.user_id, db.func.count())
+        .where(notification_table.c.read_at.is_(None))
+        .group_by(notification_table.c.user_id),
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def init_notification_delivery(scheduler, interval):
+    """Register outbox delivery as a background job (see scheduler.py)"""
+    scheduler.add_job('notification-delivery', interval, deliver_notifications)
@@ -0,0 +1,137 @@
+"""
+Password hashing for Project Bolt
+
+Hashing and verifying a password is deliberately slow (tens to hundreds of
+milliseconds of pure CPU), so it runs on a small process pool instead of the
+request thread. The waiting request thread releases the GIL, so the worker
+keeps serving other requests during a login storm. The hashes themselves run
+in parallel on every core.
+
+The pool has a bounded queue. When more than PASSWORD_HASH_QUEUE_LIMIT
+hash jobs are pending, new ones fail fast with PasswordHasherBusy, which
+the API turns into a 503 with Retry-After. Without the limit, requests would
+pile up behind a backlog that takes seconds to drain.
+
+Settings (environment variables, read in app.py):
+
+    PASSWORD_HASH_METHOD       Werkzeug method string, e.g. scrypt:32768:8:1
+                               or pbkdf2:sha256:600000
+    PASSWORD_HASH_WORKERS      pool processes; 0 hashes on the request thread
+    PASSWORD_HASH_QUEUE_LIMIT  pending hash jobs before requests are shed
+
+A stored hash whose method differs from PASSWORD_HASH_METHOD still verifies.
+The login endpoint rehashes it with the current method, so changing the
+setting upgrades users as they log in.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import jsonify
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many hash jobs are already queued"""
+
+
+def normalize_method(method):
+    """Spell out a Werkzeug method string with all its parameters, as stored in hashes"""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        if not args:
+            args = ['32768', '8', '1']
+        if len(args) != 3:
+            raise ValueError("scrypt takes three parameters: scrypt:N:r:p")
+    elif name == 'pbkdf2':
+        if not args:
+            args = ['sha256']
+        if len(args) == 1:
+            args.append(str(DEFAULT_PBKDF2_ITERATIONS))
+        if len(args) != 2:
+            raise ValueError("pbkdf2 takes two parameters: pbkdf2:hash_name:iterations")
+    else:
+        raise ValueError(f"Unsupported password hash method {method!r}")
+    return ':'.join([name] + [str(arg) for arg in args])
+
+
+def stored_method(password_hash):
+    """The method string a stored hash was created with"""
+    return password_hash.split('$', 1)[0]
+
+
+class PasswordHasher:
+    """Hash and verify passwords on a bounded process pool"""
+
+    def __init__(self, method=DEFAULT_METHOD, workers=0, queue_limit=64):
+        self.configure(method, workers, queue_limit)
+
+    def configure(self, method=DEFAULT_METHOD, workers=0, queue_limit=64):
+        self.shutdown()
+        self.method = normalize_method(method)
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _executor(self):
+        # Created lazily, and again in a forked child: pool threads do not survive fork
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                raise PasswordHasherBusy(f"{self._pending} password hashes already queued")
+            self._pending += 1
+        try:
+            if not self.workers:
+                return fn(*args)
+            with self._lock:
+                future = self._executor().submit(fn, *args)
+            return future.result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Return (matches, needs_rehash) for a stored hash"""
+        matches = self._run(check_password_hash, password_hash, password)
+        return matches, matches and self.needs_rehash(password_hash)
+
+    def needs_rehash(self, password_hash):
+        """True if a stored hash was made with other parameters than the configured ones"""
+        return stored_method(password_hash) != self.method
+
+    def shutdown(self):
+        pool = getattr(self, '_pool', None)
+        if pool is not None and self._pool_pid == os.getpid():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+
+hasher = PasswordHasher()
+
+
+def init_password_hashing(app):
+    """Configure the shared hasher from app config and shed load with a 503 when it is full"""
+    hasher.configure(
+        method=app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+        workers=app.config.get('PASSWORD_HASH_WORKERS', 0),
+        queue_limit=app.config.get('PASSWORD_HASH_QUEUE_LIMIT', 64),
+    )
+
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        return jsonify({"error": "Too many sign-ins in progress, try again shortly"}), 503, {'Retry-After': '1'}
@@ -0,0 +1,76 @@
+"""
+Per-endpoint SQL query budgets for Project Bolt
+
+Endpoints declare how many SQL statements a single request may issue with the
+@query_budget decorator. Every statement sent through SQLAlchemy is counted
+for the current request; a request that goes over its budget is logged, or
+rejected when QUERY_BUDGET_STRICT is enabled. record_queries() captures the
+statements issued inside a block and is used by check_query_budgets.py and
+check_query_plans.py to catch N+1 queries and table scans before they ship.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in strict mode when a request issues more queries than declared"""
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL statements a view may issue"""
+    def decorator(f):
+        f.query_budget = max_queries
+        return f
+
+    return decorator
+
+
+def get_query_budget(view_function):
+    """Return the declared budget of a view function, or None"""
+    return getattr(view_function, 'query_budget', None)
+
+
+@contextmanager
+def record_queries():
+    """Collect (statement, parameters) for every SQL statement run on this thread"""
+    statements = []
+    recorders = getattr(_local, 'recorders', None)
+    if recorders is None:
+        recorders = _local.recorders = []
+    recorders.append(statements)
+    try:
+        yield statements
+    finally:
+        recorders.remove(statements)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for statements in getattr(_local, 'recorders', ()):
+        statements.append((statement, parameters))
+    if has_request_context():
+        g.sql_query_count = g.get('sql_query_count', 0) + 1
+
+
+def init_query_budget(app):
+    """Check each request's statement count against its endpoint's budget"""
+    app.config.setdefault('QUERY_BUDGET_STRICT', False)
+
+    @app.after_request
+    def check_query_budget(response):
+        view_function = current_app.view_functions.get(request.endpoint)
+        budget = get_query_budget(view_function)
+        used = g.get('sql_query_count', 0)
+        if budget is not None and used > budget:
+            message = f"{request.endpoint} issued {used} SQL queries (budget {budget})"
+            if current_app.config['QUERY_BUDGET_STRICT']:
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
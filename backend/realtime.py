@@ -0,0 +1,122 @@
+"""
+Live poll result streaming for Project Bolt
+
+vote_poll publishes the new counts of the options it touched to an
+in-process publish/subscribe hub after each commit. Every open
+GET /api/polls/<poll_id>/stream connection holds a subscription: bursts of
+votes are merged into its pending changes and flushed as a single
+Server-Sent Event at most once per coalescing interval, with comment-line
+heartbeats keeping idle connections (and proxies) alive.
+
+The hub lives in process memory, so a subscriber only sees votes handled by
+the same server process.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+
+
+class Subscription:
+    """Pending tally changes for one connected client"""
+
+    def __init__(self, poll_id):
+        self.poll_id = poll_id
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def push(self, counts):
+        """Merge new option counts; the latest count for an option wins"""
+        with self._lock:
+            self._pending.update(counts)
+        self._ready.set()
+
+    def wait(self, timeout):
+        """Block until changes are pending or the timeout passes"""
+        return self._ready.wait(timeout)
+
+    def drain(self):
+        """Take all pending changes"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._ready.clear()
+        return pending
+
+
+class TallyHub:
+    """In-process publish/subscribe hub keyed by poll id"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, poll_id):
+        subscription = Subscription(poll_id)
+        with self._lock:
+            self._subscribers[poll_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.poll_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.poll_id]
+
+    def publish(self, poll_id, counts):
+        """Send {option_id: vote_count} to everyone watching the poll"""
+        if not counts:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers.get(poll_id, ()))
+        for subscription in subscribers:
+            subscription.push(counts)
+
+    def subscriber_count(self, poll_id):
+        with self._lock:
+            return len(self._subscribers.get(poll_id, ()))
+
+
+hub = TallyHub()
+
+
+def format_event(event, data, event_id=None):
+    """Format one Server-Sent Event with a compact JSON payload
+
+    With an event_id the browser sends it back as Last-Event-ID when it reconnects.
+    """
+    line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{line}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def stream_tallies(subscription, snapshot, coalesce_interval=1.0, heartbeat_interval=15.0):
+    """Yield the SSE stream for one subscription
+
+    The first event is the full snapshot of counts; after that only options
+    whose counts changed are sent, at most once per coalesce_interval.
+    """
+    poll_id = subscription.poll_id
+    try:
+        yield "retry: 3000\n\n"
+        yield format_event('snapshot', {"poll_id": poll_id, "votes": snapshot})
+
+        last_sent = time.monotonic()
+        while True:
+            if not subscription.wait(heartbeat_interval):
+                yield ": heartbeat\n\n"
+                continue
+
+            # Let a burst of votes accumulate into one message
+            delay = last_sent + coalesce_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            changes = subscription.drain()
+            if changes:
+                yield format_event('tally', {"poll_id": poll_id, "votes": changes})
+                last_sent = time.monotonic()
+    finally:
+        hub.unsubscribe(subscription)
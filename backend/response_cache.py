@@ -0,0 +1,106 @@
+"""
+Group payload caching for Project Bolt
+
+Every group carries a version counter. Each write that changes what
+GET /api/groups/<group_id> returns bumps it in the same transaction:
+create_poll, votes, and profile edits of a member.
+
+One thing changes the payload without a write: time. A poll reads as
+inactive once its expire_at passes, even before the expiry job closes it
+(with POLL_EXPIRY_INTERVAL=0 the job never does). So the same lookup also
+reads the group's next deadline, the earliest expire_at among its open polls
+that is still in the future. Between two writes, the payload depends only
+on which deadline comes next. The group endpoint uses the (version, next
+deadline) pair in two ways:
+
+- it is the strong ETag, so a client sending a matching If-None-Match gets a
+  304 after a single primary-key lookup, with no serialization queries;
+- it keys an in-process LRU of serialized response bodies, so hot groups are
+  served straight from memory until their next write or deadline.
+
+Old versions are never invalidated explicitly; they stop being requested
+and age out of the LRU.
+"""
+
+import threading
+from collections import OrderedDict
+
+from extensions import db
+from models import Group, Poll, group_members
+
+group_table = Group.__table__
+poll_table = Poll.__table__
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with a fixed number of entries"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+group_body_cache = LRUCache()
+
+
+def group_etag(group_id, version, next_deadline=None):
+    """Strong entity tag for one version of a group payload, until its next poll deadline"""
+    if next_deadline is None:
+        return f"{group_id}-{version}"
+    return f"{group_id}-{version}-{next_deadline:%Y%m%d%H%M%S%f}"
+
+
+def current_group_version(group_id, now):
+    """Return (version, next poll deadline after now) for a group, or None if it does not exist"""
+    next_deadline = (
+        db.select(db.func.min(poll_table.c.expire_at))
+        .where(poll_table.c.group_id == group_table.c.id, poll_table.c.closed_at.is_(None),
+               poll_table.c.expire_at > now)
+        .scalar_subquery()
+    )
+    return db.session.execute(
+        db.select(group_table.c.version, next_deadline).where(group_table.c.id == group_id)
+    ).first()
+
+
+def bump_group_version(group_id):
+    """Invalidate cached payloads of one group (caller commits)"""
+    db.session.execute(
+        db.update(group_table)
+        .where(group_table.c.id == group_id)
+        .values(version=group_table.c.version + 1)
+    )
+
+
+def bump_group_versions_for_member(user_id):
+    """Invalidate cached payloads of every group the user belongs to (caller commits)"""
+    member_of = db.select(group_members.c.group_id).where(group_members.c.user_id == user_id)
+    db.session.execute(
+        db.update(group_table)
+        .where(group_table.c.id.in_(member_of))
+        .values(version=group_table.c.version + 1)
+    )
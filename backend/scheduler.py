@@ -0,0 +1,83 @@
+"""
+Background jobs for Project Bolt
+
+Maintenance work that must happen on a clock (closing expired polls,
+compacting the vote log) runs as jobs on one daemon thread per worker
+process. The thread starts with the first request a worker serves, never at
+import time. It is started again in a forked child, since threads do not
+survive fork. CLI commands and scripts that only import the app therefore
+never run jobs.
+
+Every job must be safe to run concurrently from several worker processes:
+each one claims its work with a conditional write and skips what another
+process already did.
+"""
+
+import os
+import threading
+import time
+
+from extensions import db
+
+
+class BackgroundScheduler:
+    """Run registered jobs at fixed intervals on a daemon thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self.jobs = []
+        self._stop = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def add_job(self, name, interval, fn):
+        """Call fn() inside an app context every `interval` seconds; a zero interval disables it"""
+        if interval:
+            self.jobs.append({"name": name, "interval": interval, "fn": fn, "due": 0.0})
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or not self.jobs:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            now = time.monotonic()
+            for job in self.jobs:
+                job["due"] = now + job["interval"]
+            threading.Thread(target=self._run, name='background-jobs', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in self.jobs:
+                if now >= job["due"]:
+                    job["due"] = now + job["interval"]
+                    self._run_job(job)
+            next_due = min(job["due"] for job in self.jobs)
+            self._stop.wait(max(0.0, next_due - time.monotonic()))
+
+    def _run_job(self, job):
+        with self.app.app_context():
+            try:
+                job["fn"]()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Background job %s failed", job["name"])
+            finally:
+                db.session.remove()
+
+
+def init_scheduler(app):
+    """Create the app's scheduler and start it with the first request each worker serves"""
+    scheduler = BackgroundScheduler(app)
+    app.extensions['background_scheduler'] = scheduler
+
+    @app.before_request
+    def start_background_jobs():
+        scheduler.ensure_started()
+
+    return scheduler
@@ -4,14 +4,44 @@ Database seeder for Project Bolt
 This script populates the database with sample data for development and testing.
 Run this script after setting up your database with `flask db upgrade`.
 
+`python seed.py` creates the small demo dataset (3 users, 3 groups, 2 polls,
+a few chat messages, one friendship and one pending friend request).
+`python seed.py generate` builds a synthetic dataset of any size for
+reproducing performance problems. Counts and skew are parameters, and a
+fixed --seed gives the same database every time. Rows are written with bulk
+Core inserts in large transactions, so tens of millions of votes take
+minutes, not hours. Group sizes, poll activity and option popularity follow
+Zipf distributions, so a few groups are huge and a few polls are hot, as in
+production. Every synthetic user's password is "password123".
+
 Usage:
-    python seed.py
+    python seed.py [--yes]
+    python seed.py generate --users 200000 --groups 20000 --polls 100000 --votes 10000000 [--messages 1000000] [--friendships 1000000] [--seed 1] [--yes]
+    python seed.py generate --help
 """
 
+import argparse
+import bisect
+import itertools
+import random
+import time
 import uuid
 from datetime import datetime, timedelta
-from app import app, db
-from models import User, Group, Poll, PollOption, Vote
+from sqlalchemy import insert, text
+from app import create_app
+from extensions import db
+from flask import current_app
+from models import (User, Group, Poll, PollOption, PollResult, Vote, VoteBucket, VoteCheckpoint, VoteEvent,
+                    VoteLogState, FeedEntry, ChatMessage, ChatReaction, ChatReactionUser, Notification,
+                    NotificationCounter, NotificationEvent, Friendship, FriendRequest, group_members)
+from expiry import close_expired_polls
+from feed import rebuild_feeds
+from notifications import (POLL_CREATED, deliver_notifications, enqueue_events, enqueue_poll_created,
+                           enqueue_vote_milestone)
+from passwords import hasher
+from tallies import rebuild_tallies
+from timeline import bucket_of, rebuild_vote_buckets
+from vote_log import append_vote_events
 
 def create_users():
     """Create sample users"""
@@ -112,6 +142,10 @@ def create_polls(groups, users):
     print("Creating sample polls...")
     
     # Clear existing polls, options, and votes
+    VoteBucket.query.delete()
+    VoteEvent.query.delete()
+    VoteCheckpoint.query.delete()
+    PollResult.query.delete()
     Vote.query.delete()
     PollOption.query.delete()
     Poll.query.delete()
@@ -181,37 +215,429 @@ def create_polls(groups, users):
     
     # Create some votes
     votes = [
-        Vote(id=str(uuid.uuid4()), option_id=option1.id, user_id=users[0].id, voted_at=datetime.now() - timedelta(hours=12)),
-        Vote(id=str(uuid.uuid4()), option_id=option2.id, user_id=users[1].id, voted_at=datetime.now() - timedelta(hours=10)),
-        Vote(id=str(uuid.uuid4()), option_id=option3.id, user_id=users[2].id, voted_at=datetime.now() - timedelta(hours=8)),
-        Vote(id=str(uuid.uuid4()), option_id=book_option1.id, user_id=users[0].id, voted_at=datetime.now() - timedelta(hours=6)),
-        Vote(id=str(uuid.uuid4()), option_id=book_option2.id, user_id=users[1].id, voted_at=datetime.now() - timedelta(hours=4))
+        Vote(id=str(uuid.uuid4()), poll_id=weekend_poll.id, option_id=option1.id, user_id=users[0].id, voted_at=datetime.now() - timedelta(hours=12)),
+        Vote(id=str(uuid.uuid4()), poll_id=weekend_poll.id, option_id=option2.id, user_id=users[1].id, voted_at=datetime.now() - timedelta(hours=10)),
+        Vote(id=str(uuid.uuid4()), poll_id=weekend_poll.id, option_id=option3.id, user_id=users[2].id, voted_at=datetime.now() - timedelta(hours=8)),
+        Vote(id=str(uuid.uuid4()), poll_id=book_poll.id, option_id=book_option1.id, user_id=users[0].id, voted_at=datetime.now() - timedelta(hours=6)),
+        Vote(id=str(uuid.uuid4()), poll_id=book_poll.id, option_id=book_option2.id, user_id=users[1].id, voted_at=datetime.now() - timedelta(hours=4))
     ]
     db.session.add_all(votes)
     db.session.commit()
     
+    # Votes were inserted directly, so bring the stored tallies, timelines and vote log in line
+    rebuild_tallies()
+    rebuild_vote_buckets()
+    append_vote_events([
+        {"poll_id": vote.poll_id, "user_id": vote.user_id, "option_id": vote.option_id,
+         "previous_option_id": None, "created_at": vote.voted_at}
+        for vote in Vote.query.order_by(Vote.voted_at)
+    ])
+    db.session.commit()
+    
+    # Polls were inserted directly too, so fill the members' home feeds
+    rebuild_feeds(current_app.config['FEED_FANOUT_MAX_MEMBERS'])
+    
     return [weekend_poll, book_poll]
 
-def seed_database():
+def create_messages(groups, users, polls):
+    """Create a short chat in the movie night group"""
+    print("Creating sample chat messages...")
+    
+    movie_night = groups[0].id
+    started = datetime.now() - timedelta(hours=3)
+    lines = [
+        (users[0], "Anyone up for movie night this weekend?", None),
+        (users[1], "Count me in! I made a poll so we can pick the day.", polls[0].id),
+        (users[2], "Saturday works best for me", None),
+        (users[0], "Saturday it is, unless the poll says otherwise", None),
+    ]
+    messages = [
+        {"group_id": movie_night, "seq": seq, "sender_id": user.id, "content": content, "poll_id": poll_id,
+         "created_at": started + timedelta(minutes=20 * seq)}
+        for seq, (user, content, poll_id) in enumerate(lines, start=1)
+    ]
+    db.session.execute(insert(ChatMessage.__table__), messages)
+    
+    # Two people liked the poll link
+    db.session.execute(insert(ChatReactionUser.__table__), [
+        {"group_id": movie_night, "seq": 2, "emoji": "👍", "user_id": users[0].id},
+        {"group_id": movie_night, "seq": 2, "emoji": "👍", "user_id": users[2].id},
+    ])
+    db.session.execute(insert(ChatReaction.__table__).values(group_id=movie_night, seq=2, emoji="👍", count=2))
+    db.session.commit()
+    
+    return messages
+
+def create_notifications(polls):
+    """Notify members of the sample polls and their votes, through the outbox like the API does"""
+    print("Creating sample notifications...")
+    
+    for poll in polls:
+        enqueue_poll_created(poll.id, poll.group_id, poll.creator_id, poll.created_at)
+        enqueue_vote_milestone(poll.id, poll.group_id, 0, sum(option.vote_count for option in poll.options))
+    db.session.commit()
+    
+    return deliver_notifications()
+
+def create_friendships(users):
+    """Make the first two users friends and leave a request from the third to the first"""
+    print("Creating sample friendships...")
+    
+    admin, john, jane = users
+    since = datetime.now() - timedelta(days=20)
+    db.session.execute(insert(Friendship.__table__), [
+        {"user_id": admin.id, "friend_id": john.id, "created_at": since},
+        {"user_id": john.id, "friend_id": admin.id, "created_at": since},
+    ])
+    db.session.execute(insert(FriendRequest.__table__).values(
+        sender_id=jane.id, recipient_id=admin.id, created_at=datetime.now() - timedelta(days=1)
+    ))
+    db.session.commit()
+
+def seed_database(app, confirmed=False):
     """Main function to seed the database"""
     with app.app_context():
         # Confirm before proceeding
-        print("This will delete existing data and create sample data in the database.")
-        confirm = input("Do you want to continue? (y/n): ")
-        
-        if confirm.lower() != 'y':
-            print("Database seeding cancelled.")
+        if not confirm("This will delete existing data and create sample data in the database.", confirmed):
             return
         
+        # Start from an empty database; memberships would otherwise collide on a rerun
+        clear_database()
+        
         # Create samples
         users = create_users()
         groups = create_groups(users)
         polls = create_polls(groups, users)
+        messages = create_messages(groups, users, polls)
+        create_notifications(polls)
+        create_friendships(users)
         
         print("Database seeding completed successfully!")
         print(f"- {len(users)} users created")
         print(f"- {len(groups)} groups created")
         print(f"- {len(polls)} polls created with options and votes")
+        print(f"- {len(messages)} chat messages created")
+        print("- 1 friendship and 1 pending friend request created")
+
+def confirm(message, confirmed):
+    """Ask before destroying data, unless --yes was given"""
+    print(message)
+    if confirmed:
+        return True
+    if input("Do you want to continue? (y/n): ").lower() != 'y':
+        print("Database seeding cancelled.")
+        return False
+    return True
+
+# Synthetic datasets
+
+class ZipfSampler:
+    """Draw indexes 0..n-1 with P(rank k) proportional to 1/k**s; s=0 is uniform
+
+    Ranks are shuffled over the indexes, so the hot items are spread out
+    instead of always being the first ones.
+    """
+    
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        self.order = list(range(n))
+        rng.shuffle(self.order)
+        self.cumulative = list(itertools.accumulate(1.0 / (k ** s) for k in range(1, n + 1)))
+        self.weights_total = self.cumulative[-1]
+    
+    def weight(self, rank):
+        previous = self.cumulative[rank - 1] if rank else 0.0
+        return (self.cumulative[rank] - previous) / self.weights_total
+    
+    def draw(self):
+        rank = bisect.bisect_left(self.cumulative, self.rng.random() * self.weights_total)
+        return self.order[min(rank, len(self.order) - 1)]
+
+def allocate_votes(votes, weights, cap):
+    """Split `votes` by weight with at most `cap` per poll (one vote per user)
+
+    What a capped poll cannot take is shared out over the others, so the
+    requested total is met whenever votes <= cap * len(weights).
+    """
+    totals = [0] * len(weights)
+    remaining = votes
+    open_polls = list(range(len(weights)))
+    while remaining > 0 and open_polls:
+        weight_sum = sum(weights[i] for i in open_polls)
+        capped = [i for i in open_polls if remaining * weights[i] / weight_sum >= cap - totals[i]]
+        if not capped:
+            for i in open_polls:
+                totals[i] += int(remaining * weights[i] / weight_sum)
+            # Rounding leftovers go to the heaviest polls
+            leftover = votes - sum(totals)
+            for i in sorted(open_polls, key=lambda i: -weights[i])[:leftover]:
+                totals[i] += 1
+            break
+        for i in capped:
+            remaining -= cap - totals[i]
+            totals[i] = cap
+        open_polls = [i for i in open_polls if totals[i] < cap]
+    return totals
+
+def bulk_insert(table, rows, batch_size):
+    """executemany in batches; rows may be any iterable of dicts"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+
+def clear_database():
+    """Delete every row, children before parents"""
+    for table in (FriendRequest, Friendship, NotificationCounter, Notification, NotificationEvent, ChatReactionUser, ChatReaction, ChatMessage,
+                  FeedEntry, VoteEvent, VoteCheckpoint, VoteLogState, VoteBucket, PollResult, Vote, PollOption, Poll):
+        db.session.execute(db.delete(table.__table__))
+    db.session.execute(db.delete(group_members))
+    db.session.execute(db.delete(Group.__table__))
+    db.session.execute(db.delete(User.__table__))
+    db.session.commit()
+
+def synthetic_id(rng):
+    """Deterministic UUID4-shaped id"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def generate_dataset(users, groups, polls, votes, messages=0, friendships=0, members_per_group=20,
+                     options_per_poll=4, group_skew=1.0, poll_skew=1.1, option_skew=0.8, days=180, seed=1,
+                     batch_size=50000, log=print):
+    """Fill an empty database with a synthetic dataset; returns row counts"""
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    span = (now - start).total_seconds()
+    counts = {"users": users, "groups": groups, "memberships": 0, "polls": polls, "options": 0, "votes": 0}
+    
+    def moment(after=start, before=now):
+        return after + timedelta(seconds=rng.random() * max(0.0, (before - after).total_seconds()))
+    
+    # Users: one shared hash, since hashing each password would take hours
+    log(f"Users: {users}")
+    password_hash = hasher.hash("password123")
+    user_ids = [f"user-{i:08d}" for i in range(users)]
+    bulk_insert(User.__table__, (
+        {"id": user_id, "username": f"user{i}", "email": f"user{i}@example.com", "password": password_hash,
+         "bio": "", "avatar": f"https://i.pravatar.cc/150?u={i}",
+         "created_at": start + timedelta(seconds=span * i / users)}
+        for i, user_id in enumerate(user_ids)
+    ), batch_size)
+    db.session.commit()
+    
+    # Groups and memberships: a few groups are huge, most are small
+    log(f"Groups: {groups}, about {groups * members_per_group} memberships")
+    group_ids = [synthetic_id(rng) for _ in range(groups)]
+    group_sampler = ZipfSampler(groups, group_skew, rng)
+    members = [set() for _ in range(groups)]
+    for _ in range(groups * members_per_group):
+        members[group_sampler.draw()].add(rng.randrange(users))
+    group_rows, membership_rows = [], []
+    for index, group_id in enumerate(group_ids):
+        if not members[index]:
+            members[index].add(rng.randrange(users))
+        members[index] = sorted(members[index])
+        creator = user_ids[rng.choice(members[index])]
+        group_rows.append({"id": group_id, "name": f"Group {index}", "description": "Synthetic group",
+                           "creator_id": creator, "created_at": moment()})
+        membership_rows.extend({"group_id": group_id, "user_id": user_ids[m]} for m in members[index])
+    bulk_insert(Group.__table__, group_rows, batch_size)
+    bulk_insert(group_members, membership_rows, batch_size)
+    counts["memberships"] = len(membership_rows)
+    db.session.commit()
+    del group_rows, membership_rows
+    
+    # Polls land in groups by group size; votes land on polls by a separate Zipf ranking
+    log(f"Polls: {polls}, votes: {votes}")
+    poll_sampler = ZipfSampler(polls, poll_skew, rng)
+    group_weights = list(itertools.accumulate(len(m) for m in members))
+    vote_totals = [0] * polls
+    for rank, total in enumerate(allocate_votes(votes, [poll_sampler.weight(rank) for rank in range(polls)], users)):
+        vote_totals[poll_sampler.order[rank]] = total
+    
+    poll_rows, option_rows, vote_rows, bucket_rows = [], [], [], []
+    started = time.monotonic()
+    for index in range(polls):
+        group_index = bisect.bisect_left(group_weights, rng.random() * group_weights[-1])
+        group_members_list = members[group_index]
+        poll_id = synthetic_id(rng)
+        created_at = moment()
+        expire_at = created_at + timedelta(days=rng.choice((1, 3, 7, 14)))
+        poll_rows.append({
+            "id": poll_id, "title": f"Poll {index}?", "description": "", "group_id": group_ids[group_index],
+            "creator_id": user_ids[rng.choice(group_members_list)], "created_at": created_at,
+            "expire_at": expire_at,
+        })
+        
+        option_ids = [synthetic_id(rng) for _ in range(options_per_poll)]
+        option_picker = ZipfSampler(options_per_poll, option_skew, rng)
+        tallies = [0] * options_per_poll
+        buckets = {}
+        # Members vote first; hot polls spill over to everyone, as if shared publicly
+        wanted = min(vote_totals[index], users)
+        if wanted <= len(group_members_list):
+            voters = rng.sample(group_members_list, wanted)
+        else:
+            voters = rng.sample(range(users), wanted)
+        closes = min(expire_at, now)
+        for voter in voters:
+            option = option_picker.draw()
+            voted_at = moment(created_at, closes)
+            tallies[option] += 1
+            key = (bucket_of(voted_at), option_ids[option])
+            buckets[key] = buckets.get(key, 0) + 1
+            vote_rows.append({"id": synthetic_id(rng), "poll_id": poll_id, "option_id": option_ids[option],
+                              "user_id": user_ids[voter], "voted_at": voted_at})
+        option_rows.extend(
+            {"id": option_id, "poll_id": poll_id, "text": f"Option {n + 1}", "vote_count": tallies[n]}
+            for n, option_id in enumerate(option_ids)
+        )
+        bucket_rows.extend(
+            {"poll_id": poll_id, "bucket_start": bucket_start, "option_id": option_id, "count": count}
+            for (bucket_start, option_id), count in buckets.items()
+        )
+        counts["votes"] += len(voters)
+        
+        # Flush in large transactions
+        if len(vote_rows) >= batch_size * 10 or index == polls - 1:
+            bulk_insert(Poll.__table__, poll_rows, batch_size)
+            bulk_insert(PollOption.__table__, option_rows, batch_size)
+            bulk_insert(Vote.__table__, vote_rows, batch_size)
+            bulk_insert(VoteBucket.__table__, bucket_rows, batch_size)
+            db.session.commit()
+            counts["options"] += len(option_rows)
+            poll_rows, option_rows, vote_rows, bucket_rows = [], [], [], []
+            rate = counts["votes"] / max(time.monotonic() - started, 1e-9)
+            log(f"  {index + 1}/{polls} polls, {counts['votes']} votes ({rate:,.0f} votes/s)")
+    
+    # The generated votes are the vote log's starting point, as after the migration
+    db.session.execute(text(
+        "INSERT INTO vote_checkpoint (poll_id, user_id, option_id, voted_at) "
+        "SELECT poll_id, user_id, option_id, voted_at FROM vote"
+    ))
+    db.session.execute(
+        insert(VoteLogState.__table__).prefix_with("OR REPLACE").values(id=1, checkpoint_seq=0, compacted_at=now)
+    )
+    db.session.commit()
+    
+    # Chat messages land in groups by group size too, sent by members, numbered per group
+    log(f"Chat messages: {messages}")
+    message_rows, next_seq = [], {}
+    for index in range(messages):
+        group_index = bisect.bisect_left(group_weights, rng.random() * group_weights[-1])
+        seq = next_seq[group_index] = next_seq.get(group_index, 0) + 1
+        # Times grow with seq within a group, as they do when messages are sent
+        message_rows.append({
+            "group_id": group_ids[group_index], "seq": seq, "sender_id": user_ids[rng.choice(members[group_index])],
+            "content": f"Message {index}", "poll_id": None,
+            "created_at": start + timedelta(seconds=span * seq / (messages + 1)),
+        })
+        if len(message_rows) >= batch_size or index == messages - 1:
+            bulk_insert(ChatMessage.__table__, message_rows, batch_size)
+            db.session.commit()
+            message_rows = []
+    counts["messages"] = messages
+    
+    # Friendships: mostly between people who share a group; every tenth pair is still a pending request
+    log(f"Friendships: {friendships}")
+    pairs = set()
+    for _ in range(friendships):
+        group_members_list = members[bisect.bisect_left(group_weights, rng.random() * group_weights[-1])]
+        if len(group_members_list) >= 2 and rng.random() < 0.8:
+            a, b = rng.sample(group_members_list, 2)
+        else:
+            a, b = rng.sample(range(users), 2)
+        pairs.add((min(a, b), max(a, b)))
+    friendship_rows, request_rows = [], []
+    for n, (a, b) in enumerate(sorted(pairs)):
+        if n % 10 == 9:
+            sender, recipient = (a, b) if rng.random() < 0.5 else (b, a)
+            request_rows.append({"sender_id": user_ids[sender], "recipient_id": user_ids[recipient],
+                                 "created_at": moment()})
+        else:
+            since = moment()
+            friendship_rows.append({"user_id": user_ids[a], "friend_id": user_ids[b], "created_at": since})
+            friendship_rows.append({"user_id": user_ids[b], "friend_id": user_ids[a], "created_at": since})
+    bulk_insert(Friendship.__table__, friendship_rows, batch_size)
+    bulk_insert(FriendRequest.__table__, request_rows, batch_size)
+    db.session.commit()
+    counts["friendships"], counts["friend_requests"] = len(friendship_rows) // 2, len(request_rows)
+    del pairs, friendship_rows, request_rows
+    
+    log("Filling home feeds")
+    counts["feed_entries"] = rebuild_feeds(current_app.config['FEED_FANOUT_MAX_MEMBERS'])
+    
+    log("Closing expired polls")
+    counts["closed_polls"] = close_expired_polls(now)
+    
+    # Every poll was announced to its group; closed polls were announced again by close_expired_polls
+    log("Delivering notifications")
+    enqueue_events([
+        {"kind": POLL_CREATED, "group_id": group_id, "poll_id": poll_id, "actor_id": creator_id, "count": 1,
+         "created_at": created_at}
+        for poll_id, group_id, creator_id, created_at in db.session.execute(
+            db.select(Poll.id, Poll.group_id, Poll.creator_id, Poll.created_at).order_by(Poll.created_at)
+        )
+    ])
+    db.session.commit()
+    deliver_notifications()
+    counts["notifications"] = db.session.execute(db.select(db.func.count()).select_from(Notification)).scalar()
+    return counts
+
+def generate_command(app, args):
+    with app.app_context():
+        if not confirm("This will delete existing data and generate a synthetic dataset.", args.yes):
+            return
+        started = time.monotonic()
+        clear_database()
+        # Bulk loading: skip fsyncs and keep index pages in memory for this connection;
+        # a crash here just means rerunning
+        db.session.execute(text("PRAGMA synchronous=OFF"))
+        db.session.execute(text(f"PRAGMA cache_size=-{args.cache_mb * 1024}"))
+        counts = generate_dataset(
+            users=args.users, groups=args.groups, polls=args.polls, votes=args.votes, messages=args.messages,
+            friendships=args.friendships, members_per_group=args.members_per_group, options_per_poll=args.options_per_poll,
+            group_skew=args.group_skew, poll_skew=args.poll_skew, option_skew=args.option_skew,
+            days=args.days, seed=args.seed, batch_size=args.batch_size,
+        )
+        print(f"Generated in {time.monotonic() - started:.1f}s: "
+              + ", ".join(f"{count} {name}" for name, count in counts.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--yes', action='store_true', help="Do not ask before deleting existing data")
+    commands = parser.add_subparsers(dest='command')
+    generate = commands.add_parser('generate', help="Build a synthetic dataset of any size")
+    generate.add_argument('--users', type=int, default=10000)
+    generate.add_argument('--groups', type=int, default=1000)
+    generate.add_argument('--polls', type=int, default=5000)
+    generate.add_argument('--votes', type=int, default=200000)
+    generate.add_argument('--messages', type=int, default=20000, help="Group chat messages")
+    generate.add_argument('--friendships', type=int, default=50000,
+                          help="Friend pairs, mostly within groups; one in ten is left as a pending request")
+    generate.add_argument('--members-per-group', type=int, default=20, help="Average memberships per group")
+    generate.add_argument('--options-per-poll', type=int, default=4)
+    generate.add_argument('--group-skew', type=float, default=1.0, help="Zipf exponent of group sizes")
+    generate.add_argument('--poll-skew', type=float, default=1.1, help="Zipf exponent of votes per poll")
+    generate.add_argument('--option-skew', type=float, default=0.8, help="Zipf exponent of option popularity")
+    generate.add_argument('--days', type=int, default=180, help="Spread creation times over this many days")
+    generate.add_argument('--seed', type=int, default=1, help="Random seed; the same seed gives the same rows (times are relative to now)")
+    generate.add_argument('--batch-size', type=int, default=50000, help="Rows per executemany")
+    generate.add_argument('--cache-mb', type=int, default=512, help="SQLite page cache while loading")
+    # Also accepted after the subcommand; SUPPRESS keeps a --yes given before it from being reset to False
+    generate.add_argument('--yes', action='store_true', default=argparse.SUPPRESS,
+                          help="Do not ask before deleting existing data")
+    args = parser.parse_args()
+    
+    app = create_app()
+    if args.command == 'generate':
+        generate_command(app, args)
+    else:
+        seed_database(app, confirmed=args.yes)
 
 if __name__ == "__main__":
-    seed_database()
+    main()
@@ -0,0 +1,280 @@
+"""
+Response serializers for Project Bolt
+
+Every API payload for users, groups, polls, options, chat messages and
+notifications is built here, so the shapes cannot drift apart between endpoints. Serializers
+take plain column tuples in the order of the matching *_COLUMNS constant and
+unpack them positionally. Endpoints select exactly those columns instead of loading ORM
+instances, which skips identity-map and attribute instrumentation work on
+every row.
+
+JSON encoding goes through OrjsonProvider, which uses orjson when it is
+installed and Flask's stdlib encoder otherwise (JSON_BACKEND=stdlib forces
+the latter).
+"""
+
+import json
+from datetime import datetime
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+from extensions import db
+from models import User, Group, Poll, PollOption, PollResult, ChatMessage, Notification, group_members
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+USER_COLUMNS = (User.id, User.username, User.email, User.bio, User.avatar)
+MEMBER_COLUMNS = (User.id, User.username, User.email, User.avatar)
+GROUP_COLUMNS = (Group.id, Group.name, Group.description, Group.creator_id, Group.created_at)
+POLL_COLUMNS = (
+    Poll.id, Poll.title, Poll.description, Poll.group_id,
+    Poll.creator_id, Poll.created_at, Poll.expire_at, Poll.closed_at,
+)
+OPTION_COLUMNS = (PollOption.poll_id, PollOption.id, PollOption.text, PollOption.vote_count)
+# Options in the order they were created. Ids are random, so that is poll_option's rowid, which the
+# poll_id index already sorts each poll's entries by.
+OPTION_ORDER = (PollOption.poll_id, db.literal_column('poll_option.rowid'))
+RESULT_COLUMNS = (
+    PollResult.poll_id, PollResult.total_votes, PollResult.total_voters,
+    PollResult.winner_option_ids, PollResult.options,
+)
+MESSAGE_COLUMNS = (
+    ChatMessage.group_id, ChatMessage.seq, ChatMessage.sender_id,
+    ChatMessage.content, ChatMessage.poll_id, ChatMessage.created_at,
+)
+NOTIFICATION_COLUMNS = (
+    Notification.id, Notification.kind, Notification.group_id, Notification.poll_id, Notification.count,
+    Notification.created_at, Notification.updated_at, Notification.read_at,
+    Poll.title.label('poll_title'), Group.name.label('group_name'),
+)
+NOTIFICATION_MESSAGES = {
+    'poll_created': lambda count, title, group: f"New poll in {group}: {title}",
+    'poll_votes': lambda count, title, group: f"{count} new vote{'' if count == 1 else 's'} on {title}",
+    'poll_closed': lambda count, title, group: f"Poll closed: {title}",
+}
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def user_row(user):
+    """Column tuple of a User instance that is already in hand"""
+    return (user.id, user.username, user.email, user.bio, user.avatar)
+
+
+def user_dict(row):
+    user_id, username, email, bio, avatar = row
+    return {"id": user_id, "username": username, "email": email, "bio": bio, "avatar": avatar}
+
+
+def member_dict(row):
+    user_id, username, email, avatar = row
+    return {"id": user_id, "username": username, "email": email, "avatar": avatar}
+
+
+def friend_dict(row, key="since"):
+    """Member payload plus when the friendship (or, with key="requested_at", the request) started"""
+    user_id, username, email, avatar, created_at = row
+    return {"id": user_id, "username": username, "email": email, "avatar": avatar, key: _iso(created_at)}
+
+
+def group_dict(row, members):
+    """Group payload; members is a list of ids or of member dicts"""
+    group_id, name, description, creator_id, created_at = row
+    return {
+        "id": group_id,
+        "name": name,
+        "description": description,
+        "creator_id": creator_id,
+        "created_at": _iso(created_at),
+        "members": members,
+    }
+
+
+def option_dict(row):
+    _, option_id, text, vote_count = row
+    return {"id": option_id, "text": text, "votes": vote_count}
+
+
+def result_dict(row):
+    _, total_votes, total_voters, winner_option_ids, _ = row
+    return {
+        "total_votes": total_votes,
+        "total_voters": total_voters,
+        "winner_option_ids": winner_option_ids,
+    }
+
+
+def poll_dict(row, option_rows, result=None, now=None):
+    """Poll payload; `question` duplicates `title` for older clients
+
+    A closed poll is rendered from its frozen result row: options then also
+    carry a percentage, and `results` holds the totals and the winner.
+    """
+    poll_id, title, description, group_id, creator_id, created_at, expire_at, closed_at = row
+    now = now or datetime.now()
+    return {
+        "id": poll_id,
+        "title": title,
+        "question": title,
+        "description": description,
+        "group_id": group_id,
+        "creator_id": creator_id,
+        "created_at": _iso(created_at),
+        "expire_at": _iso(expire_at),
+        "closed_at": _iso(closed_at),
+        "active": closed_at is None and (expire_at is None or now < expire_at),
+        "options": result[4] if result else [option_dict(option) for option in option_rows],
+        "results": result_dict(result) if result else None,
+    }
+
+
+def feed_poll_dict(row, option_rows, result=None, now=None):
+    """Poll payload of a home feed: POLL_COLUMNS followed by the group's name"""
+    payload = poll_dict(tuple(row[:-1]), option_rows, result, now)
+    payload["group_name"] = row[-1]
+    return payload
+
+
+def message_dict(row, reactions):
+    """Chat message payload; reactions maps emoji -> count"""
+    group_id, seq, sender_id, content, poll_id, created_at = row
+    return {
+        "group_id": group_id,
+        "seq": seq,
+        "sender_id": sender_id,
+        "content": content,
+        "poll_id": poll_id,
+        "created_at": _iso(created_at),
+        "reactions": reactions,
+    }
+
+
+def notification_dict(row):
+    """Notification payload; the message is written from the poll's current title"""
+    notification_id, kind, group_id, poll_id, count, created_at, updated_at, read_at, title, group_name = row
+    return {
+        "id": notification_id,
+        "type": "poll",
+        "kind": kind,
+        "message": NOTIFICATION_MESSAGES[kind](count, title, group_name),
+        "count": count,
+        "group_id": group_id,
+        "poll_id": poll_id,
+        "read": read_at is not None,
+        "created_at": _iso(created_at),
+        "updated_at": _iso(updated_at),
+    }
+
+
+def load_options(poll_ids):
+    """Map poll_id -> option rows for the given polls, in one query"""
+    options = {poll_id: [] for poll_id in poll_ids}
+    if options:
+        rows = db.session.execute(
+            db.select(*OPTION_COLUMNS).where(PollOption.poll_id.in_(list(options))).order_by(*OPTION_ORDER)
+        )
+        for row in rows:
+            options[row[0]].append(row)
+    return options
+
+
+def load_results(poll_ids):
+    """Map poll_id -> frozen result row for the given closed polls, in one query"""
+    if not poll_ids:
+        return {}
+    rows = db.session.execute(db.select(*RESULT_COLUMNS).where(PollResult.poll_id.in_(list(poll_ids))))
+    return {row[0]: row for row in rows}
+
+
+def load_member_ids(group_ids):
+    """Map group_id -> member ids for the given groups, in one query"""
+    members = {group_id: [] for group_id in group_ids}
+    if members:
+        rows = db.session.execute(
+            db.select(group_members.c.group_id, group_members.c.user_id)
+            .where(group_members.c.group_id.in_(list(members)))
+        )
+        for group_id, user_id in rows:
+            members[group_id].append(user_id)
+    return members
+
+
+def load_poll(poll_id):
+    """Return (poll_row, option_rows, result_row) or (None, None, None)
+
+    For a closed poll the option rows are rebuilt from its frozen result, so
+    no live table is read.
+    """
+    row = db.session.execute(db.select(*POLL_COLUMNS).where(Poll.id == poll_id)).first()
+    if row is None:
+        return None, None, None
+    if row.closed_at is not None:
+        result = load_results([poll_id]).get(poll_id)
+        if result is not None:
+            options = [(poll_id, option["id"], option["text"], option["votes"]) for option in result[4]]
+            return row, options, result
+    options = db.session.execute(
+        db.select(*OPTION_COLUMNS).where(PollOption.poll_id == poll_id).order_by(*OPTION_ORDER)
+    ).all()
+    return row, options, None
+
+
+def load_group_detail(group_id, now=None):
+    """Full group payload with member details and polls as of `now`, in at most five queries"""
+    row = db.session.execute(db.select(*GROUP_COLUMNS).where(Group.id == group_id)).first()
+    if row is None:
+        return None
+    members = db.session.execute(
+        db.select(*MEMBER_COLUMNS)
+        .join(group_members, group_members.c.user_id == User.id)
+        .where(group_members.c.group_id == group_id)
+    )
+    poll_rows = db.session.execute(db.select(*POLL_COLUMNS).where(Poll.group_id == group_id)).all()
+    # Open polls read their live tallies, closed polls their frozen results
+    options = load_options([poll[0] for poll in poll_rows if poll.closed_at is None])
+    results = load_results([poll[0] for poll in poll_rows if poll.closed_at is not None])
+
+    now = now or datetime.now()
+    payload = group_dict(row, [member_dict(member) for member in members])
+    payload["polls"] = [
+        poll_dict(poll, options.get(poll[0], ()), results.get(poll[0]), now) for poll in poll_rows
+    ]
+    return payload
+
+
+def json_bytes(payload):
+    """Encode a payload to UTF-8 JSON with the fastest available backend"""
+    if orjson is not None and OrjsonProvider.enabled:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson when available"""
+
+    enabled = True
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or not self.enabled or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or not self.enabled or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or not self.enabled:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return Response(
+            orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS),
+            mimetype=self.mimetype,
+        )
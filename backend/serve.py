@@ -0,0 +1,258 @@
+"""
+Production server for Project Bolt
+
+A pre-forking launcher for the app. The master process binds the listening
+socket and forks --workers worker processes, and each worker serves
+requests on a fixed pool of --threads threads. All workers accept from the
+same socket. A worker only accepts while it has a free thread, so new
+connections go to whichever worker is idle. The master restarts workers
+that die.
+
+- Without --preload each worker builds the app itself after the fork.
+- With --preload the master builds it once, before forking, so the workers
+  start faster and share the imported code pages.
+- Either way every worker disposes the inherited database engine right after
+  the fork. A pooled SQLite connection must never be used by two processes.
+- Password hash pools and background jobs start per process on their own
+  (see passwords.py and scheduler.py).
+
+Signals to the master:
+- TERM or INT stops the server. Workers stop accepting and finish their
+  in-flight requests, or are killed after --graceful-timeout.
+- HUP reloads gracefully. A new set of workers starts, then the old ones are
+  stopped as above. Without --preload the new workers load the code from
+  disk. With --preload they inherit the master's copy, so deploying new code
+  takes a restart.
+
+Connections are closed after each response (HTTP/1.0), so an idle keep-alive
+client never holds a worker thread. Put nginx or another reverse proxy in
+front for keep-alive, TLS and slow clients. Each open live-results stream
+occupies a thread for as long as it stays open. Streams only see votes
+handled by the same worker (see realtime.py).
+
+Usage:
+    python serve.py [--bind 0.0.0.0:5000] [--workers 4] [--threads 8] [--preload]
+        [--graceful-timeout 30] [--backlog 2048] [--access-log]
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+log = logging.getLogger('bolt.serve')
+
+# A worker that dies this soon after starting is failing to boot; respawn it slowly
+MIN_WORKER_LIFETIME = 1.0
+
+
+class RequestHandler(WSGIRequestHandler):
+    """One request per connection; access log only when asked for"""
+
+    protocol_version = 'HTTP/1.0'
+    access_log = False
+
+    def log_request(self, code='-', size='-'):
+        if self.access_log:
+            super().log_request(code, size)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles connections on a fixed pool of threads"""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, fd=None):
+        super().__init__(host, port, app, handler=RequestHandler, fd=fd)
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='request')
+        # Stop accepting while every thread is busy; the connection waits in the
+        # socket backlog, where an idle worker can pick it up
+        self.free_threads = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request, client_address):
+        self.free_threads.acquire()
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.free_threads.release()
+
+
+def load_app():
+    from app import create_app
+    return create_app()
+
+
+def post_fork(app):
+    """Per-worker setup: drop database connections inherited from the master"""
+    from extensions import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def run_worker(app, listener, options):
+    """Serve until TERM; runs in the forked child and never returns"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The master turns Ctrl-C into TERM
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    status = 0
+    try:
+        app = app or load_app()
+        post_fork(app)
+        RequestHandler.access_log = options.access_log
+        host, port = listener.getsockname()[:2]
+        server = PooledWSGIServer(host, port, app, options.threads, fd=listener.fileno())
+
+        def stop(signum, frame):
+            # shutdown() waits for serve_forever to return, so it cannot run on this thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        log.info("Worker booted with %d threads", options.threads)
+        server.serve_forever()
+        server.pool.shutdown(wait=True)  # Finish in-flight requests
+    except Exception:
+        log.exception("Worker failed")
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+
+class Master:
+    """Forks workers, restarts the ones that die and handles TERM/INT/HUP"""
+
+    def __init__(self, options):
+        self.options = options
+        self.app = None
+        self.listener = None
+        self.workers = {}  # pid -> (generation, started at)
+        self.generation = 0
+        self.stopping = False
+        self.reloading = False
+        self._wakeup = threading.Event()
+
+    def bind(self):
+        host, _, port = self.options.bind.rpartition(':')
+        self.listener = socket.create_server((host or '0.0.0.0', int(port)), backlog=self.options.backlog)
+        log.info("Listening on %s:%d", *self.listener.getsockname()[:2])
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.app, self.listener, self.options)
+        self.workers[pid] = (self.generation, time.monotonic())
+
+    def signal_workers(self, signum, older_than=None):
+        for pid, (generation, _) in list(self.workers.items()):
+            if older_than is None or generation < older_than:
+                try:
+                    os.kill(pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    def reap(self):
+        """Collect exited workers; returns those of the current generation that died"""
+        died = []
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            generation, started = self.workers.pop(pid, (None, 0.0))
+            if generation == self.generation and not self.stopping:
+                log.warning("Worker %d exited with status %d", pid, os.waitstatus_to_exitcode(status))
+                died.append(started)
+        return died
+
+    def reload(self):
+        """Start a fresh set of workers, then stop the old ones gracefully"""
+        log.info("Reloading workers")
+        self.generation += 1
+        for _ in range(self.options.workers):
+            self.spawn()
+        self.signal_workers(signal.SIGTERM, older_than=self.generation)
+
+    def stop(self):
+        log.info("Stopping workers")
+        self.signal_workers(signal.SIGTERM)
+        deadline = time.monotonic() + self.options.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        if self.workers:
+            log.warning("Killing %d worker(s) still busy after %gs", len(self.workers),
+                        self.options.graceful_timeout)
+            self.signal_workers(signal.SIGKILL)
+            while self.workers:
+                pid, _ = os.waitpid(-1, 0)
+                self.workers.pop(pid, None)
+        self.listener.close()
+
+    def run(self):
+        self.bind()
+        if self.options.preload:
+            self.app = load_app()
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+        for _ in range(self.options.workers):
+            self.spawn()
+
+        while not self.stopping:
+            self._wakeup.wait(1.0)
+            self._wakeup.clear()
+            if self.reloading:
+                self.reloading = False
+                self.reload()
+            for started in self.reap():
+                if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                    time.sleep(MIN_WORKER_LIFETIME)
+                if not self.stopping:
+                    self.spawn()
+        self.stop()
+
+    def _on_signal(self, signum, frame):
+        if signum in (signal.SIGTERM, signal.SIGINT):
+            self.stopping = True
+        elif signum == signal.SIGHUP:
+            self.reloading = True
+        self._wakeup.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default=os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', 5000)}"))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('THREADS', 8)), help="Threads per worker")
+    parser.add_argument('--preload', action='store_true', help="Build the app in the master before forking")
+    parser.add_argument('--graceful-timeout', type=float, default=30,
+                        help="Seconds workers get to finish in-flight requests on stop or reload")
+    parser.add_argument('--backlog', type=int, default=2048)
+    parser.add_argument('--access-log', action='store_true')
+    options = parser.parse_args()
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(process)d] %(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    Master(options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Vote tally maintenance for Project Bolt
+
+PollOption.vote_count is a denormalized copy of the number of Vote rows that
+point at each option. The vote endpoints keep it up to date in the same
+transaction as the vote itself, so read endpoints never have to load Vote
+rows just to count them. rebuild_tallies() recomputes every count from the
+vote table and is exposed as the `flask rebuild-tallies` command.
+"""
+
+from extensions import db
+from models import PollOption, Vote
+
+poll_option_table = PollOption.__table__
+
+
+def move_poll_tallies(poll_id, deltas):
+    """Add {option_id: change} to one poll's vote counts in a single statement (caller commits)
+
+    Every option of the poll is updated, unchanged ones by 0, so RETURNING
+    reports the whole poll. Returns {option_id: vote_count} for all of its
+    options as of this write. When every change is 0, as when two voters
+    swap options, nothing is written and the current counts are read instead.
+    """
+    whens = [(poll_option_table.c.id == option_id, delta) for option_id, delta in deltas.items() if delta]
+    if not whens:
+        return dict(db.session.execute(
+            db.select(poll_option_table.c.id, poll_option_table.c.vote_count)
+            .where(poll_option_table.c.poll_id == poll_id)
+        ).all())
+    change = db.case(*whens, else_=0)
+    return dict(db.session.execute(
+        db.update(poll_option_table)
+        .where(poll_option_table.c.poll_id == poll_id)
+        .values(vote_count=poll_option_table.c.vote_count + change)
+        .returning(poll_option_table.c.id, poll_option_table.c.vote_count)
+    ).all())
+
+
+def rebuild_tallies():
+    """Recompute every option's vote_count from the vote table
+
+    Returns the number of options whose stored count was wrong.
+    """
+    actual_count = (
+        db.select(db.func.count(Vote.id))
+        .where(Vote.option_id == poll_option_table.c.id)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        db.update(poll_option_table)
+        .where(poll_option_table.c.vote_count != actual_count)
+        .values(vote_count=actual_count)
+    )
+    db.session.commit()
+    return result.rowcount
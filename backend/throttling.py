@@ -0,0 +1,227 @@
+"""
+Request throttling and admission control for Project Bolt
+
+Every API request spends tokens from a token bucket per client IP. Endpoints
+declare what a request costs with the @throttle decorator, so a login, which
+hashes a password, weighs far more than a health check. Undecorated
+endpoints cost DEFAULT_COST.
+
+Requests are not authenticated, so the user ids and emails they carry are
+only claims. They are never a bucket key on their own: anyone could name a
+victim to drain the victim's bucket, or name someone new each time to skip
+theirs. Endpoints that act on an account named in the body, login and
+register, declare that field with @throttle(cost, account='email'). Those
+requests also spend from a bucket per (client IP, account). That slows
+password guessing against one account from one address, and a flood from
+other addresses cannot lock the account's owner out.
+
+A request that finds a bucket short of its cost is rejected with 429 and a
+Retry-After telling the client when enough tokens will have refilled.
+
+Buckets live in process memory by default, so each worker process throttles
+on its own. THROTTLE_STORE=sqlite:////path/to/throttle.db shares them
+between workers through a small SQLite file. The file is kept separate from
+the application database so throttling never waits on its write lock.
+
+Independently, at most THROTTLE_MAX_CONCURRENT requests per process may be
+in flight at once. Further requests get an immediate 503 rather than
+queueing for database locks and connections. A view that is about to block
+without doing work, such as a long poll, gives its slot back first with
+release_concurrency_slot().
+
+Settings (environment variables, read in app.py):
+
+    THROTTLE_ENABLED          set to 0 to turn all of this off
+    THROTTLE_IP_RATE          tokens per second refilled per client IP
+    THROTTLE_IP_BURST         bucket size per client IP
+    THROTTLE_USER_RATE        tokens per second refilled per (client IP, account)
+    THROTTLE_USER_BURST       bucket size per (client IP, account)
+    THROTTLE_MAX_CONCURRENT   in-flight requests per process, 0 for no cap
+    THROTTLE_STORE            memory, or sqlite:///<path> for a shared store
+    THROTTLE_TRUST_PROXY      take the client IP from X-Forwarded-For
+"""
+
+import math
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+
+DEFAULT_COST = 1
+
+
+def throttle(cost, account=None):
+    """Declare how many tokens a request to a view costs (0 exempts it)
+
+    account names the JSON body field holding the account the request acts
+    on, such as 'email' for a login.
+    """
+    def decorator(f):
+        f.throttle_cost = cost
+        f.throttle_account = account
+        return f
+
+    return decorator
+
+
+def get_throttle_cost(view_function):
+    """Return the declared cost of a view function, or DEFAULT_COST"""
+    return getattr(view_function, 'throttle_cost', DEFAULT_COST)
+
+
+class MemoryBucketStore:
+    """Token buckets in a dict, for a single worker process"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, rate, burst, now=None):
+        """Spend `cost` tokens; return 0 on success or the seconds until they are available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return (cost - tokens) / rate
+            self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now, rate, burst)
+            return 0
+
+    def _prune(self, now, rate, burst):
+        # A bucket that has refilled completely is the same as no bucket at all
+        full = [key for key, (tokens, updated_at) in self._buckets.items()
+                if tokens + (now - updated_at) * rate >= burst]
+        for key in full:
+            del self._buckets[key]
+
+
+class SqliteBucketStore:
+    """Token buckets in a SQLite file, shared by every worker process on the host"""
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS throttle_bucket "
+        "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID"
+    )
+    # Refill and spend in one atomic statement; no row comes back when the bucket is short
+    _TAKE = (
+        "INSERT INTO throttle_bucket (key, tokens, updated_at) VALUES (:key, :burst - :cost, :now) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        "tokens = min(:burst, tokens + (:now - updated_at) * :rate) - :cost, updated_at = :now "
+        "WHERE min(:burst, tokens + (:now - updated_at) * :rate) >= :cost "
+        "RETURNING tokens"
+    )
+    _PEEK = "SELECT min(:burst, tokens + (:now - updated_at) * :rate) FROM throttle_bucket WHERE key = :key"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(self._SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit: each statement is its own short write transaction
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, cost, rate, burst, now=None):
+        """Spend `cost` tokens; return 0 on success or the seconds until they are available"""
+        # Wall-clock time, since monotonic clocks are not comparable across processes
+        params = {"key": key, "cost": cost, "rate": rate, "burst": burst,
+                  "now": time.time() if now is None else now}
+        connection = self._connection()
+        if connection.execute(self._TAKE, params).fetchone() is not None:
+            return 0
+        tokens = connection.execute(self._PEEK, params).fetchone()[0]
+        return (cost - tokens) / rate
+
+
+def make_bucket_store(spec):
+    """Build a bucket store from a THROTTLE_STORE value"""
+    if not spec or spec == 'memory':
+        return MemoryBucketStore()
+    if spec.startswith('sqlite:///'):
+        return SqliteBucketStore(spec[len('sqlite:///'):])
+    raise ValueError(f"Unknown THROTTLE_STORE {spec!r}; expected memory or sqlite:///<path>")
+
+
+def client_ip():
+    """The client address, from X-Forwarded-For when the app sits behind a trusted proxy"""
+    if current_app.config['THROTTLE_TRUST_PROXY'] and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or 'unknown'
+
+
+def account_key(view_function):
+    """The account a request acts on, from the body field its view declares, if any"""
+    field = getattr(view_function, 'throttle_account', None)
+    data = request.get_json(silent=True) if field and request.is_json else None
+    if isinstance(data, dict) and isinstance(data.get(field), str) and data[field]:
+        return data[field].lower()
+    return None
+
+
+def release_concurrency_slot():
+    """Stop counting the current request against THROTTLE_MAX_CONCURRENT"""
+    slots = g.pop('throttle_slot', None)
+    if slots is not None:
+        slots.release()
+
+
+def _too_many_requests(retry_after):
+    seconds = str(max(1, math.ceil(retry_after)))
+    return jsonify({"error": "Too many requests, slow down"}), 429, {'Retry-After': seconds}
+
+
+def init_throttling(app, store=None):
+    """Check every request against the token buckets and the concurrency cap"""
+    config = app.config
+    config.setdefault('THROTTLE_ENABLED', True)
+    config.setdefault('THROTTLE_IP_RATE', 20.0)
+    config.setdefault('THROTTLE_IP_BURST', 60.0)
+    config.setdefault('THROTTLE_USER_RATE', 5.0)
+    config.setdefault('THROTTLE_USER_BURST', 20.0)
+    config.setdefault('THROTTLE_MAX_CONCURRENT', 64)
+    config.setdefault('THROTTLE_STORE', 'memory')
+    config.setdefault('THROTTLE_TRUST_PROXY', False)
+    if not config['THROTTLE_ENABLED']:
+        return
+
+    buckets = store or make_bucket_store(config['THROTTLE_STORE'])
+    max_concurrent = config['THROTTLE_MAX_CONCURRENT']
+    slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+    @app.before_request
+    def admit_request():
+        view_function = app.view_functions.get(request.endpoint)
+        cost = get_throttle_cost(view_function)
+        if not cost or request.method == 'OPTIONS':
+            return None
+
+        ip = client_ip()
+        retry_after = buckets.take('ip:' + ip, cost, config['THROTTLE_IP_RATE'], config['THROTTLE_IP_BURST'])
+        account = account_key(view_function)
+        if not retry_after and account:
+            retry_after = buckets.take(
+                f'account:{ip}:{account}', cost, config['THROTTLE_USER_RATE'], config['THROTTLE_USER_BURST']
+            )
+        if retry_after:
+            return _too_many_requests(retry_after)
+
+        if slots is not None:
+            if not slots.acquire(blocking=False):
+                return jsonify({"error": "Server busy, try again shortly"}), 503, {'Retry-After': '1'}
+            g.throttle_slot = slots
+        return None
+
+    @app.teardown_request
+    def release_slot(exc):
+        release_concurrency_slot()
@@ -0,0 +1,106 @@
+"""
+Vote timelines for Project Bolt
+
+Poll owners can chart when votes came in. The vote_bucket table counts each
+option's current votes per five-minute interval of voted_at. The vote
+endpoints maintain it in the same transaction as the vote:
+- a new vote increments the bucket it was cast in;
+- a changed vote decrements the bucket of the vote it replaces.
+
+Each bucket therefore counts votes that still stand. Coarser resolutions
+(1h, 1d) are rolled up from the five-minute rows when read. A timeline
+request reads one poll's buckets through the primary key and never touches
+the vote table.
+
+Buckets are keyed by epoch seconds of the naive voted_at timestamp, the same
+value SQLite's strftime('%s', voted_at) gives. rebuild_vote_buckets() can
+therefore recompute them from the vote table in SQL. It is exposed as
+`flask rebuild-vote-timeline`.
+"""
+
+import calendar
+from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import Vote, VoteBucket
+
+BUCKET_SECONDS = 300
+RESOLUTIONS = {'5m': 300, '1h': 3600, '1d': 86400}
+
+vote_table = Vote.__table__
+bucket_table = VoteBucket.__table__
+
+
+def bucket_of(voted_at):
+    """Start of the five-minute bucket a vote cast at `voted_at` counts in"""
+    seconds = calendar.timegm(voted_at.timetuple())
+    return seconds - seconds % BUCKET_SECONDS
+
+
+def _vote_bucket_sql(column):
+    return db.cast(db.func.strftime('%s', column), db.Integer) // BUCKET_SECONDS * BUCKET_SECONDS
+
+
+def apply_bucket_deltas(poll_id, deltas):
+    """Add {(bucket_start, option_id): change} to a poll's buckets (caller commits)"""
+    params = [
+        {"poll_id": poll_id, "bucket_start": bucket_start, "option_id": option_id, "count": delta}
+        for (bucket_start, option_id), delta in deltas.items()
+        if delta
+    ]
+    if not params:
+        return
+    statement = sqlite_insert(bucket_table)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[bucket_table.c.poll_id, bucket_table.c.bucket_start, bucket_table.c.option_id],
+            set_={"count": bucket_table.c.count + statement.excluded.count},
+        ),
+        params,
+    )
+
+
+def rebuild_vote_buckets():
+    """Recompute every bucket from the vote table; returns the number of buckets"""
+    db.session.execute(db.delete(bucket_table))
+    bucket = _vote_bucket_sql(vote_table.c.voted_at)
+    counts = (
+        db.select(vote_table.c.poll_id, bucket, vote_table.c.option_id, db.func.count())
+        .where(vote_table.c.voted_at.is_not(None))
+        .group_by(vote_table.c.poll_id, bucket, vote_table.c.option_id)
+    )
+    result = db.session.execute(
+        db.insert(bucket_table).from_select(['poll_id', 'bucket_start', 'option_id', 'count'], counts)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def poll_timeline(poll_id, option_ids, resolution):
+    """Vote counts per option per interval, oldest first, rolled up to `resolution` seconds
+
+    Intervals without votes are left out.
+    """
+    rows = db.session.execute(
+        db.select(bucket_table.c.bucket_start, bucket_table.c.option_id, bucket_table.c.count)
+        .where(bucket_table.c.poll_id == poll_id, bucket_table.c.count != 0)
+        .order_by(bucket_table.c.bucket_start)
+    )
+    intervals = {}
+    for bucket_start, option_id, count in rows:
+        start = bucket_start - bucket_start % resolution
+        counts = intervals.get(start)
+        if counts is None:
+            counts = intervals[start] = dict.fromkeys(option_ids, 0)
+        counts[option_id] = counts.get(option_id, 0) + count
+
+    return [
+        {
+            "start": datetime.utcfromtimestamp(start).isoformat(),
+            "counts": counts,
+            "total": sum(counts.values()),
+        }
+        for start, counts in intervals.items()
+    ]
@@ -1,18 +1,42 @@
 """
 Request validation utilities for Project Bolt
 
-This module provides validation functions for API requests to ensure
-data integrity and security.
+Each endpoint that takes a JSON body declares a Schema, and the
+@validate_json(schema) decorator binds it to the route. A schema is compiled
+once, at import time, into one check function per field. Validating a
+request is then a single pass over those checks, with no branching on the
+URL.
+
+Oversized input is refused before anything is parsed:
+- MAX_CONTENT_LENGTH (default 1 MiB) caps every request body. Werkzeug
+  enforces it while reading, so chunked uploads are covered too.
+- Each schema also carries its own max_bytes. A before_request hook
+  checks it against Content-Length before the body is read. The hook is
+  installed by init_request_limits, ahead of every other hook (throttling
+  reads login bodies), and check_request_limits.py verifies it.
+- Strings have maximum lengths and lists a maximum item count. For example,
+  a poll takes at most MAX_POLL_OPTIONS options.
+
+Too large a body gets 413. Missing or invalid fields get 400 with an
+"errors" object keyed by field name.
 """
 
 import re
 from functools import wraps
 from flask import request, jsonify
 
+from voting import MAX_BATCH_VOTES
+
 # Validation patterns
 EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
 USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9_-]{3,20}$')
 
+DEFAULT_MAX_CONTENT_LENGTH = 1024 * 1024
+MAX_POLL_OPTIONS = 20
+MAX_ID_LENGTH = 36
+MAX_MESSAGE_LENGTH = 4000
+MAX_NOTIFICATION_IDS = 500
+
 def validate_email(email):
     """Validate email format"""
     if not email or not EMAIL_PATTERN.match(email):
@@ -31,131 +55,243 @@ def validate_password(password):
         return False
     return True
 
-# Validation decorator for auth endpoints
-def validate_auth_request(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        data = request.json
-        
-        # Check if request has JSON data
-        if not data:
-            return jsonify({"error": "No data provided"}), 400
-        
-        # Validate required fields
+# Field rules; compile() turns each into a function returning an error message or None
+
+class String:
+    """A string field; empty counts as missing"""
+
+    def __init__(self, label, required=None, min_length=None, max_length=None, pattern=None):
+        self.label = label
+        self.required = required        # message when missing, or None if optional
+        self.min_length = min_length    # (length, message)
+        self.max_length = max_length
+        self.pattern = pattern          # (compiled regex, message)
+
+    def compile(self):
+        label, required, max_length = self.label, self.required, self.max_length
+        min_length, min_message = self.min_length or (0, None)
+        regex, pattern_message = self.pattern or (None, None)
+        too_long = f"{label} must be at most {max_length} characters"
+
+        def check(value):
+            if value is None or value == '':
+                return required
+            if not isinstance(value, str):
+                return f"{label} must be a string"
+            if max_length is not None and len(value) > max_length:
+                return too_long
+            if len(value) < min_length:
+                return min_message
+            if regex is not None and not regex.match(value):
+                return pattern_message
+            return None
+
+        return check
+
+class Integer:
+    """An optional integer field within [minimum, maximum]"""
+
+    def __init__(self, label, minimum, maximum):
+        self.label = label
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def compile(self):
+        minimum, maximum = self.minimum, self.maximum
+        message = f"{self.label} must be a whole number from {minimum} to {maximum}"
+
+        def check(value):
+            if value is None:
+                return None
+            if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= maximum:
+                return message
+            return None
+
+        return check
+
+class List:
+    """A list field with an item count range and an optional rule for every item"""
+
+    def __init__(self, label, required=None, min_items=None, max_items=None, items=None):
+        self.label = label
+        self.required = required        # message when missing or empty
+        self.min_items = min_items      # (count, message)
+        self.max_items = max_items      # (count, message)
+        self.items = items
+
+    def compile(self):
+        label, required = self.label, self.required
+        min_items, min_message = self.min_items or (0, None)
+        max_items, max_message = self.max_items or (None, None)
+        check_item = self.items.compile() if self.items else None
+
+        def check(value):
+            if value is None or value == []:
+                return required or (min_message if min_items else None)
+            if not isinstance(value, list):
+                return f"{label} must be a list"
+            if len(value) < min_items:
+                return min_message
+            if max_items is not None and len(value) > max_items:
+                return max_message
+            if check_item is not None:
+                for item in value:
+                    error = check_item(item)
+                    if error:
+                        return error
+            return None
+
+        return check
+
+class Schema:
+    """The fields of one endpoint's JSON body, plus its size limit"""
+
+    def __init__(self, max_bytes, **fields):
+        self.max_bytes = max_bytes
+        self.fields = fields
+        # Compiled once; validate() is a single pass over these
+        self.checks = tuple((name, rule.compile()) for name, rule in fields.items())
+
+    def validate(self, data):
+        """Return {field: message} for every invalid field (empty when valid)"""
         errors = {}
-        
-        # For login endpoint
-        if request.path == '/api/auth/login':
-            if not data.get('email'):
-                errors['email'] = "Email is required"
-            if not data.get('password'):
-                errors['password'] = "Password is required"
-        
-        # For register endpoint
-        elif request.path == '/api/auth/register':
-            email = data.get('email', '')
-            username = data.get('username', '')
-            password = data.get('password', '')
-            
-            if not email:
-                errors['email'] = "Email is required"
-            elif not validate_email(email):
-                errors['email'] = "Invalid email format"
-                
-            if not username:
-                errors['username'] = "Username is required"
-            elif not validate_username(username):
-                errors['username'] = "Username must be 3-20 characters and contain only letters, numbers, underscores, or hyphens"
-                
-            if not password:
-                errors['password'] = "Password is required"
-            elif not validate_password(password):
-                errors['password'] = "Password must be at least 8 characters long"
-        
-        # Return errors if any
-        if errors:
-            return jsonify({"errors": errors}), 400
-            
-        # If all validations pass, continue to the wrapped function
-        return f(*args, **kwargs)
-    
-    return decorated_function
-
-# Validation decorator for group endpoints
-def validate_group_request(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        data = request.json
-        
-        # Check if request has JSON data for POST methods
-        if request.method == 'POST' and not data:
-            return jsonify({"error": "No data provided"}), 400
-        
-        # Validate group creation
-        if request.method == 'POST' and request.path == '/api/groups':
-            errors = {}
-            
-            if not data.get('name'):
-                errors['name'] = "Group name is required"
-            elif len(data.get('name', '')) < 3:
-                errors['name'] = "Group name must be at least 3 characters"
-                
-            if not data.get('creator_id'):
-                errors['creator_id'] = "Creator ID is required"
-            
-            # Return errors if any
-            if errors:
-                return jsonify({"errors": errors}), 400
-        
-        # If all validations pass, continue to the wrapped function
-        return f(*args, **kwargs)
-    
-    return decorated_function
-
-# Validation decorator for poll endpoints
-def validate_poll_request(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        data = request.json
-        
-        # Check if request has JSON data for POST methods
-        if request.method == 'POST' and not data:
-            return jsonify({"error": "No data provided"}), 400
-        
-        # Validate poll creation
-        if request.method == 'POST' and '/polls' in request.path and not '/vote' in request.path:
-            errors = {}
-            
-            if not data.get('question'):
-                errors['question'] = "Poll question is required"
-            
-            options = data.get('options', [])
-            if not options or len(options) < 2:
-                errors['options'] = "At least 2 options are required"
-                
-            if not data.get('creator_id'):
-                errors['creator_id'] = "Creator ID is required"
-            
-            # Return errors if any
-            if errors:
-                return jsonify({"errors": errors}), 400
-                
-        # Validate poll vote
-        elif request.method == 'POST' and '/vote' in request.path:
-            errors = {}
-            
-            if not data.get('user_id'):
-                errors['user_id'] = "User ID is required"
-                
-            if not data.get('option_id'):
-                errors['option_id'] = "Option ID is required"
-            
-            # Return errors if any
+        for name, check in self.checks:
+            error = check(data.get(name))
+            if error:
+                errors[name] = error
+        return errors
+
+def _id(label, required=None):
+    return String(label, required=required, max_length=MAX_ID_LENGTH)
+
+LOGIN_SCHEMA = Schema(
+    4096,
+    email=String("Email", required="Email is required", max_length=120),
+    password=String("Password", required="Password is required", max_length=256),
+)
+
+REGISTER_SCHEMA = Schema(
+    4096,
+    email=String("Email", required="Email is required", max_length=120,
+                 pattern=(EMAIL_PATTERN, "Invalid email format")),
+    username=String("Username", required="Username is required", pattern=(
+        USERNAME_PATTERN,
+        "Username must be 3-20 characters and contain only letters, numbers, underscores, or hyphens",
+    )),
+    password=String("Password", required="Password is required", max_length=256,
+                    min_length=(8, "Password must be at least 8 characters long")),
+)
+
+PROFILE_SCHEMA = Schema(
+    8192,
+    id=_id("User ID", required="User ID is required"),
+    username=String("Username", max_length=80),
+    bio=String("Bio", max_length=1000),
+)
+
+GROUP_SCHEMA = Schema(
+    16384,
+    name=String("Group name", required="Group name is required", max_length=100,
+                min_length=(3, "Group name must be at least 3 characters")),
+    description=String("Description", max_length=1000),
+    creator_id=_id("Creator ID", required="Creator ID is required"),
+)
+
+POLL_SCHEMA = Schema(
+    32768,
+    question=String("Poll question", required="Poll question is required", max_length=100),
+    options=List(
+        "Options",
+        min_items=(2, "At least 2 options are required"),
+        max_items=(MAX_POLL_OPTIONS, f"At most {MAX_POLL_OPTIONS} options are allowed"),
+        items=String("Each option", required="Options must not be empty", max_length=200),
+    ),
+    creator_id=_id("Creator ID", required="Creator ID is required"),
+    expire_days=Integer("expire_days", 1, 365),
+)
+
+VOTE_SCHEMA = Schema(
+    1024,
+    user_id=_id("User ID", required="User ID is required"),
+    option_id=_id("Option ID", required="Option ID is required"),
+)
+
+# Ballots are checked one by one by ingest_vote_batch, which reports a status per item
+VOTE_BATCH_SCHEMA = Schema(
+    DEFAULT_MAX_CONTENT_LENGTH,
+    votes=List(
+        "votes",
+        required="A non-empty list of votes is required",
+        max_items=(MAX_BATCH_VOTES, f"At most {MAX_BATCH_VOTES} votes per batch"),
+    ),
+)
+
+MESSAGE_SCHEMA = Schema(
+    16384,
+    sender_id=_id("Sender ID", required="Sender ID is required"),
+    content=String("Message", required="Message must not be empty", max_length=MAX_MESSAGE_LENGTH),
+    poll_id=_id("Poll ID"),
+)
+
+REACTION_SCHEMA = Schema(
+    1024,
+    user_id=_id("User ID", required="User ID is required"),
+)
+
+NOTIFICATION_READ_SCHEMA = Schema(
+    16384,
+    ids=List(
+        "Notification IDs",
+        required="A non-empty list of notification IDs is required",
+        max_items=(MAX_NOTIFICATION_IDS, f"At most {MAX_NOTIFICATION_IDS} notifications at a time"),
+        items=Integer("Each notification ID", 1, 2 ** 63 - 1),
+    ),
+)
+
+FRIEND_REQUEST_SCHEMA = Schema(
+    1024,
+    recipient_id=_id("Recipient ID", required="Recipient ID is required"),
+)
+
+def validate_json(schema):
+    """Validate the JSON body of a request against `schema` before the view runs"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            data = request.get_json(silent=True)
+            if not data or not isinstance(data, dict):
+                return jsonify({"error": "No data provided"}), 400
+
+            errors = schema.validate(data)
             if errors:
                 return jsonify({"errors": errors}), 400
-        
-        # If all validations pass, continue to the wrapped function
-        return f(*args, **kwargs)
-    
-    return decorated_function
-#Final
\ No newline at end of file
+
+            # If all validations pass, continue to the wrapped function
+            return f(*args, **kwargs)
+
+        decorated_function.json_schema = schema
+        return decorated_function
+
+    return decorator
+
+def init_request_limits(app):
+    """Cap every request body at MAX_CONTENT_LENGTH and its route's max_bytes, and answer 413 in JSON
+
+    Call this before installing any other before_request hook that may read the body.
+    """
+    # Flask's own default is None, meaning unlimited
+    if app.config.get('MAX_CONTENT_LENGTH') is None:
+        app.config['MAX_CONTENT_LENGTH'] = DEFAULT_MAX_CONTENT_LENGTH
+
+    @app.before_request
+    def refuse_oversized_body():
+        # Refuse oversized bodies from the header alone, before anything reads them
+        schema = getattr(app.view_functions.get(request.endpoint), 'json_schema', None)
+        length = request.content_length
+        if schema is not None and length is not None and length > schema.max_bytes:
+            return jsonify({"error": f"Request body must be at most {schema.max_bytes} bytes"}), 413
+        return None
+
+    @app.errorhandler(413)
+    def request_too_large(error):
+        return jsonify({"error": f"Request body must be at most {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
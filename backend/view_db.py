@@ -8,7 +8,8 @@ Usage:
     python view_db.py
 """
 
-from app import app, db
+from app import create_app
+from extensions import db
 from models import User, Group, Poll, PollOption, Vote
 from datetime import datetime
 
@@ -69,7 +70,7 @@ def print_section(title, data):
 
 def view_database():
     """Display the contents of the database"""
-    with app.app_context():
+    with create_app().app_context():
         # Get all data from the database
         users = User.query.all()
         groups = Group.query.all()
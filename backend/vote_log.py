@@ -0,0 +1,198 @@
+"""
+Append-only vote event log for Project Bolt
+
+The vote table only holds each user's current vote, because a re-vote
+overwrites the row. To keep the history, every vote the endpoints record is
+also appended to vote_event in the same transaction. Each event gets a
+monotonic sequence number (an AUTOINCREMENT key, so numbers are never
+reused) and names the option it replaced, if any.
+
+- Consumers tail the log by sequence number through
+  GET /api/votes/events?after=<seq>, instead of diffing tables.
+- compact_vote_log() folds events older than the retention window into
+  vote_checkpoint, which holds every user's vote as of the last folded event,
+  and deletes them. The log therefore stays small while checkpoint plus log
+  still describe every vote. It runs as a background job every
+  VOTE_LOG_COMPACT_INTERVAL seconds and as `flask compact-vote-log`.
+- replay_votes() rebuilds the vote table, tallies and timeline buckets from
+  checkpoint plus log, or with apply=False only reports how far the vote
+  table has drifted from them. It is exposed as `flask replay-votes`.
+
+A consumer whose position is older than the checkpoint gets 410 Gone and has
+to resynchronize from current state, since the events it missed were folded
+away.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from extensions import db
+from models import Vote, VoteCheckpoint, VoteEvent, VoteLogState
+from tallies import rebuild_tallies
+from timeline import rebuild_vote_buckets
+
+MAX_TAIL_LIMIT = 1000
+COMPACT_BATCH = 10000
+REPLAY_CHUNK = 5000
+
+event_table = VoteEvent.__table__
+checkpoint_table = VoteCheckpoint.__table__
+state_table = VoteLogState.__table__
+vote_table = Vote.__table__
+
+EVENT_COLUMNS = (
+    event_table.c.seq, event_table.c.poll_id, event_table.c.user_id,
+    event_table.c.option_id, event_table.c.previous_option_id, event_table.c.created_at,
+)
+
+# Latest event per (poll, user) within a range, folded into the checkpoint
+_FOLD_SQL = text(
+    "INSERT INTO vote_checkpoint (poll_id, user_id, option_id, voted_at) "
+    "SELECT poll_id, user_id, option_id, created_at FROM ("
+    "  SELECT poll_id, user_id, option_id, created_at, "
+    "  row_number() OVER (PARTITION BY poll_id, user_id ORDER BY seq DESC) AS rn "
+    "  FROM vote_event WHERE seq > :low AND seq <= :high"
+    ") WHERE rn = 1 "
+    "ON CONFLICT (poll_id, user_id) DO UPDATE SET option_id = excluded.option_id, voted_at = excluded.voted_at"
+)
+
+
+def append_vote_events(events):
+    """Append {poll_id, user_id, option_id, previous_option_id, created_at} events (caller commits)"""
+    if events:
+        db.session.execute(db.insert(event_table), events)
+
+
+def checkpoint_seq():
+    """Sequence number of the last event folded into the checkpoint"""
+    return db.session.execute(
+        db.select(state_table.c.checkpoint_seq).where(state_table.c.id == 1)
+    ).scalar() or 0
+
+
+def events_after(after, limit):
+    """Up to `limit` events with a sequence number above `after`, oldest first"""
+    rows = db.session.execute(
+        db.select(*EVENT_COLUMNS).where(event_table.c.seq > after).order_by(event_table.c.seq).limit(limit)
+    )
+    return [
+        {
+            "seq": seq,
+            "poll_id": poll_id,
+            "user_id": user_id,
+            "option_id": option_id,
+            "previous_option_id": previous_option_id,
+            "created_at": created_at.isoformat(),
+        }
+        for seq, poll_id, user_id, option_id, previous_option_id, created_at in rows
+    ]
+
+
+def compact_vote_log(retention=timedelta(days=7), now=None):
+    """Fold events older than `retention` into the checkpoint; returns the number folded"""
+    before = (now or datetime.now()) - retention
+    db.session.execute(
+        db.insert(state_table).prefix_with('OR IGNORE').values(id=1, checkpoint_seq=0)
+    )
+    db.session.commit()
+
+    folded = 0
+    while True:
+        low = checkpoint_seq()
+        # Walk the oldest events in key order; stop at the first one still inside the window
+        high = None
+        for seq, created_at in db.session.execute(
+            db.select(event_table.c.seq, event_table.c.created_at)
+            .where(event_table.c.seq > low)
+            .order_by(event_table.c.seq)
+            .limit(COMPACT_BATCH)
+        ):
+            if created_at >= before:
+                break
+            high = seq
+        if high is None:
+            db.session.rollback()
+            return folded
+
+        # Claim the range first; another process that compacted meanwhile makes this a no-op
+        claimed = db.session.execute(
+            db.update(state_table)
+            .where(state_table.c.id == 1, state_table.c.checkpoint_seq == low)
+            .values(checkpoint_seq=high, compacted_at=datetime.now())
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            return folded
+        db.session.execute(_FOLD_SQL, {"low": low, "high": high})
+        deleted = db.session.execute(
+            db.delete(event_table).where(event_table.c.seq > low, event_table.c.seq <= high)
+        ).rowcount
+        db.session.commit()
+        folded += deleted
+
+
+def _replayed_state():
+    """(poll_id, user_id) -> (option_id, voted_at) from the checkpoint plus every later event"""
+    low = checkpoint_seq()
+    state = {}
+    for poll_id, user_id, option_id, voted_at in db.session.execute(
+        db.select(checkpoint_table.c.poll_id, checkpoint_table.c.user_id,
+                  checkpoint_table.c.option_id, checkpoint_table.c.voted_at)
+    ):
+        state[poll_id, user_id] = (option_id, voted_at)
+    for poll_id, user_id, option_id, created_at in db.session.execute(
+        db.select(event_table.c.poll_id, event_table.c.user_id, event_table.c.option_id, event_table.c.created_at)
+        .where(event_table.c.seq > low)
+        .order_by(event_table.c.seq)
+    ):
+        state[poll_id, user_id] = (option_id, created_at)
+    return state
+
+
+def replay_votes(apply=False):
+    """Compare (and with apply=True, replace) the vote table with the replayed log
+
+    Returns counts of replayed votes and of votes that are missing from, extra
+    in or different in the current vote table.
+    """
+    state = _replayed_state()
+    report = {"votes": len(state), "missing": 0, "extra": 0, "different": 0}
+    seen = set()
+    for poll_id, user_id, option_id in db.session.execute(
+        db.select(vote_table.c.poll_id, vote_table.c.user_id, vote_table.c.option_id)
+    ):
+        key = (poll_id, user_id)
+        seen.add(key)
+        if key not in state:
+            report["extra"] += 1
+        elif state[key][0] != option_id:
+            report["different"] += 1
+    report["missing"] = len(state.keys() - seen)
+
+    if apply:
+        db.session.execute(db.delete(vote_table))
+        rows = [
+            {"id": str(uuid.uuid4()), "poll_id": poll_id, "user_id": user_id,
+             "option_id": option_id, "voted_at": voted_at}
+            for (poll_id, user_id), (option_id, voted_at) in state.items()
+        ]
+        for start in range(0, len(rows), REPLAY_CHUNK):
+            db.session.execute(db.insert(vote_table), rows[start:start + REPLAY_CHUNK])
+        db.session.commit()
+        rebuild_tallies()
+        rebuild_vote_buckets()
+    else:
+        db.session.rollback()
+    return report
+
+
+def init_vote_log_compaction(scheduler, interval, retention):
+    """Register log compaction as a background job (see scheduler.py)"""
+    def compact():
+        folded = compact_vote_log(retention)
+        if folded:
+            scheduler.app.logger.info("Folded %d vote event(s) into the checkpoint", folded)
+
+    scheduler.add_job('vote-log-compaction', interval, compact)
@@ -0,0 +1,218 @@
+"""
+Vote write path for Project Bolt
+
+A user has at most one vote per poll, enforced by the UNIQUE(poll_id, user_id)
+index on the vote table. cast_vote() records a single vote as an atomic
+upsert, so concurrent requests from the same user can never leave duplicate
+votes behind. The upsert also returns the vote it replaced, and a repeated
+vote for the same option writes nothing at all.
+
+Kiosks at in-person events collect ballots offline and upload them in one
+request. ingest_vote_batch() validates a whole batch with set-based queries,
+resolves repeated ballots from the same user with last-vote-wins semantics
+and writes every change in a single transaction using executemany upserts
+and tally updates. As with cast_vote(), the votes each upsert replaced come
+back through RETURNING, so tallies, timeline buckets and log events are
+worked out from the rows as the write found them.
+"""
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import User, PollOption, Vote
+from notifications import enqueue_vote_milestone
+from tallies import move_poll_tallies
+from response_cache import bump_group_version
+from timeline import apply_bucket_deltas, bucket_of
+from vote_log import append_vote_events
+
+MAX_BATCH_VOTES = 5000
+# Stay under SQLite's bound-parameter limit on older builds (999)
+IN_CLAUSE_CHUNK = 900
+
+vote_table = Vote.__table__
+poll_option_table = PollOption.__table__
+
+
+def upsert_votes():
+    """INSERT ... ON CONFLICT(poll_id, user_id) DO UPDATE for the vote table
+
+    A replaced vote's option and time move to previous_option_id and
+    previous_voted_at. SET expressions read the row as it was before the
+    update, so RETURNING those columns hands back the vote that was replaced.
+    """
+    statement = sqlite_insert(vote_table)
+    return statement.on_conflict_do_update(
+        index_elements=[vote_table.c.poll_id, vote_table.c.user_id],
+        set_={
+            "previous_option_id": vote_table.c.option_id,
+            "previous_voted_at": vote_table.c.voted_at,
+            "option_id": statement.excluded.option_id,
+            "voted_at": statement.excluded.voted_at,
+        },
+        # A repeated vote for the same option changes nothing and returns no row
+        where=vote_table.c.option_id != statement.excluded.option_id,
+    )
+
+
+def cast_vote(poll_id, user_id, option_id):
+    """Record a user's vote, replacing any earlier vote on the poll (caller commits)
+
+    Four statements, each a write, so SQLite holds the write lock from the
+    upsert on. Returns None when the user had already voted for option_id;
+    nothing is written then. Otherwise returns (previous_option_id, counts,
+    total): counts maps every option whose tally changed to its new value,
+    and total is the poll's vote total as of this write.
+    """
+    voted_at = datetime.now()
+    replaced = db.session.execute(
+        upsert_votes().returning(vote_table.c.previous_option_id, vote_table.c.previous_voted_at),
+        {"id": str(uuid.uuid4()), "poll_id": poll_id, "option_id": option_id, "user_id": user_id,
+         "voted_at": voted_at, "previous_option_id": None, "previous_voted_at": None},
+    ).first()
+    if replaced is None:
+        return None
+    previous_option_id, previous_voted_at = replaced
+
+    tally_deltas, bucket_deltas = {option_id: 1}, {(bucket_of(voted_at), option_id): 1}
+    if previous_option_id:
+        tally_deltas[previous_option_id] = -1
+        if previous_voted_at:
+            bucket_deltas[(bucket_of(previous_voted_at), previous_option_id)] = -1
+    apply_bucket_deltas(poll_id, bucket_deltas)
+    append_vote_events([{
+        "poll_id": poll_id,
+        "user_id": user_id,
+        "option_id": option_id,
+        "previous_option_id": previous_option_id,
+        "created_at": voted_at,
+    }])
+    tallies = move_poll_tallies(poll_id, tally_deltas)
+
+    return previous_option_id, {changed: tallies[changed] for changed in tally_deltas}, sum(tallies.values())
+
+
+def _chunks(values, size=IN_CLAUSE_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _parse_item(item):
+    """Accept {"user_id": ..., "option_id": ...} or a [user_id, option_id] pair"""
+    if isinstance(item, dict):
+        user_id, option_id = item.get('user_id'), item.get('option_id')
+    elif isinstance(item, (list, tuple)) and len(item) == 2:
+        user_id, option_id = item
+    else:
+        return None
+    if not (isinstance(user_id, str) and user_id and isinstance(option_id, str) and option_id):
+        return None
+    return user_id, option_id
+
+
+def existing_user_ids(user_ids):
+    """Return the subset of user_ids that exist, in one query per chunk"""
+    found = set()
+    for chunk in _chunks(user_ids):
+        found.update(db.session.execute(db.select(User.id).where(User.id.in_(chunk))).scalars())
+    return found
+
+
+def ingest_vote_batch(poll, items):
+    """Apply a batch of ballots to an open poll in one transaction
+
+    Returns (results, counts): one {"status": ...} entry per input item, in
+    input order, and the new tally of every option whose tally changed.
+    """
+    results = [None] * len(items)
+    option_ids = {option.id for option in poll.options}
+
+    # Shape checks, then last-vote-wins: a later ballot from the same user replaces earlier ones
+    latest, superseded = {}, {}
+    for index, item in enumerate(items):
+        parsed = _parse_item(item)
+        if parsed is None:
+            results[index] = {"status": "rejected", "error": "Expected user_id and option_id"}
+            continue
+        user_id, option_id = parsed
+        if option_id not in option_ids:
+            results[index] = {"status": "rejected", "error": "Option not found"}
+            continue
+        if user_id in latest:
+            superseded.setdefault(user_id, []).append(latest[user_id][0])
+        latest[user_id] = (index, option_id)
+
+    # Set-based validation of the users
+    known_users = existing_user_ids(latest)
+    for user_id in list(latest):
+        if user_id not in known_users:
+            index, _ = latest.pop(user_id)
+            for rejected in [index] + superseded.pop(user_id, []):
+                results[rejected] = {"status": "rejected", "error": "User not found"}
+    for indexes in superseded.values():
+        for index in indexes:
+            results[index] = {"status": "superseded"}
+
+    now = datetime.now()
+    upserts = [{
+        "id": str(uuid.uuid4()),
+        "poll_id": poll.id,
+        "option_id": option_id,
+        "user_id": user_id,
+        "voted_at": now,
+        "previous_option_id": None,
+        "previous_voted_at": None,
+    } for user_id, (_, option_id) in latest.items()]
+    # The first write: from here on SQLite holds the write lock, so no other vote can slip in between
+    # the replaced votes this returns and the tally updates below. Repeated votes return no row.
+    replaced = {}
+    if upserts:
+        replaced = {user_id: (previous, previous_at) for user_id, previous, previous_at in db.session.execute(
+            upsert_votes().returning(vote_table.c.user_id, vote_table.c.previous_option_id,
+                                     vote_table.c.previous_voted_at),
+            upserts,
+        )}
+
+    events, tally_deltas, bucket_deltas = [], {}, {}
+    for user_id, (index, option_id) in latest.items():
+        if user_id not in replaced:
+            results[index] = {"status": "unchanged"}
+            continue
+        previous, previous_at = replaced[user_id]
+        if previous:
+            tally_deltas[previous] = tally_deltas.get(previous, 0) - 1
+            if previous_at:
+                key = (bucket_of(previous_at), previous)
+                bucket_deltas[key] = bucket_deltas.get(key, 0) - 1
+        events.append({
+            "poll_id": poll.id,
+            "user_id": user_id,
+            "option_id": option_id,
+            "previous_option_id": previous,
+            "created_at": now,
+        })
+        tally_deltas[option_id] = tally_deltas.get(option_id, 0) + 1
+        key = (bucket_of(now), option_id)
+        bucket_deltas[key] = bucket_deltas.get(key, 0) + 1
+        results[index] = {"status": "recorded"}
+
+    counts = {}
+    if events:
+        tallies = move_poll_tallies(poll.id, tally_deltas)
+        counts = {option_id: tallies[option_id] for option_id, delta in tally_deltas.items() if delta}
+        # First votes raise the total; the one the write returned is current, whoever else is voting
+        added = sum(tally_deltas.values())
+        if added:
+            total = sum(tallies.values())
+            enqueue_vote_milestone(poll.id, poll.group_id, total - added, total, now)
+    apply_bucket_deltas(poll.id, bucket_deltas)
+    append_vote_events(events)
+    if events:
+        bump_group_version(poll.group_id)
+    db.session.commit()
+
+    return results, counts